@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+
+import argparse
+import concurrent.futures
+import functools
+import json
+import os
+import sys
+from decimal import Decimal
+from lxml import etree
+
+try:
+    from . import cache
+    from . import profiling
+    from . import reports
+    from . import utilities
+    from . import vectorized
+    from . import xbrl
+except ImportError:
+    import cache
+    import profiling
+    import reports
+    import utilities
+    import vectorized
+    import xbrl
+
+
+def is_instance(filename):
+    """Return whether the given file is an XBRL instance document, reading no
+    further than its root element.
+
+    """
+    try:
+        for event, elem in etree.iterparse(filename, events=("start",)):
+            return elem.tag == "{http://www.xbrl.org/2003/instance}xbrl"
+    except (OSError, etree.XMLSyntaxError):
+        return False
+
+    return False
+
+
+def find_instances(paths):
+    """Return a sorted list of the instance documents in the provided paths,
+    searching any directories recursively.
+
+    """
+    found = set()
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, subdirectories, filenames in os.walk(path):
+                for filename in filenames:
+                    if filename.lower().endswith((".xml", ".xbrl")):
+                        found.add(os.path.join(directory, filename))
+        else:
+            found.add(path)
+
+    # The DTS resolves related files relative to the last forward slash.
+    instances = []
+    for filename in sorted(found):
+        if is_instance(filename):
+            instances.append(os.path.abspath(filename).replace(os.sep, "/"))
+
+    return instances
+
+
+def write_report(dts, results, kinds):
+    """Write the calculation inconsistencies in the results next to the
+    instance document of the DTS in the given formats, returning the paths
+    of the files written. The labels are indexed through the DTS, so that
+    they may be read from its cache.
+
+    """
+    linkbases = xbrl.open_linkbases(dts, ["xsd"])
+    filenames, summary = reports.calc_report(
+        results["inconsistencies"],
+        linkbases["xsd"]["root"],
+        utilities.index(dts, "lab", xbrl.get_labels),
+        dts.filenames["ins"],
+        kinds
+    )
+
+    return filenames
+
+
+def process(instance, names, options, write=False):
+    """Run the named utilities against a single instance document, saving
+    any modified files if write is set, and writing a calculation report in
+    each format the calc_report option lists. Returns a dictionary which can
+    be serialized as JSON, including the paths of any reports written, and
+    the profile of each utility, and of the writes, if the profile option is
+    set.
+
+    """
+    dts = xbrl.DTS(instance, options.get("cache"))
+    profiles = {} if options.get("profile") else None
+    results, errors, modified = utilities.run(dts, names, options, profiles)
+    report = []
+    if options.get("calc_report") and "inconsistencies" in results:
+        if profiles is None:
+            report = write_report(dts, results, options["calc_report"])
+        else:
+            with profiling.profile("report") as profile:
+                profiles["report"] = profile
+                report = write_report(dts, results, options["calc_report"])
+    written = []
+    if write and profiles is None:
+        written = dts.save()
+    elif write:
+        with profiling.profile("write") as profile:
+            profiles["write"] = profile
+            written = dts.save()
+
+    result = {
+        "instance": instance,
+        "results": results,
+        "errors": errors,
+        "written": written
+    }
+    if report:
+        result["reports"] = report
+    if profiles is not None:
+        result["profiles"] = dict(
+            (name, profile.as_dict()) for name, profile in profiles.items()
+        )
+
+    return result
+
+
+def process_all(instances, names, options, write=False, jobs=None):
+    """Process each instance document, in parallel across a pool of jobs
+    processes unless jobs is 1, and return the results in the same order.
+
+    """
+    worker = functools.partial(
+        process,
+        names=names,
+        options=options,
+        write=write
+    )
+    if jobs == 1 or len(instances) < 2:
+        return [worker(instance) for instance in instances]
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(worker, instances))
+
+
+def to_json(value):
+    """Serialize the values json cannot, for use as json.dump's default."""
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+
+    raise TypeError(repr(value))
+
+
+def exit_code(filings):
+    """Return 2 if any utility failed, 1 if any utility reported findings,
+    and 0 otherwise. The output of utilities flagged as reports is not a
+    finding.
+
+    """
+    if any(filing["errors"] for filing in filings):
+        return 2
+    for filing in filings:
+        if any(findings for name, findings in filing["results"].items()
+               if not utilities.utilities[name].get("report")):
+            return 1
+
+    return 0
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(
+        description="Run thinX utilities against many XBRL filings."
+    )
+    parser.add_argument(
+        "paths",
+        nargs="+",
+        help="instance documents, or directories to search for them"
+    )
+    parser.add_argument(
+        "-u", "--utility",
+        action="append",
+        choices=list(utilities.utilities),
+        help="a utility to run, may be repeated (default: all)"
+    )
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=None,
+        help="number of filings to process in parallel (default: CPU count)"
+    )
+    parser.add_argument(
+        "-o", "--output",
+        help="file to write the JSON results to (default: stdout)"
+    )
+    parser.add_argument(
+        "--units",
+        default="units.ini",
+        help="unit configuration file (default: units.ini)"
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="stream instances for read-only checks instead of parsing them"
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["python", "numpy"],
+        default="python",
+        help="engine which checks calculations, numpy requires NumPy "
+             "(default: python)"
+    )
+    parser.add_argument(
+        "--calc-report",
+        choices=reports.formats + ["both"],
+        help="write a report of the calculation inconsistencies of each "
+             "filing next to its instance document, as csv, jsonl, or both"
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="record the time spent in each phase, counts of the elements "
+             "scanned and lookups performed, and the peak memory of each "
+             "utility"
+    )
+    parser.add_argument(
+        "--cache",
+        nargs="?",
+        const=cache.default_directory(),
+        help="reuse indexes and findings from an on-disk cache, kept in the "
+             "given directory (default: {0})".format(cache.default_directory())
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=256,
+        help="size in MiB the cache is kept within (default: 256)"
+    )
+    parser.add_argument(
+        "--merge-contexts",
+        action="store_true",
+        help="merge contexts which duplicate another into it, rewriting the "
+             "facts which refer to them (default: report only)"
+    )
+    parser.add_argument(
+        "--write",
+        action="store_true",
+        help="save files modified by the utilities (default: report only)"
+    )
+
+    args = parser.parse_args(args)
+    if args.engine == "numpy" and vectorized.numpy is None:
+        parser.error("the numpy engine requires NumPy to be installed")
+
+    return args
+
+
+def main(args=None):
+    """Runs the requested utilities in batch and returns the exit code."""
+    args = parse_args(sys.argv[1:] if args is None else args)
+    names = args.utility or list(utilities.utilities)
+    instances = find_instances(args.paths)
+    options = {
+        "units": args.units,
+        "stream": args.stream,
+        "engine": args.engine,
+        "merge_contexts": args.merge_contexts,
+        "calc_report": None if args.calc_report is None else (
+            reports.formats if args.calc_report == "both"
+            else [args.calc_report]
+        ),
+        "profile": args.profile
+    }
+    if args.cache:
+        options["cache"] = cache.Cache(
+            args.cache, args.cache_size * 1024 * 1024
+        )
+    filings = process_all(
+        instances,
+        names,
+        options,
+        args.write,
+        args.jobs
+    )
+    output = {"utilities": names, "filings": filings}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(output, f, default=to_json, indent=2)
+    else:
+        json.dump(output, sys.stdout, default=to_json, indent=2)
+        sys.stdout.write("\n")
+
+    return exit_code(filings)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
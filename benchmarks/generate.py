@@ -0,0 +1,437 @@
+#!/usr/bin/env python
+
+import argparse
+import os
+import random
+import sys
+from lxml import etree
+
+XBRLI = "http://www.xbrl.org/2003/instance"
+LINK = "http://www.xbrl.org/2003/linkbase"
+XLINK = "http://www.w3.org/1999/xlink"
+XSD = "http://www.w3.org/2001/XMLSchema"
+XBRLDI = "http://xbrl.org/2006/xbrldi"
+XML = "http://www.w3.org/XML/1998/namespace"
+ISO4217 = "http://www.xbrl.org/2003/iso4217"
+US_GAAP = "http://fasb.org/us-gaap/2012-01-31"
+US_GAAP_XSD = "http://xbrl.fasb.org/us-gaap/2012/elts/us-gaap-2012-01-31.xsd"
+
+LABEL = "http://www.xbrl.org/2003/role/label"
+TERSE_LABEL = "http://www.xbrl.org/2003/role/terseLabel"
+VERBOSE_LABEL = "http://www.xbrl.org/2003/role/verboseLabel"
+LANGUAGES = ["en-US", "fr", "de", "es", "it", "ja", "nl", "pt", "sv", "zh"]
+
+# The number of each part of a filing generated when no other is requested,
+# roughly that of a quarterly report.
+defaults = {
+    "facts": 1000,
+    "contexts": 100,
+    "concepts": 200,
+    "roles": 20,
+    "languages": 1,
+    "calc_arcs": 300
+}
+
+
+def xlink(name):
+    return "{{{0}}}{1}".format(XLINK, name)
+
+
+def add_loc(link, tag, href, label):
+    """Append a locator to the extended link and return its label."""
+    etree.SubElement(link, tag, {
+        xlink("type"): "locator",
+        xlink("href"): href,
+        xlink("label"): label
+    })
+
+    return label
+
+
+def add_arc(link, tag, arcrole, from_label, to_label, attrib=None):
+    """Append an arc between two labels to the extended link."""
+    arc = etree.SubElement(link, tag, {
+        xlink("type"): "arc",
+        xlink("arcrole"): arcrole,
+        xlink("from"): from_label,
+        xlink("to"): to_label
+    })
+    for key, value in (attrib or {}).items():
+        arc.set(key, value)
+
+    return arc
+
+
+class Filing(object):
+    """A synthetic filing, made up of an instance document, an extension
+    schema, and presentation, definition, calculation, and label linkbases,
+    in the same layout as a real filing. Every part is generated from seed,
+    so the same arguments always produce the same files.
+
+    """
+    def __init__(self, facts=None, contexts=None, concepts=None, roles=None,
+                 languages=None, calc_arcs=None, prefix="abc",
+                 date="20130331", seed=0):
+        self.facts = defaults["facts"] if facts is None else facts
+        self.contexts = defaults["contexts"] if contexts is None else contexts
+        self.concepts = defaults["concepts"] if concepts is None else concepts
+        self.roles = defaults["roles"] if roles is None else roles
+        self.languages = LANGUAGES[:languages or defaults["languages"]]
+        self.calc_arcs = (defaults["calc_arcs"] if calc_arcs is None
+                          else calc_arcs)
+        self.prefix = prefix
+        self.date = date
+        self.namespace = "http://www.example.com/{0}".format(date)
+        self.random = random.Random(seed)
+
+        self.names = ["Concept{0:06d}".format(i)
+                      for i in range(self.concepts)]
+        # Leave every twentieth concept and every tenth role unused, so the
+        # cleanup utilities have something to remove.
+        self.used = [name for i, name in enumerate(self.names) if i % 20]
+        self.role_uris = ["http://www.example.com/role/Role{0:04d}".format(i)
+                          for i in range(self.roles)]
+        self.used_roles = [role for i, role in enumerate(self.role_uris)
+                           if i % 10 != 9] or self.role_uris[:1]
+        self.context_ids = []
+
+    def filename(self, suffix):
+        return "{0}-{1}{2}".format(self.prefix, self.date, suffix)
+
+    def href(self, name):
+        return "{0}#{1}_{2}".format(self.filename(".xsd"), self.prefix, name)
+
+    def role_links(self):
+        """Return the used roles in order, paired with the slice of the used
+        concepts each one presents.
+
+        """
+        size = max(1, len(self.used) // len(self.used_roles))
+        for i, role in enumerate(self.used_roles):
+            yield role, self.used[i * size:(i + 1) * size] or self.used[:1]
+
+    def schema(self):
+        root = etree.Element("{%s}schema" % XSD, nsmap={
+            "xsd": XSD,
+            self.prefix: self.namespace,
+            "link": LINK,
+            "xbrli": XBRLI,
+            "xlink": XLINK
+        }, targetNamespace=self.namespace, elementFormDefault="qualified")
+        appinfo = etree.SubElement(
+            etree.SubElement(root, "{%s}annotation" % XSD),
+            "{%s}appinfo" % XSD
+        )
+        for key in ["pre", "cal", "def", "lab"]:
+            etree.SubElement(appinfo, "{%s}linkbaseRef" % LINK, {
+                xlink("type"): "simple",
+                xlink("href"): self.filename("_{0}.xml".format(key)),
+                xlink("role"): "http://www.xbrl.org/2003/role/{0}".format({
+                    "pre": "presentationLinkbaseRef",
+                    "cal": "calculationLinkbaseRef",
+                    "def": "definitionLinkbaseRef",
+                    "lab": "labelLinkbaseRef"
+                }[key]),
+                xlink("arcrole"):
+                    "http://www.w3.org/1999/xlink/properties/linkbase"
+            })
+        for i, role in enumerate(self.role_uris):
+            role_type = etree.SubElement(appinfo, "{%s}roleType" % LINK, {
+                "roleURI": role,
+                "id": role.rsplit("/", 1)[-1]
+            })
+            definition = etree.SubElement(role_type, "{%s}definition" % LINK)
+            definition.text = "{0:04d} - Statement - Role {1}".format(
+                (i + 1) * 10, i
+            )
+            for link in ["presentationLink", "calculationLink",
+                         "definitionLink"]:
+                used_on = etree.SubElement(role_type, "{%s}usedOn" % LINK)
+                used_on.text = "link:{0}".format(link)
+        etree.SubElement(root, "{%s}import" % XSD, {
+            "namespace": US_GAAP,
+            "schemaLocation": US_GAAP_XSD
+        })
+        for name in self.names:
+            etree.SubElement(root, "{%s}element" % XSD, {
+                "name": name,
+                "id": "{0}_{1}".format(self.prefix, name),
+                "type": "xbrli:monetaryItemType",
+                "substitutionGroup": "xbrli:item",
+                "nillable": "true",
+                "{%s}periodType" % XBRLI: "duration"
+            })
+
+        return root
+
+    def linkbase(self):
+        root = etree.Element("{%s}linkbase" % LINK,
+                             nsmap={None: LINK, "xlink": XLINK})
+        for role in self.used_roles:
+            etree.SubElement(root, "{%s}roleRef" % LINK, {
+                "roleURI": role,
+                xlink("type"): "simple",
+                xlink("href"): "{0}#{1}".format(
+                    self.filename(".xsd"),
+                    role.rsplit("/", 1)[-1]
+                )
+            })
+
+        return root
+
+    def extended_link(self, root, tag, role):
+        return etree.SubElement(root, "{%s}%s" % (LINK, tag), {
+            xlink("type"): "extended",
+            xlink("role"): role
+        })
+
+    def presentation(self):
+        root = self.linkbase()
+        arcrole = "http://www.xbrl.org/2003/arcrole/parent-child"
+        for role, concepts in self.role_links():
+            link = self.extended_link(root, "presentationLink", role)
+            parent = add_loc(link, "{%s}loc" % LINK, self.href(concepts[0]),
+                             concepts[0])
+            for order, name in enumerate(concepts[1:], 1):
+                child = add_loc(link, "{%s}loc" % LINK, self.href(name), name)
+                attrib = {"order": str(order)}
+                if order % 3 == 0:
+                    attrib["preferredLabel"] = TERSE_LABEL
+                elif order % 5 == 0:
+                    attrib["preferredLabel"] = VERBOSE_LABEL
+                add_arc(link, "{%s}presentationArc" % LINK, arcrole,
+                        parent, child, attrib)
+
+        return root
+
+    def definition(self):
+        root = self.linkbase()
+        arcrole = "http://xbrl.org/int/dim/arcrole/domain-member"
+        axis = "{0}#us-gaap_StatementBusinessSegmentsAxis".format(
+            US_GAAP_XSD
+        )
+        for role, concepts in self.role_links():
+            link = self.extended_link(root, "definitionLink", role)
+            parent = add_loc(link, "{%s}loc" % LINK, axis, "Axis")
+            child = add_loc(link, "{%s}loc" % LINK, self.href(concepts[0]),
+                            concepts[0])
+            add_arc(link, "{%s}definitionArc" % LINK, arcrole, parent, child,
+                    {"order": "1"})
+
+        return root
+
+    def calculation(self):
+        """Spread the calculation arcs evenly across the used roles, as small
+        trees of a total and up to five items. One tree in four repeats a tree
+        from an earlier role so that duplicate calculations are found.
+
+        """
+        root = self.linkbase()
+        arcrole = "http://www.xbrl.org/2003/arcrole/summation-item"
+        remaining = self.calc_arcs
+        roles = self.used_roles
+        trees = []
+        for index, role in enumerate(roles):
+            arcs = remaining // (len(roles) - index)
+            remaining -= arcs
+            link = self.extended_link(root, "calculationLink", role)
+            while arcs > 0:
+                items = min(arcs, self.random.randint(2, 5))
+                if trees and len(trees) % 4 == 3:
+                    concepts = self.random.choice(trees)[:items + 1]
+                else:
+                    concepts = self.random.sample(
+                        self.used, min(items + 1, len(self.used))
+                    )
+                trees.append(concepts)
+                arcs -= len(concepts) - 1
+                total = add_loc(link, "{%s}loc" % LINK,
+                                self.href(concepts[0]),
+                                "{0}_{1}".format(concepts[0], len(link)))
+                for order, name in enumerate(concepts[1:], 1):
+                    item = add_loc(link, "{%s}loc" % LINK, self.href(name),
+                                   "{0}_{1}".format(name, len(link)))
+                    weight = "-1" if order % 4 == 0 else "1"
+                    add_arc(link, "{%s}calculationArc" % LINK, arcrole, total,
+                            item, {"order": str(order), "weight": weight})
+
+        return root
+
+    def labels(self):
+        """Give every concept but one in forty a standard label in each
+        language. Some also have terse and verbose labels, which are identical
+        for concepts ending in 3, and a few remote concepts are labelled too,
+        so the label utilities have work to do.
+
+        """
+        root = etree.Element("{%s}linkbase" % LINK,
+                             nsmap={"link": LINK, "xlink": XLINK})
+        link = self.extended_link(root, "labelLink",
+                                  "http://www.xbrl.org/2003/role/link")
+        arcrole = "http://www.xbrl.org/2003/arcrole/concept-label"
+        hrefs = [(name, self.href(name))
+                 for i, name in enumerate(self.names) if i % 40]
+        hrefs += [("Remote{0}".format(i),
+                   "{0}#us-gaap_Remote{1}".format(US_GAAP_XSD, i))
+                  for i in range(max(1, self.concepts // 50))]
+        for name, href in hrefs:
+            loc = add_loc(link, "{%s}loc" % LINK, href, name)
+            texts = {LABEL: "Label of {0}".format(name)}
+            if name.endswith(("3", "7")):
+                texts[TERSE_LABEL] = "Short {0}".format(name)
+                texts[VERBOSE_LABEL] = "Label of {0} in detail".format(name)
+            if name.endswith("3"):
+                texts[VERBOSE_LABEL] = texts[TERSE_LABEL]
+            for role, text in sorted(texts.items()):
+                for lang in self.languages:
+                    label = "label_{0}_{1}".format(name, len(link))
+                    etree.SubElement(link, "{%s}label" % LINK, {
+                        xlink("type"): "resource",
+                        xlink("label"): label,
+                        xlink("role"): role,
+                        "{%s}lang" % XML: lang,
+                        "id": label
+                    }).text = "{0} ({1})".format(text, lang)
+                    add_arc(link, "{%s}labelArc" % LINK, arcrole, loc, label,
+                            {"order": "1"})
+
+        return root
+
+    def instance(self):
+        root = etree.Element("{%s}xbrl" % XBRLI, nsmap={
+            "xbrli": XBRLI,
+            self.prefix: self.namespace,
+            "iso4217": ISO4217,
+            "link": LINK,
+            "us-gaap": US_GAAP,
+            "xbrldi": XBRLDI,
+            "xlink": XLINK
+        })
+        etree.SubElement(root, "{%s}schemaRef" % LINK, {
+            xlink("type"): "simple",
+            xlink("href"): self.filename(".xsd")
+        })
+        for i in range(self.contexts):
+            self.add_context(root, i)
+        for unit, measure in [("USD", "iso4217:USD"),
+                              ("Shares", "xbrli:shares"),
+                              ("Unused", "iso4217:EUR")]:
+            elem = etree.SubElement(root, "{%s}unit" % XBRLI, id=unit)
+            etree.SubElement(elem, "{%s}measure" % XBRLI).text = measure
+        # Only use nine in every ten contexts, and report a few facts twice.
+        used = self.context_ids[:max(1, len(self.context_ids) * 9 // 10)]
+        for i in range(self.facts):
+            if i % 50 == 49:
+                name, context = self.random.choice(self.used), used[0]
+            else:
+                name = self.random.choice(self.used)
+                context = self.random.choice(used)
+            etree.SubElement(root, "{%s}%s" % (self.namespace, name), {
+                "contextRef": context,
+                "unitRef": "USD",
+                "decimals": "-3" if i % 7 == 0 else "0"
+            }).text = str(self.random.randint(-1000, 1000000) * 1000)
+
+        return root
+
+    def add_context(self, root, i):
+        """Append the context numbered i: every tenth is a two day duration,
+        every third an instant, the rest quarters, with one in four of each
+        also given a segment.
+
+        """
+        year = 2000 + (i // 4) % 20
+        quarter = i % 4 + 1
+        start = "{0}-{1:02d}-01".format(year, quarter * 3 - 2)
+        end = "{0}-{1:02d}-{2}".format(year, quarter * 3,
+                                       "30" if quarter in (2, 3) else "31")
+        context_id = "C{0:06d}".format(i)
+        context = etree.SubElement(root, "{%s}context" % XBRLI,
+                                   id=context_id)
+        entity = etree.SubElement(context, "{%s}entity" % XBRLI)
+        etree.SubElement(entity, "{%s}identifier" % XBRLI,
+                         scheme="http://www.sec.gov/CIK").text = "0000000000"
+        if i % 4 == 3:
+            segment = etree.SubElement(entity, "{%s}segment" % XBRLI)
+            etree.SubElement(
+                segment, "{%s}explicitMember" % XBRLDI,
+                dimension="us-gaap:StatementBusinessSegmentsAxis"
+            ).text = "{0}:{1}".format(self.prefix, self.names[i % 5])
+        period = etree.SubElement(context, "{%s}period" % XBRLI)
+        if i % 10 == 5:
+            etree.SubElement(period, "{%s}startDate" % XBRLI).text = start
+            etree.SubElement(period, "{%s}endDate" % XBRLI).text = (
+                start[:-2] + "02"
+            )
+        elif i % 3 == 0:
+            etree.SubElement(period, "{%s}instant" % XBRLI).text = end
+        else:
+            etree.SubElement(period, "{%s}startDate" % XBRLI).text = start
+            etree.SubElement(period, "{%s}endDate" % XBRLI).text = end
+        self.context_ids.append(context_id)
+
+    def write(self, directory):
+        """Write every file of the filing to the directory, returning the
+        path of the instance document.
+
+        """
+        files = [
+            (".xsd", self.schema),
+            ("_pre.xml", self.presentation),
+            ("_def.xml", self.definition),
+            ("_cal.xml", self.calculation),
+            ("_lab.xml", self.labels),
+            (".xml", self.instance)
+        ]
+        os.makedirs(directory, exist_ok=True)
+        for suffix, build in files:
+            tree = etree.ElementTree(build())
+            tree.write(
+                os.path.join(directory, self.filename(suffix)),
+                xml_declaration=True,
+                encoding="UTF-8",
+                pretty_print=True
+            )
+
+        return "{0}/{1}".format(
+            directory.replace(os.sep, "/").rstrip("/"),
+            self.filename(".xml")
+        )
+
+
+def generate(directory, **kwargs):
+    """Write a synthetic filing to the directory, returning the path of its
+    instance document. Accepts the same keyword arguments as Filing.
+
+    """
+    return Filing(**kwargs).write(directory)
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic XBRL filing."
+    )
+    parser.add_argument("directory", help="directory to write the filing to")
+    for key, value in sorted(defaults.items()):
+        parser.add_argument(
+            "--{0}".format(key.replace("_", "-")),
+            type=int,
+            default=value,
+            help="number of {0} (default: {1})".format(
+                key.replace("_", " "), value
+            )
+        )
+    parser.add_argument("--seed", type=int, default=0)
+
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(sys.argv[1:] if args is None else args)
+    options = vars(args)
+    directory = options.pop("directory")
+    print(generate(directory, **options))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,642 @@
+#!/usr/bin/env python
+
+import argparse
+import collections
+import json
+import platform
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from lxml import etree
+
+from . import generate
+
+try:
+    from thinX import vectorized
+    from thinX import xbrl
+except ImportError:
+    import vectorized
+    import xbrl
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UNITS = os.path.join(ROOT, "units.ini")
+KEYS = ["ins", "xsd", "pre", "def", "cal", "lab"]
+
+# The scale of each synthetic filing, from a small quarterly report up to
+# the largest filings seen in practice.
+sizes = collections.OrderedDict([
+    ("small", {
+        "facts": 1000,
+        "contexts": 100,
+        "concepts": 200,
+        "roles": 20,
+        "languages": 1,
+        "calc_arcs": 300
+    }),
+    ("medium", {
+        "facts": 10000,
+        "contexts": 1000,
+        "concepts": 2000,
+        "roles": 100,
+        "languages": 2,
+        "calc_arcs": 3000
+    }),
+    ("large", {
+        "facts": 100000,
+        "contexts": 10000,
+        "concepts": 10000,
+        "roles": 400,
+        "languages": 3,
+        "calc_arcs": 20000
+    })
+])
+
+
+def drain(records):
+    """Consume an iterator, such as an InstanceReader, without storing it."""
+    collections.deque(records, maxlen=0)
+
+
+def root(linkbases, key):
+    return linkbases[key]["root"]
+
+
+def unused_roles(dts, linkbases):
+    roles = xbrl.get_link_roles(root(linkbases, "xsd"))
+    active = xbrl.get_active_link_roles(linkbases)
+
+    return (xbrl.compare_link_roles(roles, active),)
+
+
+def inconsistencies(dts, linkbases):
+    calcs = xbrl.get_calcs(root(linkbases, "cal"))
+
+    return (xbrl.calc_values(root(linkbases, "ins"), calcs),)
+
+
+def equivalences(dts, linkbases):
+    labels = xbrl.get_labels(root(linkbases, "lab"))
+
+    return (xbrl.label_equivalences(labels),)
+
+
+def forget_units(dts, linkbases):
+    """Forget every compiled unit registry, so that load_units compiles it."""
+    xbrl._unit_registries.clear()
+
+    return ()
+
+
+def concept_usage(dts, linkbases):
+    usage = xbrl.get_concept_usage(linkbases)
+
+    return (usage, list(usage)[:100])
+
+
+def fact_pairs(dts, linkbases):
+    """Return a pair of each fact and itself, to be compared."""
+    return ([
+        [record, record]
+        for record in xbrl.InstanceReader(dts.filenames["ins"])
+        if isinstance(record, xbrl.Fact)
+    ],)
+
+
+def rename_all_refs(linkbases):
+    for key, value in linkbases.items():
+        if key == "xsd":
+            xbrl.rename_refs(value["root"], "xsd")
+        elif key == "lab":
+            xbrl.rename_refs(value["root"], "lab")
+        else:
+            xbrl.rename_refs(value["root"], "linkbase")
+
+
+# Every benchmark, keyed by the xbrl function it times. Each one lists the
+# files it needs parsed beforehand, and whether it modifies them, in which
+# case it is given freshly parsed files every time it runs. Any prepare
+# function is run untimed, and its results are passed on to the benchmark.
+benchmarks = collections.OrderedDict([
+    ("open_linkbases", {
+        "files": [],
+        "mutates": True,
+        "function": lambda dts, lb: xbrl.open_linkbases(dts.filename, KEYS)
+    }),
+    ("InstanceReader", {
+        "files": [],
+        "function": lambda dts, lb: drain(
+            xbrl.InstanceReader(dts.filenames["ins"])
+        )
+    }),
+    ("get_file_namespace", {
+        "files": ["xsd"],
+        "function": lambda dts, lb: xbrl.get_file_namespace(dts)
+    }),
+    ("get_units", {
+        "files": ["xsd"],
+        "function": lambda dts, lb: xbrl.get_units(UNITS, dts)
+    }),
+    ("load_units", {
+        "files": ["xsd"],
+        "prepare": forget_units,
+        "function": lambda dts, lb: xbrl.load_units(UNITS, dts)
+    }),
+    ("UnitRegistry", {
+        "files": [],
+        "prepare": lambda dts, lb: (xbrl.get_units(UNITS),),
+        "function": lambda dts, lb, units: xbrl.UnitRegistry(units)
+    }),
+    ("add_namespace", {
+        "files": ["ins", "xsd"],
+        "mutates": True,
+        "prepare": lambda dts, lb: (xbrl.load_units(UNITS, dts),),
+        "function": lambda dts, lb, registry: xbrl.add_namespace(
+            root(lb, "ins"), registry
+        )
+    }),
+    ("unknown_measures", {
+        "files": ["ins", "xsd"],
+        "prepare": lambda dts, lb: (xbrl.load_units(UNITS, dts),),
+        "function": lambda dts, lb, registry: xbrl.unknown_measures(
+            root(lb, "ins"), registry
+        )
+    }),
+    ("LabelLinkbase", {
+        "files": ["lab"],
+        "function": lambda dts, lb: xbrl.LabelLinkbase(root(lb, "lab"))
+    }),
+    ("get_labels", {
+        "files": ["lab"],
+        "function": lambda dts, lb: xbrl.get_labels(root(lb, "lab"))
+    }),
+    ("PresentationLinkbase", {
+        "files": ["pre"],
+        "function": lambda dts, lb: xbrl.PresentationLinkbase(
+            root(lb, "pre")
+        )
+    }),
+    ("get_used_labels", {
+        "files": ["pre"],
+        "function": lambda dts, lb: xbrl.get_used_labels(root(lb, "pre"))
+    }),
+    ("clean_labels", {
+        "files": ["pre", "lab"],
+        "mutates": True,
+        "function": lambda dts, lb: xbrl.clean_labels(
+            root(lb, "lab"), root(lb, "pre")
+        )
+    }),
+    ("redundant_labels", {
+        "files": ["pre", "lab"],
+        "mutates": True,
+        "function": lambda dts, lb: xbrl.redundant_labels(
+            root(lb, "lab"), root(lb, "pre")
+        )
+    }),
+    ("remove_standard_labels", {
+        "files": ["lab"],
+        "mutates": True,
+        "function": lambda dts, lb: xbrl.remove_standard_labels(
+            root(lb, "lab")
+        )
+    }),
+    ("label_equivalences", {
+        "files": ["lab"],
+        "prepare": lambda dts, lb: (xbrl.get_labels(root(lb, "lab")),),
+        "function": lambda dts, lb, labels: xbrl.label_equivalences(labels)
+    }),
+    ("delete_labels", {
+        "files": ["lab"],
+        "mutates": True,
+        "prepare": equivalences,
+        "function": lambda dts, lb, concepts: xbrl.delete_labels(
+            concepts, root(lb, "lab")
+        )
+    }),
+    ("change_preferred_labels", {
+        "files": ["pre", "lab"],
+        "mutates": True,
+        "prepare": equivalences,
+        "function": lambda dts, lb, concepts: xbrl.change_preferred_labels(
+            concepts, root(lb, "pre")
+        )
+    }),
+    ("duplicate_labels", {
+        "files": ["lab"],
+        "function": lambda dts, lb: xbrl.duplicate_labels(root(lb, "lab"))
+    }),
+    ("two_day_contexts", {
+        "files": ["ins"],
+        "function": lambda dts, lb: xbrl.two_day_contexts(root(lb, "ins"))
+    }),
+    ("two_day_contexts (stream)", {
+        "files": [],
+        "function": lambda dts, lb: xbrl.two_day_contexts(
+            xbrl.InstanceReader(dts.filenames["ins"])
+        )
+    }),
+    ("count_references", {
+        "files": ["ins"],
+        "function": lambda dts, lb: xbrl.count_references(root(lb, "ins"))
+    }),
+    ("unused_references", {
+        "files": ["ins"],
+        "function": lambda dts, lb: xbrl.unused_references(root(lb, "ins"))
+    }),
+    ("unused_references (stream)", {
+        "files": [],
+        "function": lambda dts, lb: xbrl.unused_references(
+            xbrl.InstanceReader(dts.filenames["ins"])
+        )
+    }),
+    ("clean_instance", {
+        "files": ["ins"],
+        "mutates": True,
+        "function": lambda dts, lb: xbrl.clean_instance(root(lb, "ins"))
+    }),
+    ("clean_contexts", {
+        "files": ["ins"],
+        "mutates": True,
+        "function": lambda dts, lb: xbrl.clean_contexts(root(lb, "ins"))
+    }),
+    ("ContextCatalog", {
+        "files": ["ins"],
+        "function": lambda dts, lb: xbrl.ContextCatalog(root(lb, "ins"))
+    }),
+    ("merge_contexts", {
+        "files": ["ins"],
+        "mutates": True,
+        "function": lambda dts, lb: xbrl.merge_contexts(root(lb, "ins"))
+    }),
+    ("get_concept_locs", {
+        "files": ["pre"],
+        "function": lambda dts, lb: xbrl.get_concept_locs(root(lb, "pre"))
+    }),
+    ("get_concept_usage", {
+        "files": ["xsd", "pre", "def", "cal", "lab"],
+        "function": lambda dts, lb: xbrl.get_concept_usage(lb)
+    }),
+    ("where_used", {
+        "files": ["xsd", "pre", "def", "cal", "lab"],
+        "prepare": concept_usage,
+        "function": lambda dts, lb, usage, concepts: [
+            xbrl.where_used(usage, concept) for concept in concepts
+        ]
+    }),
+    ("clean_concepts", {
+        "files": ["xsd", "pre", "def", "cal", "lab"],
+        "mutates": True,
+        "function": lambda dts, lb: xbrl.clean_concepts(lb)
+    }),
+    ("CalculationNetwork", {
+        "files": ["cal"],
+        "function": lambda dts, lb: xbrl.CalculationNetwork(root(lb, "cal"))
+    }),
+    ("get_calcs", {
+        "files": ["cal"],
+        "function": lambda dts, lb: xbrl.get_calcs(root(lb, "cal"))
+    }),
+    ("find_dup_calcs", {
+        "files": ["cal"],
+        "function": lambda dts, lb: xbrl.find_dup_calcs(root(lb, "cal"))
+    }),
+    ("dup_calcs", {
+        "files": ["cal"],
+        "function": lambda dts, lb: xbrl.dup_calcs(root(lb, "cal"))
+    }),
+    ("get_facts", {
+        "files": ["ins"],
+        "function": lambda dts, lb: xbrl.get_facts(root(lb, "ins"))
+    }),
+    ("get_facts (stream)", {
+        "files": [],
+        "function": lambda dts, lb: xbrl.get_facts(
+            xbrl.InstanceReader(dts.filenames["ins"])
+        )
+    }),
+    ("calc_values", {
+        "files": ["ins", "cal"],
+        "prepare": lambda dts, lb: (xbrl.get_calcs(root(lb, "cal")),),
+        "function": lambda dts, lb, calcs: xbrl.calc_values(
+            root(lb, "ins"), calcs
+        )
+    }),
+    ("calc_values (numpy)", {
+        "files": ["ins", "cal"],
+        "prepare": lambda dts, lb: (
+            xbrl.get_calcs(root(lb, "cal")),
+            vectorized.FactTable(root(lb, "ins"))
+        ),
+        "function": lambda dts, lb, calcs, table: vectorized.calc_values(
+            root(lb, "ins"), calcs, table
+        )
+    }),
+    ("calc_values (stream)", {
+        "files": ["cal"],
+        "prepare": lambda dts, lb: (xbrl.get_calcs(root(lb, "cal")),),
+        "function": lambda dts, lb, calcs: xbrl.calc_values(
+            xbrl.InstanceReader(dts.filenames["ins"]), calcs
+        )
+    }),
+    ("CalculationTree", {
+        "files": ["cal"],
+        "prepare": lambda dts, lb: (
+            xbrl.CalculationNetwork(root(lb, "cal")),
+        ),
+        "function": lambda dts, lb, network: xbrl.CalculationTree(network)
+    }),
+    ("rollup_values", {
+        "files": ["ins", "cal"],
+        "prepare": lambda dts, lb: (
+            xbrl.CalculationTree(xbrl.CalculationNetwork(root(lb, "cal"))),
+        ),
+        "function": lambda dts, lb, tree: xbrl.rollup_values(
+            root(lb, "ins"), tree
+        )
+    }),
+    ("duplicate_facts", {
+        "files": ["ins"],
+        "function": lambda dts, lb: xbrl.duplicate_facts(root(lb, "ins"))
+    }),
+    ("duplicate_facts (stream)", {
+        "files": [],
+        "function": lambda dts, lb: xbrl.duplicate_facts(
+            xbrl.InstanceReader(dts.filenames["ins"])
+        )
+    }),
+    ("compare_facts", {
+        "files": [],
+        "prepare": fact_pairs,
+        "function": lambda dts, lb, pairs: [
+            xbrl.compare_facts(pair) for pair in pairs
+        ]
+    }),
+    ("insert_labels", {
+        "files": ["ins", "cal", "lab"],
+        "prepare": inconsistencies,
+        "function": lambda dts, lb, calcs: xbrl.insert_labels(
+            root(lb, "lab"), [list(calc) for calc in calcs]
+        )
+    }),
+    ("link_role_def", {
+        "files": ["xsd"],
+        "prepare": lambda dts, lb: (
+            xbrl.get_link_role_index(root(lb, "xsd")),
+        ),
+        "function": lambda dts, lb, index: [
+            xbrl.link_role_def(index, role) for role in index.roles
+        ]
+    }),
+    ("link_role_sort", {
+        "files": ["xsd"],
+        "mutates": True,
+        "function": lambda dts, lb: xbrl.link_role_sort(root(lb, "xsd"))
+    }),
+    ("remove_namespace_date", {
+        "files": ["xsd"],
+        "mutates": True,
+        "function": lambda dts, lb: xbrl.remove_namespace_date(
+            root(lb, "xsd")
+        )
+    }),
+    ("rename_refs", {
+        "files": ["xsd", "pre", "def", "cal", "lab"],
+        "mutates": True,
+        "function": lambda dts, lb: rename_all_refs(lb)
+    }),
+    ("retrieve_base", {
+        "files": ["xsd"],
+        "function": lambda dts, lb: xbrl.retrieve_base(root(lb, "xsd"))
+    }),
+    ("LinkRoleIndex", {
+        "files": ["xsd", "pre", "def", "cal", "lab"],
+        "function": lambda dts, lb: xbrl.LinkRoleIndex(lb).report()
+    }),
+    ("get_link_roles", {
+        "files": ["xsd"],
+        "function": lambda dts, lb: xbrl.get_link_roles(root(lb, "xsd"))
+    }),
+    ("get_active_link_roles", {
+        "files": ["pre", "def", "cal"],
+        "function": lambda dts, lb: xbrl.get_active_link_roles(lb)
+    }),
+    ("compare_link_roles", {
+        "files": ["xsd", "pre", "def", "cal"],
+        "prepare": lambda dts, lb: (
+            xbrl.get_link_roles(root(lb, "xsd")),
+            xbrl.get_active_link_roles(lb)
+        ),
+        "function": lambda dts, lb, roles, active: xbrl.compare_link_roles(
+            roles, active
+        )
+    }),
+    ("delete_link_roles", {
+        "files": ["xsd", "pre", "def", "cal"],
+        "mutates": True,
+        "prepare": unused_roles,
+        "function": lambda dts, lb, roles: xbrl.delete_link_roles(
+            root(lb, "xsd"), roles
+        )
+    })
+])
+
+# The NumPy engine can only be measured where NumPy is installed.
+if vectorized.numpy is None:
+    del benchmarks["calc_values (numpy)"]
+
+
+def measure(benchmark, instance, shared, repeat):
+    """Time a benchmark against the filing, returning the fastest and mean
+    wall time in seconds over repeat runs, and the peak memory allocated by
+    Python during one further run, as measured by tracemalloc.
+
+    """
+    def setup():
+        dts = xbrl.DTS(instance) if benchmark.get("mutates") else shared
+        linkbases = xbrl.open_linkbases(dts, benchmark["files"])
+        args = (dts, linkbases)
+        if "prepare" in benchmark:
+            args += tuple(benchmark["prepare"](dts, linkbases))
+
+        return args
+
+    times = []
+    for i in range(repeat):
+        args = setup()
+        start = time.perf_counter()
+        benchmark["function"](*args)
+        times.append(time.perf_counter() - start)
+
+    args = setup()
+    tracemalloc.start()
+    try:
+        benchmark["function"](*args)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "seconds": min(times),
+        "mean": sum(times) / len(times),
+        "peak": peak
+    }
+
+
+def run(names=None, size_names=None, repeat=3, directory=None, log=None):
+    """Generate a filing of each requested size and run the named benchmarks
+    against it. Returns a dictionary of the results, along with the versions
+    of everything involved, which can be saved as JSON and compared later.
+
+    """
+    names = names or list(benchmarks)
+    size_names = size_names or ["small", "medium"]
+    results = []
+    temporary = directory is None
+    if temporary:
+        directory = tempfile.mkdtemp(prefix="thinx-benchmarks-")
+    try:
+        for size in size_names:
+            instance = generate.generate(
+                os.path.join(directory, size),
+                **sizes[size]
+            )
+            shared = xbrl.DTS(instance)
+            for name in names:
+                result = measure(benchmarks[name], instance, shared, repeat)
+                result.update({"size": size, "benchmark": name})
+                results.append(result)
+                if log is not None:
+                    log(format_result(result))
+    finally:
+        if temporary:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    return {
+        "version": get_version(),
+        "python": platform.python_version(),
+        "lxml": etree.__version__,
+        "numpy": vectorized.numpy and vectorized.numpy.__version__,
+        "platform": platform.platform(),
+        "date": datetime.now().isoformat(),
+        "repeat": repeat,
+        "sizes": dict((size, sizes[size]) for size in size_names),
+        "results": results
+    }
+
+
+def get_version():
+    """Retrieves the version number of thinX."""
+    try:
+        f = open(os.path.join(ROOT, "_version.py"))
+    except EnvironmentError:
+        return None
+
+    with f:
+        for line in f:
+            if line.startswith("__version__"):
+                return line.split("=", 1)[1].strip().strip("\"'")
+
+    return None
+
+
+def format_result(result):
+    return "{0:<8} {1:<28} {2:>10.4f}s {3:>10.1f}KiB".format(
+        result["size"],
+        result["benchmark"],
+        result["seconds"],
+        result["peak"] / 1024
+    )
+
+
+def compare(old, new, threshold=1.2):
+    """Return a line comparing each benchmark found in both sets of results,
+    flagging those which have slowed by more than threshold times.
+
+    """
+    before = dict(
+        ((result["size"], result["benchmark"]), result)
+        for result in old["results"]
+    )
+    lines = ["{0:<8} {1:<28} {2:>10} {3:>10} {4:>7}".format(
+        "size", "benchmark", old["version"], new["version"], "ratio"
+    )]
+    for result in new["results"]:
+        key = (result["size"], result["benchmark"])
+        if key not in before:
+            continue
+        ratio = result["seconds"] / max(before[key]["seconds"], 1e-9)
+        line = "{0:<8} {1:<28} {2:>9.4f}s {3:>9.4f}s {4:>6.2f}x{5}"
+        lines.append(line.format(
+            result["size"],
+            result["benchmark"],
+            before[key]["seconds"],
+            result["seconds"],
+            ratio,
+            " *" if ratio > threshold else ""
+        ))
+
+    return lines
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(
+        description="Time the xbrl module against synthetic filings."
+    )
+    parser.add_argument(
+        "-b", "--benchmark",
+        action="append",
+        choices=list(benchmarks),
+        help="a benchmark to run, may be repeated (default: all)"
+    )
+    parser.add_argument(
+        "-s", "--size",
+        action="append",
+        choices=list(sizes),
+        help="a filing size to run against, may be repeated "
+             "(default: small and medium)"
+    )
+    parser.add_argument(
+        "-r", "--repeat",
+        type=int,
+        default=3,
+        help="number of timed runs of each benchmark (default: 3)"
+    )
+    parser.add_argument(
+        "-o", "--output",
+        help="file to save the JSON results to"
+    )
+    parser.add_argument(
+        "--compare",
+        nargs=2,
+        metavar=("OLD", "NEW"),
+        help="compare two saved results instead of running"
+    )
+
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(sys.argv[1:] if args is None else args)
+    if args.compare:
+        with open(args.compare[0]) as f:
+            old = json.load(f)
+        with open(args.compare[1]) as f:
+            new = json.load(f)
+        for line in compare(old, new):
+            print(line)
+        return 0
+
+    results = run(args.benchmark, args.size, args.repeat, log=print)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
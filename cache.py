@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+
+import hashlib
+import os
+import pickle
+import tempfile
+
+try:
+    from . import profiling
+    from ._version import __version__
+except ImportError:
+    import profiling
+    from _version import __version__
+
+# Bumped whenever the structure of anything stored in the cache changes, so
+# that entries written by an older thinX are never read back.
+FORMAT = 1
+
+# Returned by Cache.get when an entry is missing, as None may be cached.
+MISSING = object()
+
+
+def default_directory():
+    """Return the directory the cache is kept in unless told otherwise."""
+    return os.path.join(os.path.expanduser("~"), ".thinx", "cache")
+
+
+class Cache(object):
+    """A size bounded on-disk cache of the indexes and analysis results
+    derived from XBRL files. Files are identified by a hash of their content,
+    so an entry is reused for as long as the files it was derived from are
+    unchanged, however they are named or wherever they are moved. Entries are
+    pickled into files named by a hash of their key, and once the cache grows
+    beyond max_size bytes the least recently used entries are evicted.
+
+    """
+
+    def __init__(self, directory=None, max_size=256 * 1024 * 1024):
+        self.directory = directory or default_directory()
+        self.max_size = max_size
+        self._hashes = {}
+        self._size = None
+
+    def __getstate__(self):
+        # Only the settings are sent to other processes, not the hashes.
+        return {"directory": self.directory, "max_size": self.max_size}
+
+    def __setstate__(self, state):
+        self.__init__(state["directory"], state["max_size"])
+
+    def file_hash(self, filename):
+        """Return the SHA-256 hash of the content of the file. The hash is
+        remembered until the file's size or modification time changes.
+
+        """
+        stat = os.stat(filename)
+        path = os.path.abspath(filename)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if path not in self._hashes or self._hashes[path][0] != signature:
+            digest = hashlib.sha256()
+            with open(filename, "rb") as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(block)
+            profiling.count("files hashed")
+            self._hashes[path] = (signature, digest.hexdigest())
+
+        return self._hashes[path][1]
+
+    def key(self, *parts):
+        """Return a key for an entry identified by the given parts, which
+        should include the hash of every file the entry was derived from.
+
+        """
+        return hashlib.sha256(
+            repr((FORMAT, __version__) + parts).encode("utf-8")
+        ).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".pickle")
+
+    def get(self, key, default=MISSING):
+        """Return the cached value of the key, or default if there is none.
+        """
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+            os.utime(path)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            profiling.count("cache misses")
+            return default
+
+        profiling.count("cache hits")
+        return value
+
+    def set(self, key, value):
+        """Store the value under the key, evicting the least recently used
+        entries if the cache has grown too large. The entry is written to a
+        temporary file first, so a concurrent reader never sees it partially
+        written.
+
+        """
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(handle, "wb") as f:
+                pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary, path)
+        except Exception:
+            os.remove(temporary)
+            raise
+
+        if self._size is not None:
+            self._size += os.path.getsize(path)
+        if self._size is None or self._size > self.max_size:
+            self.evict()
+
+    def entries(self):
+        """Return a list of the path, size, and last use of every entry."""
+        entries = []
+        for directory, subdirectories, filenames in os.walk(self.directory):
+            for filename in filenames:
+                if not filename.endswith(".pickle"):
+                    continue
+                path = os.path.join(directory, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+
+        return entries
+
+    def evict(self):
+        """Remove the least recently used entries until the cache is no
+        larger than max_size, returning the number removed.
+
+        """
+        entries = self.entries()
+        self._size = sum(entry[1] for entry in entries)
+        removed = 0
+        for path, size, used in sorted(entries, key=lambda entry: entry[2]):
+            if self._size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._size -= size
+            removed += 1
+
+        return removed
+
+    def clear(self):
+        """Remove every entry from the cache."""
+        for path, size, used in self.entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._size = 0
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+
+import collections
+import contextlib
+import functools
+import threading
+import time
+import tracemalloc
+
+# The profile being recorded by each thread, if any. Instrumented code does
+# nothing beyond checking this while no profile is active.
+_state = threading.local()
+
+
+class Profile(object):
+    """The instrumentation recorded during one run of a utility: the wall time
+    spent in each phase, such as parsing or serialization, counters of the
+    elements scanned and lookups performed, and the total wall time and peak
+    memory allocated by Python over the whole run.
+
+    """
+
+    def __init__(self, name=None):
+        self.name = name
+        self.phases = collections.OrderedDict()
+        self.calls = collections.Counter()
+        self.counts = collections.Counter()
+        self.seconds = None
+        self.peak = None
+        self._stack = []
+        self._mark = None
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Time the block as the named phase. Time spent in another phase
+        entered from within the block is charged to that phase instead, so
+        the phases never add up to more than the total.
+
+        """
+        self._switch()
+        self._stack.append(name)
+        self.calls[name] += 1
+        try:
+            yield
+        finally:
+            self._switch()
+            self._stack.pop()
+
+    def _switch(self):
+        now = time.perf_counter()
+        if self._stack:
+            name = self._stack[-1]
+            self.phases[name] = self.phases.get(name, 0) + now - self._mark
+        self._mark = now
+
+    def count(self, name, number=1):
+        """Add number to the named counter."""
+        self.counts[name] += number
+
+    def as_dict(self):
+        """Return the profile as a dictionary which can be serialized as
+        JSON.
+
+        """
+        return {
+            "name": self.name,
+            "seconds": self.seconds,
+            "peak": self.peak,
+            "phases": dict(
+                (name, {"seconds": seconds, "calls": self.calls[name]})
+                for name, seconds in self.phases.items()
+            ),
+            "counts": dict(self.counts)
+        }
+
+    def report(self):
+        """Return a list of lines summarizing the profile."""
+        lines = ["{0}: {1:.3f}s".format(self.name, self.seconds or 0)]
+        if self.peak is not None:
+            lines[0] += ", peak {0:.1f} KiB".format(self.peak / 1024)
+        for name, seconds in sorted(self.phases.items(),
+                                    key=lambda item: -item[1]):
+            lines.append("  {0}: {1:.3f}s ({2} calls)".format(
+                name, seconds, self.calls[name]
+            ))
+        if self.seconds is not None:
+            lines.append("  other: {0:.3f}s".format(
+                max(0, self.seconds - sum(self.phases.values()))
+            ))
+        for name, number in sorted(self.counts.items()):
+            lines.append("  {0}: {1}".format(name, number))
+
+        return lines
+
+
+def active():
+    """Return the profile being recorded by the current thread, if any."""
+    return getattr(_state, "profile", None)
+
+
+@contextlib.contextmanager
+def profile(name=None, memory=True):
+    """Record a new Profile of everything run by the current thread within
+    the block, yielding the profile. Peak memory is traced unless memory is
+    False, and only if tracemalloc is not already tracing.
+
+    """
+    result = Profile(name)
+    previous = active()
+    _state.profile = result
+    tracing = memory and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result.seconds = time.perf_counter() - start
+        if tracing:
+            result.peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        _state.profile = previous
+
+
+@contextlib.contextmanager
+def phase(name):
+    """Time the block as the named phase of the active profile, if any."""
+    current = active()
+    if current is None:
+        yield
+        return
+
+    with current.phase(name):
+        yield
+
+
+def count(name, number=1):
+    """Add number to the named counter of the active profile, if any."""
+    current = active()
+    if current is not None:
+        current.count(name, number)
+
+
+def timed(name):
+    """Decorate a function so every call is timed as the named phase."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            current = active()
+            if current is None:
+                return function(*args, **kwargs)
+
+            with current.phase(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+
+import collections
+import contextlib
+import csv
+import json
+
+try:
+    from . import profiling
+    from . import xbrl
+except ImportError:
+    import profiling
+    import xbrl
+
+# The formats a report can be written in, by the extension of their file.
+formats = ["csv", "jsonl"]
+
+
+class CalculationReport(object):
+    """Writes calculation inconsistencies, as returned by calc_values, as
+    rows of the definition of their link role, the standard label of their
+    total, the total, context, reported value, and calculated value. The
+    definition of every link role and the standard label of every concept
+    are looked up once, when the report is created, from the schema element
+    or LinkRoleIndex and the label element, LabelLinkbase, or result of
+    get_labels. Each row is written to every open file as soon as it is
+    given, and the number of inconsistencies of each total in each link role
+    is counted as it goes.
+
+    """
+    header = [
+        "RoleDefinition",
+        "ElementLabel",
+        "Element",
+        "ContextId",
+        "Value",
+        "CalculatedValue"
+    ]
+    standard_label = "http://www.xbrl.org/2003/role/label"
+
+    @profiling.timed("index")
+    def __init__(self, xsd_elem, lab_elem, csv_file=None, jsonl_file=None):
+        index = xbrl.get_link_role_index(xsd_elem)
+        self.definitions = dict(
+            (role, definition.text)
+            for role, definition in index.definitions.items()
+        )
+        labels = lab_elem
+        if not isinstance(labels, dict):
+            labels = xbrl.get_labels(lab_elem)
+        self.labels = {}
+        for concept, label_types in labels.items():
+            if self.standard_label in label_types:
+                self.labels[concept.split("#")[-1]] = \
+                    label_types[self.standard_label]
+        self.csv_writer = None
+        self.jsonl_file = jsonl_file
+        self.totals = collections.Counter()
+        self.rows = 0
+        if csv_file is not None:
+            self.csv_writer = csv.writer(
+                csv_file, dialect="excel", delimiter=","
+            )
+            self.csv_writer.writerow(self.header)
+
+    def row(self, warning):
+        """Return the row of the given inconsistency."""
+        link_role, total, context, value, calculated = warning[:5]
+
+        return [
+            self.definitions.get(link_role, link_role),
+            self.labels.get(total, ""),
+            total.replace("_", ":"),
+            context,
+            value,
+            calculated
+        ]
+
+    def write(self, warning):
+        """Write the row of the given inconsistency, and count it."""
+        row = self.row(warning)
+        if self.csv_writer is not None:
+            self.csv_writer.writerow(row)
+        if self.jsonl_file is not None:
+            self.jsonl_file.write(json.dumps(
+                collections.OrderedDict(zip(self.header, row)),
+                default=str
+            ))
+            self.jsonl_file.write("\n")
+        self.totals[(row[0].split(" ", 1)[0], row[2])] += 1
+        self.rows += 1
+
+        return row
+
+    def write_all(self, warnings):
+        """Write every inconsistency in the given iterable as it is produced,
+        and return the number written.
+
+        """
+        for warning in warnings:
+            self.write(warning)
+        profiling.count("rows written", self.rows)
+
+        return self.rows
+
+    def summary(self):
+        """Return a sorted list of lines, one for each total in each link
+        role, naming the sort code of the link role and the total along with
+        the number of its inconsistencies.
+
+        """
+        return sorted(
+            "{0} - {1} *{2}".format(sort, total, count)
+            for (sort, total), count in self.totals.items()
+        )
+
+
+def report_filenames(instance, kinds):
+    """Return a dictionary of the path of the calculation report of the given
+    instance document in each of the given formats.
+
+    """
+    base = instance.rsplit(".", 1)[0]
+
+    return collections.OrderedDict(
+        (kind, "{0}-calc.{1}".format(base, kind))
+        for kind in formats if kind in kinds
+    )
+
+
+def calc_report(warnings, xsd_elem, lab_elem, instance, kinds=("csv",)):
+    """Write a calculation report of the given inconsistencies, which may be
+    any iterable of them, next to the given instance document in each of
+    the given formats. Returns the paths of the files written and the lines
+    of the summary of the report.
+
+    """
+    filenames = report_filenames(instance, kinds)
+    with contextlib.ExitStack() as stack:
+        files = dict(
+            (kind, stack.enter_context(
+                open(filename, "w", newline="", encoding="utf-8")
+            )) for kind, filename in filenames.items()
+        )
+        report = CalculationReport(
+            xsd_elem,
+            lab_elem,
+            files.get("csv"),
+            files.get("jsonl")
+        )
+        report.write_all(warnings)
+
+    return (list(filenames.values()), report.summary())
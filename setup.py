@@ -41,6 +41,11 @@ exe = Executable(
     base=base
 )
 
+batch_exe = Executable(
+    script="batch.py",
+    icon="logo.ico"
+)
+
 setup(
     name="thinX",
     version=get_version("_version.py"),
@@ -68,5 +73,5 @@ setup(
     license="WTFPL",
     keywords="XBRL",
     options=options,
-    executables=[exe]
+    executables=[exe, batch_exe]
 )
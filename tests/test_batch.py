@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+import json
+import os
+import tempfile
+import unittest
+from thinX import batch
+
+
+class Batch(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = "tests/assets"
+        self.instance = os.path.abspath("tests/assets/abc-20130331.xml")
+        self.units = "tests/assets/units.ini"
+
+    def test_find_instances(self):
+        result = batch.find_instances([self.directory])
+
+        self.assertEqual(result, [self.instance])
+
+    def test_process(self):
+        names = ["concepts", "two-day-contexts", "units", "inconsistencies"]
+
+        result = batch.process(self.instance, names, {"units": self.units})
+
+        self.assertEqual(result["errors"], {})
+        self.assertEqual(result["written"], [])
+        self.assertEqual(len(result["results"]["concepts"]), 2)
+        self.assertEqual(len(result["results"]["two-day-contexts"]), 3)
+        self.assertIn("unknown", result["results"]["units"])
+        self.assertEqual(len(result["results"]["inconsistencies"]), 23)
+
+    def test_process_stream(self):
+        names = ["two-day-contexts", "inconsistencies"]
+
+        streamed = batch.process(self.instance, names, {"stream": True})
+        parsed = batch.process(self.instance, names, {})
+
+        self.assertEqual(streamed["results"], parsed["results"])
+
+    def test_process_engine(self):
+        names = ["inconsistencies"]
+
+        vectorized = batch.process(self.instance, names, {"engine": "numpy"})
+        parsed = batch.process(self.instance, names, {})
+
+        self.assertEqual(vectorized["results"], parsed["results"])
+
+    def test_process_all(self):
+        fake = os.path.abspath("tests/assets/xyz-20130331.xml")
+
+        result = batch.process_all(
+            [self.instance, fake],
+            ["calculations"],
+            {},
+            jobs=2
+        )
+
+        self.assertEqual(result[0]["instance"], self.instance)
+        self.assertEqual(len(result[0]["results"]["calculations"]), 3)
+        self.assertIn("calculations", result[1]["errors"])
+        self.assertEqual(batch.exit_code(result[:1]), 1)
+        self.assertEqual(batch.exit_code(result), 2)
+
+    def test_exit_code_without_findings(self):
+        result = batch.process_all(
+            [self.instance],
+            ["link-role-usage", "duplicate-facts"],
+            {},
+            jobs=1
+        )
+
+        self.assertEqual(result[0]["errors"], {})
+        self.assertTrue(result[0]["results"]["link-role-usage"])
+        self.assertEqual(result[0]["results"]["duplicate-facts"], {})
+        self.assertEqual(batch.exit_code(result), 0)
+
+    def test_main(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "results.json")
+
+            code = batch.main([
+                self.directory,
+                "-u", "two-day-contexts",
+                "-u", "inconsistencies",
+                "-j", "1",
+                "-o", output
+            ])
+            with open(output) as f:
+                result = json.load(f)
+
+        filing = result["filings"][0]
+        row = filing["results"]["inconsistencies"][0]
+        self.assertEqual(code, 1)
+        self.assertEqual(len(result["filings"]), 1)
+        self.assertEqual(filing["instance"], self.instance)
+        self.assertIsInstance(row[3], str)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+
+import shutil
+import tempfile
+import unittest
+from thinX import xbrl
+from thinX.benchmarks import generate, run
+
+
+class Benchmarks(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_generate(self):
+        instance = generate.generate(
+            self.directory,
+            facts=200,
+            contexts=20,
+            concepts=40,
+            roles=10,
+            languages=2,
+            calc_arcs=30
+        )
+        linkbases = xbrl.open_linkbases(instance, ["ins", "xsd", "cal", "lab"])
+        references = xbrl.count_references(linkbases["ins"]["root"])
+        facts = sum(references["contexts"].values())
+        link_roles = xbrl.get_link_roles(linkbases["xsd"]["root"])
+        network = xbrl.CalculationNetwork(linkbases["cal"]["root"])
+        labels = xbrl.get_labels(linkbases["lab"]["root"])
+        two_day = xbrl.two_day_contexts(linkbases["ins"]["root"])
+
+        self.assertEqual(facts, 200)
+        self.assertEqual(len(references["declared_contexts"]), 20)
+        self.assertEqual(len(link_roles), 10)
+        self.assertEqual(len(network), 30)
+        self.assertEqual(len(two_day), 2)
+        self.assertTrue(xbrl.find_dup_calcs(network))
+        self.assertEqual(len(labels), 40)
+
+    def test_generate_repeatable(self):
+        first = generate.Filing(seed=1)
+        second = generate.Filing(seed=1)
+
+        self.assertEqual(
+            xbrl.etree.tostring(first.calculation()),
+            xbrl.etree.tostring(second.calculation())
+        )
+
+    def test_run(self):
+        names = ["open_linkbases", "clean_labels", "calc_values"]
+
+        result = run.run(names, ["small"], 1, self.directory)
+
+        self.assertEqual(result["sizes"], {"small": run.sizes["small"]})
+        self.assertEqual(
+            [entry["benchmark"] for entry in result["results"]],
+            names
+        )
+        for entry in result["results"]:
+            self.assertGreater(entry["seconds"], 0)
+            self.assertGreater(entry["peak"], 0)
+
+    def test_compare(self):
+        old = {"version": "1", "results": [
+            {"size": "small", "benchmark": "get_calcs", "seconds": 1.0}
+        ]}
+        new = {"version": "2", "results": [
+            {"size": "small", "benchmark": "get_calcs", "seconds": 2.0}
+        ]}
+
+        result = run.compare(old, new)
+
+        self.assertEqual(len(result), 2)
+        self.assertTrue(result[1].endswith("2.00x *"))
+
+
+if __name__ == "__main__":
+    unittest.main()
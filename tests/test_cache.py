@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import tempfile
+import copy
+import unittest
+from lxml import etree
+from thinX import cache
+from thinX import profiling
+from thinX import utilities
+from thinX import xbrl
+
+
+class Cache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = cache.Cache(os.path.join(self.directory, "cache"))
+        self.instance = os.path.join(self.directory, "abc-20130331.xml")
+        for filename in os.listdir("tests/assets"):
+            if filename.startswith("abc-20130331"):
+                shutil.copy(os.path.join("tests/assets", filename),
+                            self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_file_hash(self):
+        first = self.cache.file_hash(self.instance)
+        copy = os.path.join(self.directory, "copy.xml")
+        shutil.copy(self.instance, copy)
+
+        self.assertEqual(self.cache.file_hash(copy), first)
+        with open(copy, "a") as f:
+            f.write("\n")
+        self.assertNotEqual(self.cache.file_hash(copy), first)
+
+    def test_get_set(self):
+        key = self.cache.key("test", 1)
+
+        self.assertIs(self.cache.get(key), cache.MISSING)
+        self.cache.set(key, None)
+        self.assertIsNone(self.cache.get(key))
+        self.assertNotEqual(self.cache.key("test", 2), key)
+
+    def test_evict(self):
+        self.cache.max_size = 3000
+        for number in range(10):
+            self.cache.set(self.cache.key(number), "x" * 1000)
+
+        self.assertLessEqual(len(self.cache.entries()), 3)
+        self.assertEqual(self.cache.get(self.cache.key(9)), "x" * 1000)
+        self.cache.clear()
+        self.assertEqual(self.cache.entries(), [])
+
+    def test_index(self):
+        first = xbrl.DTS(self.instance, self.cache)
+        facts = first.get_index("ins", xbrl.get_facts)
+
+        with profiling.profile(memory=False) as result:
+            second = xbrl.DTS(self.instance, self.cache)
+            self.assertEqual(second.get_index("ins", xbrl.get_facts), facts)
+
+        self.assertFalse(second.is_loaded("ins"))
+        self.assertNotIn("cache misses", result.counts)
+        self.assertNotIn("files parsed", result.counts)
+
+    def test_concept_usage(self):
+        files = ["xsd", "pre", "def", "cal", "lab"]
+        linkbases = xbrl.open_linkbases(self.instance, files)
+        usage = xbrl.get_concept_usage(linkbases)
+        first = xbrl.DTS(self.instance, self.cache)
+        self.assertEqual(utilities.concept_usage(first), usage)
+
+        with profiling.profile(memory=False) as result:
+            second = xbrl.DTS(self.instance, self.cache)
+            self.assertEqual(utilities.concept_usage(second), usage)
+
+        self.assertNotIn("cache misses", result.counts)
+        self.assertNotIn("files parsed", result.counts)
+
+    def test_mark_dirty(self):
+        dts = xbrl.DTS(self.instance, self.cache)
+        labels = dts.get_index("lab", xbrl.get_labels)
+        label_linkbase = xbrl.LabelLinkbase(dts["lab"]["root"])
+        label_linkbase.remove(next(iter(label_linkbase.labels.values()))[0])
+
+        self.assertIs(dts.get_index("lab", xbrl.get_labels), labels)
+        dts.mark_dirty("lab")
+        self.assertNotEqual(dts.get_index("lab", xbrl.get_labels), labels)
+
+    def test_run(self):
+        options = {"cache": self.cache}
+        names = ["two-day-contexts", "inconsistencies"]
+        first, errors, modified = utilities.run(
+            xbrl.DTS(self.instance, self.cache), names, options
+        )
+
+        with profiling.profile(memory=False) as result:
+            second, errors, modified = utilities.run(
+                xbrl.DTS(self.instance, self.cache), names, options
+            )
+
+        self.assertEqual(second, first)
+        self.assertNotIn("cache misses", result.counts)
+        self.assertNotIn("files parsed", result.counts)
+
+    def test_run_modified(self):
+        options = {"cache": self.cache}
+        utilities.run(xbrl.DTS(self.instance), ["inconsistencies"], options)
+
+        with profiling.profile(memory=False) as result:
+            utilities.run(
+                xbrl.DTS(self.instance),
+                ["contexts", "inconsistencies"],
+                options
+            )
+
+        self.assertNotIn("cache hits", result.counts)
+
+    def test_run_options(self):
+        tree = etree.parse(self.instance)
+        context = tree.getroot().find(
+            "{http://www.xbrl.org/2003/instance}context"
+        )
+        duplicate = copy.deepcopy(context)
+        duplicate.set("id", "Duplicate")
+        context.addnext(duplicate)
+        tree.write(self.instance)
+        options = {"cache": self.cache}
+        utilities.run(
+            xbrl.DTS(self.instance, self.cache),
+            ["duplicate-contexts"],
+            options
+        )
+
+        options["merge_contexts"] = True
+        dts = xbrl.DTS(self.instance, self.cache)
+        results, errors, modified = utilities.run(
+            dts, ["duplicate-contexts"], options
+        )
+
+        self.assertEqual(modified, set(["ins"]))
+        self.assertEqual(dts.dirty, set(["ins"]))
+        self.assertEqual(
+            list(results["duplicate-contexts"].values()),
+            [["Duplicate"]]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,20 @@
 #!/usr/bin/env python
 
+import os
+import pickle
+import shutil
+import tempfile
 import unittest
 from decimal import Decimal
 from lxml import etree
+from thinX import profiling
 from thinX import xbrl
 
 
+class Element(object):
+    nsmap = {"abc": "http://abc"}
+
+
 class Calculations(unittest.TestCase):
 
     def setUp(self):
@@ -80,3 +89,136 @@ class Calculations(unittest.TestCase):
         for debt in debts:
             self.assertIn(debt, log)
         self.assertEqual(len(log), 23)
+
+    def test_get_facts(self):
+        concept = "{http://fasb.org/us-gaap/2012-01-31}LongTermDebtNoncurrent"
+        text_fact = "{http://xbrl.sec.gov/dei/2012-01-31}EntityRegistrantName"
+
+        facts = xbrl.get_facts(self.root)
+
+        self.assertEqual(
+            xbrl.concept_qname(self.root, "us-gaap_LongTermDebtNoncurrent"),
+            concept
+        )
+        self.assertIn(concept, facts)
+        self.assertEqual(facts[concept]["I2013Q1"], [Decimal("2989")])
+        self.assertNotIn(text_fact, facts)
+
+    def test_get_facts_fractions(self):
+        concept = "{http://fasb.org/us-gaap/2012-01-31}LongTermDebtNoncurrent"
+        xbrli = "{http://www.xbrl.org/2003/instance}"
+        nil = "{http://www.w3.org/2001/XMLSchema-instance}nil"
+        fact = self.root.find(concept)
+        fraction = etree.Element(concept, attrib=dict(fact.attrib))
+        fraction.text = "\n"
+        etree.SubElement(fraction, "{0}numerator".format(xbrli)).text = "1"
+        etree.SubElement(fraction, "{0}denominator".format(xbrli)).text = "3"
+        fraction.attrib.pop("decimals", None)
+        nil_fact = etree.Element(concept, attrib=dict(fact.attrib))
+        nil_fact.text = " "
+        nil_fact.set(nil, "true")
+        nil_fact.attrib.pop("decimals", None)
+        fact.addnext(fraction)
+        fact.addnext(nil_fact)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        instance = os.path.join(directory, "abc-20130331.xml")
+        self.root.getroottree().write(instance)
+        network = xbrl.CalculationNetwork(self.cal_root)
+
+        facts = xbrl.get_facts(self.root)
+
+        self.assertEqual(facts[concept]["I2013Q1"], [Decimal("2989")])
+        self.assertEqual(xbrl.get_facts(xbrl.InstanceReader(instance)), facts)
+        self.assertEqual(len(xbrl.calc_values(self.root, network)), 23)
+
+    def test_calculation_network(self):
+        network = xbrl.CalculationNetwork(self.cal_root)
+        dts = xbrl.DTS(self.instance_file)
+
+        self.assertEqual(127, len(network))
+        self.assertEqual(11, len(network.roles))
+        self.assertEqual(["1", "-1", "1.0"], network.weights)
+        self.assertEqual(
+            xbrl.get_calcs(network),
+            xbrl.get_calcs(self.cal_root)
+        )
+        self.assertIs(network.get_calcs(), network.get_calcs())
+        self.assertIsNone(pickle.loads(pickle.dumps(network))._calcs)
+        self.assertIs(
+            dts.get_index("cal", xbrl.CalculationNetwork),
+            dts.get_index("cal", xbrl.CalculationNetwork)
+        )
+
+    def test_find_dup_calcs(self):
+        role = "http://www.example.com/role/"
+        expected = [(
+            role + "BalanceSheetComponentsEffectsOnNetIncomeOfAmounts"
+            "ReclassifiedFromAociDetailsCalc2",
+            role + "BalanceSheetComponentsEffectsOnNetIncomeOfAmounts"
+            "ReclassifiedFromAociDetails",
+            "subset"
+        )]
+
+        duplicate_calcs = xbrl.find_dup_calcs(self.cal_root)
+
+        self.assertEqual(3, len(duplicate_calcs))
+        self.assertEqual(expected, duplicate_calcs["us-gaap_NetIncomeLoss"])
+        self.assertEqual(
+            2,
+            len(duplicate_calcs[
+                "us-gaap_NetCashProvidedByUsedInInvestingActivities"
+            ])
+        )
+
+    def test_calc_values_reader(self):
+        reader = xbrl.InstanceReader(self.instance_file)
+        calcs = xbrl.get_calcs(self.cal_root)
+
+        self.assertEqual(
+            xbrl.calc_values(reader, calcs),
+            xbrl.calc_values(self.root, calcs)
+        )
+
+    def test_rollup_values(self):
+        calcs = xbrl.get_calcs(self.cal_root)
+        tree = xbrl.CalculationTree(calcs)
+        log = xbrl.calc_values(self.root, calcs)
+
+        rollups = xbrl.rollup_values(self.root, tree)
+
+        self.assertLess(
+            len(tree),
+            sum(len(totals) for totals in calcs.values())
+        )
+        self.assertEqual([rollup[:5] for rollup in rollups], log)
+        for rollup in rollups:
+            self.assertEqual(rollup[5], rollup[1])
+
+    def test_rollup_levels(self):
+        line_items = [("abc_A", "1"), ("abc_B", "-1")]
+        calcs = {
+            "r1": {
+                "abc_Total": [("abc_Sub", "1"), ("abc_C", "1")],
+                "abc_Sub": line_items
+            },
+            "r2": {"abc_Sub": line_items}
+        }
+        facts = {
+            "{http://abc}Total": {"c1": [Decimal("8")], "c2": [Decimal("6")]},
+            "{http://abc}Sub": {"c2": [Decimal("4")]},
+            "{http://abc}A": {"c1": [Decimal("5")], "c2": [Decimal("5")]},
+            "{http://abc}B": {"c1": [Decimal("2")], "c2": [Decimal("2")]},
+            "{http://abc}C": {"c1": [Decimal("4")], "c2": [Decimal("1")]}
+        }
+
+        with profiling.profile(memory=False) as result:
+            rollups = xbrl.rollup_values(Element(), calcs, facts)
+
+        self.assertEqual(rollups, [
+            ["r1", "abc_Total", "c1", Decimal("8"), Decimal("7"), "abc_Total"],
+            ["r1", "abc_Total", "c2", Decimal("6"), Decimal("5"), "abc_Sub"],
+            ["r1", "abc_Sub", "c2", Decimal("4"), Decimal("3"), "abc_Sub"],
+            ["r2", "abc_Sub", "c2", Decimal("4"), Decimal("3"), "abc_Sub"]
+        ])
+        self.assertEqual(result.counts["subtotals computed"], 4)
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import tempfile
+import unittest
+from thinX import profiling
+from thinX import utilities
+from thinX import xbrl
+
+
+class Cleanup(unittest.TestCase):
+
+    def setUp(self):
+        self.directories = []
+
+    def tearDown(self):
+        for directory in self.directories:
+            shutil.rmtree(directory)
+
+    def copy(self):
+        directory = tempfile.mkdtemp()
+        self.directories.append(directory)
+        for filename in os.listdir("tests/assets"):
+            shutil.copy(os.path.join("tests/assets", filename), directory)
+
+        return os.path.join(directory, "abc-20130331.xml")
+
+    def read(self, instance):
+        dts = xbrl.DTS(instance)
+        return dict(
+            (key, open(filename, "rb").read())
+            for key, filename in dts.filenames.items()
+        )
+
+    def test_cleanup(self):
+        with profiling.profile(memory=False) as result:
+            results, errors, written = utilities.cleanup(
+                xbrl.DTS(self.copy())
+            )
+
+        self.assertEqual(errors, {})
+        self.assertEqual(set(results), set(utilities.cleanups))
+        self.assertEqual(result.counts["files parsed"], 6)
+        self.assertEqual(result.counts["files written"], len(written))
+
+    def test_matches_separate_runs(self):
+        combined = self.copy()
+        separate = self.copy()
+
+        results, errors, written = utilities.cleanup(xbrl.DTS(combined))
+        for name in utilities.cleanups:
+            utilities.cleanup(xbrl.DTS(separate), [name])
+
+        self.assertEqual(self.read(combined), self.read(separate))
+
+
+if __name__ == "__main__":
+    unittest.main()
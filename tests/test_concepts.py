@@ -21,3 +21,14 @@ class Concepts(unittest.TestCase):
 
         self.assertEqual(2, concepts_without_references)
         self.assertIn(expected_concept, removed_concepts)
+
+    def test_where_used(self):
+        usage = xbrl.get_concept_usage(self.linkbases)
+        concept = "abc_XYZHoldingsIncMember"
+        role = "http://www.example.com/role/ConsolidatedStatementsOfIncome"
+
+        result = xbrl.where_used(usage, concept)
+
+        self.assertIn(("pre", role), result)
+        self.assertIn(("lab", "http://www.xbrl.org/2003/role/link"), result)
+        self.assertEqual(xbrl.where_used(usage, "abc_RemoveMe"), [])
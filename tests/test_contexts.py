@@ -1,5 +1,6 @@
 #!/usr/bin/env python
 
+import copy
 import unittest
 from lxml import etree
 from thinX import xbrl
@@ -48,3 +49,180 @@ class Contexts(unittest.TestCase):
         for context in two_day_contexts:
             self.assertIn(context, result)
         self.assertEqual(len(result), 3)
+
+    def test_clean_instance(self):
+        expected_unused_units = ["Pure", "Fake", "Test", "Typo"]
+        footnote_link = etree.fromstring(
+            '<link:footnoteLink xmlns:link="http://www.xbrl.org/2003/linkbase"'
+            ' xmlns:xlink="http://www.w3.org/1999/xlink" xlink:type="extended"'
+            ' xlink:role="http://www.xbrl.org/2003/role/link">'
+            '<link:loc xlink:type="locator" xlink:href="#Fact1"'
+            ' xlink:label="fact1"/>'
+            '<link:loc xlink:type="locator" xlink:href="#Missing"'
+            ' xlink:label="missing"/>'
+            '<link:footnote xlink:type="resource" xlink:label="used">A'
+            '</link:footnote>'
+            '<link:footnote xlink:type="resource" xlink:label="orphan">B'
+            '</link:footnote>'
+            '<link:footnote xlink:type="resource" xlink:label="dangling">C'
+            '</link:footnote>'
+            '<link:footnoteArc xlink:type="arc" xlink:from="fact1"'
+            ' xlink:to="used"/>'
+            '<link:footnoteArc xlink:type="arc" xlink:from="missing"'
+            ' xlink:to="dangling"/>'
+            '</link:footnoteLink>'
+        )
+        self.root.append(footnote_link)
+        fact_xpath = ".//*[@contextRef='I2013Q1']"
+        self.root.find(fact_xpath).set("id", "Fact1")
+
+        result = xbrl.clean_instance(self.root)
+
+        self.assertEqual(len(result["contexts"]), 8)
+        self.assertEqual(result["units"], expected_unused_units)
+        self.assertEqual(sorted(result["footnotes"]), ["dangling", "orphan"])
+        self.assertEqual(len(footnote_link), 3)
+
+    def test_clean_instance_tuple_footnote(self):
+        footnote_link = etree.fromstring(
+            '<link:footnoteLink xmlns:link="http://www.xbrl.org/2003/linkbase"'
+            ' xmlns:xlink="http://www.w3.org/1999/xlink" xlink:type="extended"'
+            ' xlink:role="http://www.xbrl.org/2003/role/link">'
+            '<link:loc xlink:type="locator" xlink:href="#Tuple1"'
+            ' xlink:label="tuple1"/>'
+            '<link:footnote xlink:type="resource" xlink:label="note">A'
+            '</link:footnote>'
+            '<link:footnoteArc xlink:type="arc" xlink:from="tuple1"'
+            ' xlink:to="note"/>'
+            '</link:footnoteLink>'
+        )
+        fact = self.root.find(".//*[@contextRef='I2013Q1']")
+        tuple_fact = etree.SubElement(
+            self.root,
+            "{http://www.example.com/20130331}Tuple",
+            id="Tuple1"
+        )
+        tuple_fact.append(copy.deepcopy(fact))
+        self.root.append(footnote_link)
+
+        result = xbrl.clean_instance(self.root)
+
+        self.assertEqual(result["footnotes"], [])
+        self.assertEqual(len(footnote_link), 3)
+
+    def test_instance_reader(self):
+        reader = xbrl.InstanceReader("tests/assets/abc-20130331.xml")
+        records = list(reader)
+        contexts = [r for r in records if isinstance(r, xbrl.Context)]
+        units = [r for r in records if isinstance(r, xbrl.Unit)]
+        facts = [r for r in records if isinstance(r, xbrl.Fact)]
+        context_xpath = ".//{http://www.xbrl.org/2003/instance}context"
+        unused = xbrl.unused_references(reader)
+
+        self.assertEqual(len(contexts), len(self.root.findall(context_xpath)))
+        self.assertEqual(len(units), 17)
+        self.assertEqual(len(facts), 369)
+        self.assertEqual(
+            reader.nsmap["abc"],
+            "http://www.example.com/20130331"
+        )
+        self.assertEqual(
+            xbrl.two_day_contexts(reader),
+            xbrl.two_day_contexts(self.root)
+        )
+        self.assertEqual(unused, xbrl.unused_references(self.root))
+        self.assertEqual(len(unused["contexts"]), 8)
+
+    def duplicate(self, identifier, new_identifier):
+        """Insert a copy of a context under another id, with its dates as
+        the equivalent dateTimes.
+
+        """
+        instance = "{http://www.xbrl.org/2003/instance}"
+        context = self.root.find(
+            "{0}context[@id='{1}']".format(instance, identifier)
+        )
+        duplicate = copy.deepcopy(context)
+        duplicate.set("id", new_identifier)
+        for date in duplicate.iterfind(".//{0}instant".format(instance)):
+            date.text = "2013-04-01T00:00:00"
+        for date in duplicate.iterfind(".//{0}endDate".format(instance)):
+            date.text = "2013-04-01T00:00:00"
+        context.addnext(duplicate)
+
+        return duplicate
+
+    def test_context_catalog(self):
+        self.duplicate("D2013Q1_CommonClassAMember", "Duplicate")
+        self.duplicate("I2013Q1", "Instant")
+        different = self.duplicate("D2013Q1_CommonClassAMember", "Different")
+        different[0][1][0].text = "us-gaap:CommonClassBMember"
+
+        catalog = xbrl.ContextCatalog(self.root)
+
+        self.assertEqual(catalog.duplicates(), {
+            "I2013Q1": ["Instant"],
+            "D2013Q1_CommonClassAMember": ["Duplicate"]
+        })
+        self.assertEqual(
+            catalog.contexts["Duplicate"].end,
+            "2013-04-01T00:00:00"
+        )
+        self.assertNotEqual(
+            catalog.hashes["Different"],
+            catalog.hashes["Duplicate"]
+        )
+
+    def test_merge_contexts(self):
+        self.duplicate("D2013Q1", "Duplicate")
+        fact = self.root.find(".//*[@contextRef='D2013Q1']")
+        fact.set("contextRef", "Duplicate")
+        references = xbrl.count_references(self.root)["contexts"]
+
+        merged = xbrl.merge_contexts(self.root)
+
+        self.assertEqual(merged, {"D2013Q1": ["Duplicate"]})
+        self.assertEqual(len(self.root.findall(".//*[@id='Duplicate']")), 0)
+        self.assertEqual(
+            xbrl.count_references(self.root)["contexts"]["D2013Q1"],
+            references["D2013Q1"] + references["Duplicate"]
+        )
+        self.assertEqual(xbrl.merge_contexts(self.root), {})
+
+    def test_mixed_segment(self):
+        two_day = xbrl.two_day_contexts(self.root)
+        context = self.duplicate("D2013Q1_CommonClassAMember", "Mixed")
+        segment = context[0][1]
+        etree.SubElement(segment, "{http://www.example.com/20130331}custom")
+        self.duplicate("Mixed", "MixedDuplicate")
+
+        catalog = xbrl.ContextCatalog(self.root)
+
+        self.assertEqual(catalog.duplicates()["Mixed"], ["MixedDuplicate"])
+        self.assertEqual(xbrl.two_day_contexts(self.root), two_day)
+
+    def test_timezone_dates(self):
+        two_day = xbrl.two_day_contexts(self.root)
+        instance = "{http://www.xbrl.org/2003/instance}"
+        instant = self.duplicate("I2013Q1", "Zoned")
+        instant.find(".//{0}instant".format(instance)).text = "2013-03-31Z"
+        offset = self.duplicate("I2013Q1", "Offset")
+        offset.find(".//{0}instant".format(instance)).text = \
+            "2013-03-31T20:00:00-04:00"
+
+        catalog = xbrl.ContextCatalog(self.root)
+
+        self.assertEqual(catalog.hashes["Zoned"], catalog.hashes["Offset"])
+        self.assertNotEqual(
+            catalog.hashes["Zoned"],
+            catalog.hashes["I2013Q1"]
+        )
+        self.assertEqual(
+            xbrl.normalize_date("2013-03-31+02:00", True),
+            "2013-03-31T22:00:00Z"
+        )
+        self.assertEqual(
+            xbrl.normalize_date("2013-03-31T12:00:00.5"),
+            "2013-03-31T12:00:00"
+        )
+        self.assertEqual(xbrl.two_day_contexts(self.root), two_day)
@@ -1,5 +1,8 @@
 #!/usr/bin/env python
 
+import os
+import shutil
+import tempfile
 import unittest
 from lxml import etree
 from thinX import xbrl
@@ -22,3 +25,89 @@ class Dts(unittest.TestCase):
         self.assertTrue(etree.iselement(result["pre"]["root"]))
         self.assertEqual(result["pre"]["filename"].split("/")[-1], pre_name)
         self.assertRaises(OSError, xbrl.open_linkbases, fake_filename, files)
+
+    def test_dts(self):
+        dts = xbrl.DTS(self.filename)
+        expected = ["xsd", "pre", "def", "cal", "lab"]
+
+        self.assertEqual(sorted(dts), sorted(expected))
+        self.assertIn("ins", dts)
+        self.assertFalse(dts.is_loaded("ins"))
+        self.assertFalse(dts.is_loaded("cal"))
+
+        linkbases = xbrl.open_linkbases(dts, ["cal"])
+
+        self.assertTrue(dts.is_loaded("cal"))
+        self.assertFalse(dts.is_loaded("lab"))
+        self.assertIs(linkbases["cal"]["root"], dts["cal"]["root"])
+        self.assertIs(
+            xbrl.open_linkbases(dts, ["cal"])["cal"]["tree"],
+            linkbases["cal"]["tree"]
+        )
+        self.assertEqual(
+            xbrl.get_linkbase(dts, "lab"),
+            "tests/assets/abc-20130331_lab.xml"
+        )
+        self.assertEqual(
+            xbrl.get_file_namespace(dts)["prefix"],
+            "abc"
+        )
+        self.assertFalse(dts.is_loaded("ins"))
+
+    def test_save(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for filename in os.listdir("tests/assets"):
+                shutil.copy(os.path.join("tests/assets", filename), directory)
+            dts = xbrl.DTS(os.path.join(directory, "abc-20130331.xml"))
+            xbrl.open_linkbases(dts, ["pre", "lab"])
+            mtime = os.path.getmtime(dts["pre"]["filename"]) - 10
+            for key in ["pre", "lab"]:
+                os.utime(dts[key]["filename"], (mtime, mtime))
+                dts[key]["mtime"] = mtime
+
+            self.assertEqual(dts.save(), [])
+
+            dts.mark_dirty("lab")
+            written = dts.save()
+
+            self.assertEqual(written, [dts["lab"]["filename"]])
+            self.assertEqual(dts.dirty, set())
+            self.assertEqual(os.path.getmtime(dts["pre"]["filename"]), mtime)
+            self.assertNotEqual(dts["lab"]["mtime"], mtime)
+            self.assertEqual(
+                sorted(os.listdir(directory)),
+                sorted(os.listdir("tests/assets"))
+            )
+
+    def test_atomic_write(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "file.xml")
+            with open(filename, "w") as f:
+                f.write("original")
+
+            with self.assertRaises(ValueError):
+                with xbrl.atomic_write(filename, "w") as f:
+                    f.write("partial")
+                    raise ValueError()
+
+            with open(filename) as f:
+                self.assertEqual(f.read(), "original")
+            self.assertEqual(os.listdir(directory), ["file.xml"])
+
+    def test_atomic_write_permissions(self):
+        umask = xbrl._umask
+        xbrl._umask = 0o022
+        self.addCleanup(setattr, xbrl, "_umask", umask)
+        with tempfile.TemporaryDirectory() as directory:
+            existing = os.path.join(directory, "existing.xml")
+            created = os.path.join(directory, "created.xml")
+            with open(existing, "w") as f:
+                f.write("original")
+            os.chmod(existing, 0o640)
+
+            for filename in (existing, created):
+                with xbrl.atomic_write(filename, "w") as f:
+                    f.write("new")
+
+            self.assertEqual(os.stat(existing).st_mode & 0o777, 0o640)
+            self.assertEqual(os.stat(created).st_mode & 0o777, 0o644)
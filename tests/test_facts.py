@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+
+import copy
+import os
+import shutil
+import tempfile
+import unittest
+from lxml import etree
+from thinX import utilities
+from thinX import xbrl
+
+
+class Facts(unittest.TestCase):
+
+    def setUp(self):
+        instance_file = "tests/assets/abc-20130331.xml"
+        tree = etree.parse(instance_file)
+        self.root = tree.getroot()
+
+    def duplicate(self, tag, text=None, **attributes):
+        """Insert a copy of the first fact with the given tag after it, with
+        the given text and attributes.
+
+        """
+        fact = self.root.find(tag)
+        duplicate = copy.deepcopy(fact)
+        duplicate.attrib.pop("id", None)
+        if text is not None:
+            duplicate.text = text
+        for name, value in attributes.items():
+            duplicate.set(name, value)
+        fact.addnext(duplicate)
+
+        return duplicate
+
+    def add_duplicates(self):
+        dei = "{http://xbrl.sec.gov/dei/2012-01-31}"
+        gaap = "{http://fasb.org/us-gaap/2012-01-31}"
+        self.duplicate("{0}DocumentType".format(dei))
+        self.duplicate("{0}EntityCommonStockSharesOutstanding".format(dei))
+        self.duplicate(
+            "{0}AvailableForSaleSecuritiesCurrent".format(gaap),
+            "35000",
+            decimals="-3"
+        )
+        self.duplicate(
+            "{0}CashCashEquivalentsAndShortTermInvestments".format(gaap),
+            "50099"
+        )
+        self.duplicate(
+            "{0}CashCashEquivalentsAndShortTermInvestments".format(gaap),
+            unitRef="EUR"
+        )
+
+    def test_no_duplicates(self):
+        log = xbrl.duplicate_facts(self.root)
+
+        self.assertEqual(list(log), [
+            "duplicates",
+            "inconsistent values",
+            "inconsistent decimals"
+        ])
+        self.assertFalse(any(log.values()))
+
+    def test_duplicate_facts(self):
+        self.add_duplicates()
+
+        log = xbrl.duplicate_facts(self.root)
+
+        self.assertEqual(log["duplicates"], [
+            ["DocumentType", "D2013Q1", None, None,
+             [("10-Q", None), ("10-Q", None)]],
+            ["EntityCommonStockSharesOutstanding", "I2013Q1", "Shares", None,
+             [("100000000", "INF"), ("100000000", "INF")]]
+        ])
+        self.assertEqual(log["inconsistent values"], [
+            ["CashCashEquivalentsAndShortTermInvestments", "I2013Q1", "USD",
+             None, [("50098", "0"), ("50099", "0")]]
+        ])
+        self.assertEqual(log["inconsistent decimals"], [
+            ["AvailableForSaleSecuritiesCurrent", "I2013Q1", "USD", None,
+             [("34723", "0"), ("35000", "-3")]]
+        ])
+
+    def test_duplicate_facts_reader(self):
+        self.add_duplicates()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        instance = os.path.join(directory, "abc-20130331.xml")
+        self.root.getroottree().write(instance)
+
+        self.assertEqual(
+            xbrl.duplicate_facts(xbrl.InstanceReader(instance)),
+            xbrl.duplicate_facts(self.root)
+        )
+
+    def test_duplicate_facts_fractions(self):
+        gaap = "{http://fasb.org/us-gaap/2012-01-31}"
+        xbrli = "{http://www.xbrl.org/2003/instance}"
+        nil = "{http://www.w3.org/2001/XMLSchema-instance}nil"
+        tag = "{0}LongTermDebtNoncurrent".format(gaap)
+        fraction = self.duplicate(tag, "\n")
+        fraction.attrib.pop("decimals")
+        etree.SubElement(fraction, "{0}numerator".format(xbrli)).text = "1"
+        etree.SubElement(fraction, "{0}denominator".format(xbrli)).text = "3"
+        nil_fact = self.duplicate(tag, " ")
+        nil_fact.attrib.pop("decimals")
+        nil_fact.set(nil, "true")
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        instance = os.path.join(directory, "abc-20130331.xml")
+        self.root.getroottree().write(instance)
+
+        log = xbrl.duplicate_facts(self.root)
+
+        self.assertEqual(log["inconsistent values"], [
+            ["LongTermDebtNoncurrent", "I2013Q1", "USD", None,
+             [("2989", "0"), (None, None), ("1/3", None)]]
+        ])
+        self.assertEqual(
+            xbrl.duplicate_facts(xbrl.InstanceReader(instance)),
+            log
+        )
+
+    def test_compare_facts(self):
+        fact = xbrl.Fact("a", "c", "u", None, "2", None, "1.25")
+        nil = fact._replace(value=None)
+
+        self.assertEqual(
+            xbrl.compare_facts([fact, fact._replace(value="1.250")]),
+            "duplicates"
+        )
+        self.assertEqual(
+            xbrl.compare_facts([fact, fact._replace(value="1.2",
+                                                    decimals="1")]),
+            "inconsistent decimals"
+        )
+        self.assertEqual(
+            xbrl.compare_facts([fact, fact._replace(value="1.3",
+                                                    decimals="1")]),
+            "inconsistent values"
+        )
+        self.assertEqual(xbrl.compare_facts([nil, nil]), "duplicates")
+        self.assertEqual(
+            xbrl.compare_facts([fact, nil]),
+            "inconsistent values"
+        )
+
+    def test_utility(self):
+        dts = xbrl.DTS("tests/assets/abc-20130331.xml")
+
+        results, errors, modified = utilities.run(dts, ["duplicate-facts"])
+
+        self.assertEqual(results, {"duplicate-facts": {}})
+        self.assertEqual(errors, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -71,6 +71,82 @@ class Labels(unittest.TestCase):
         self.assertEqual(2, expected_labels)
         self.assertEqual(label, log[expected][period_start_label])
 
+    def test_label_equivalences(self):
+        positive = "http://www.xbrl.org/2003/role/positiveLabel"
+        negative = "http://www.xbrl.org/2003/role/negativeLabel"
+        positive_terse = "http://www.xbrl.org/2003/role/positiveTerseLabel"
+        labels = {
+            "a": {
+                positive_terse: "A",
+                positive: "A",
+                self.verbose_label: "A",
+                negative: "A",
+                self.terse_label: "A",
+                self.standard_label: "A"
+            },
+            "b": {positive: "B", negative: "B", positive_terse: "B"},
+            "c": {self.negated_terse_label: "C", self.negated_label: "C"},
+            "d": {self.terse_label: "D", self.verbose_label: "E"}
+        }
+
+        self.assertEqual(xbrl.label_equivalences(labels), {
+            "a": {
+                positive_terse: self.terse_label,
+                positive: self.terse_label,
+                self.verbose_label: self.terse_label,
+                negative: self.terse_label
+            },
+            "b": {positive_terse: positive},
+            "c": {self.negated_terse_label: self.negated_label}
+        })
+
+    def test_duplicate_labels(self):
+        log = xbrl.duplicate_labels(self.lab_root)
+        total_label = "http://www.xbrl.org/2003/role/totalLabel"
+        expected = [
+            "http://xbrl.fasb.org/us-gaap/2012/elts/us-gaap-2012-01-31.xsd"
+            "#us-gaap_CostOfRevenue",
+            "http://xbrl.fasb.org/us-gaap/2012/elts/us-gaap-2012-01-31.xsd"
+            "#us-gaap_CostOfSalesMember"
+        ]
+
+        self.assertEqual(
+            sorted(log),
+            [self.terse_label, total_label]
+        )
+        self.assertEqual(list(log[self.terse_label]), ["en-US"])
+        self.assertEqual(len(log[self.terse_label]["en-US"]), 14)
+        self.assertEqual(
+            log[self.terse_label]["en-US"]["Cost of revenues"],
+            expected
+        )
+        self.assertNotIn(self.standard_label, log)
+
+    def test_duplicate_labels_languages(self):
+        lang = "{http://www.w3.org/XML/1998/namespace}lang"
+        label_linkbase = xbrl.LabelLinkbase(self.lab_root)
+        first, second = [
+            label for labels in label_linkbase.labels.values()
+            for label in labels
+            if label.get(label_linkbase.role) == self.standard_label
+        ][:2]
+        second.text = first.text
+        second.set(lang, "fr")
+
+        log = xbrl.duplicate_labels(label_linkbase)
+
+        self.assertNotIn(self.standard_label, log)
+
+        second.set(lang, first.get(lang))
+
+        log = xbrl.duplicate_labels(label_linkbase)
+
+        self.assertEqual(
+            log[self.standard_label][first.get(lang)][first.text],
+            sorted([label_linkbase.concept(first),
+                    label_linkbase.concept(second)])
+        )
+
     def test_redundant_labels(self):
         log = xbrl.redundant_labels(self.lab_root, self.pre_root)
         concepts_with_redundant_labels = len(log)
@@ -147,3 +223,39 @@ class Labels(unittest.TestCase):
         ]
         self.assertIn(debt, label_log)
         self.assertEqual(len(label_log), 23)
+
+    def test_label_linkbase(self):
+        concept = "http://xbrl.fasb.org/us-gaap/2012/elts/" \
+                  "us-gaap-2012-01-31.xsd#us-gaap_Goodwill"
+        label_linkbase = xbrl.LabelLinkbase(self.lab_root)
+        loc_label = label_linkbase.locs[concept][0].get(
+            "{http://www.w3.org/1999/xlink}label"
+        )
+
+        self.assertIn(loc_label, label_linkbase.arcs_from)
+
+        removed = label_linkbase.delete({concept: "All"})
+
+        self.assertEqual(len(removed[concept]), 4)
+        self.assertNotIn(concept, label_linkbase.locs)
+        self.assertNotIn(loc_label, label_linkbase.arcs_from)
+        self.assertNotIn(concept, xbrl.get_labels(self.lab_root))
+
+    def test_presentation_linkbase(self):
+        concept = "abc-20130331.xsd#abc_XYZHoldingsIncMember"
+        presentation_linkbase = xbrl.PresentationLinkbase(self.pre_root)
+
+        changed = presentation_linkbase.change(
+            concept,
+            self.terse_label,
+            self.verbose_label
+        )
+        used_labels = xbrl.get_used_labels(presentation_linkbase)
+
+        self.assertEqual(1, changed)
+        self.assertIn(self.verbose_label, used_labels[concept])
+        self.assertNotIn(self.terse_label, used_labels[concept])
+        self.assertEqual(
+            used_labels,
+            xbrl.get_used_labels(self.pre_root)
+        )
@@ -12,7 +12,8 @@ class Link_Roles(unittest.TestCase):
             ("xsd", ".xsd"),
             ("pre", "_pre.xml"),
             ("def", "_def.xml"),
-            ("cal", "_cal.xml")
+            ("cal", "_cal.xml"),
+            ("lab", "_lab.xml")
         ]
         self.linkbases = {}
         for ext in exts:
@@ -41,9 +42,11 @@ class Link_Roles(unittest.TestCase):
 
     def test_get_active_link_roles(self):
         result = xbrl.get_active_link_roles(self.linkbases)
+        standard_role = "http://www.xbrl.org/2003/role/link"
 
         for role in self.active_link_roles:
             self.assertIn(role, result)
+        self.assertNotIn(standard_role, result)
         self.assertEqual(len(result), 20)
 
     def test_compare_link_roles(self):
@@ -69,3 +72,51 @@ class Link_Roles(unittest.TestCase):
         result = "4040 - Disclosure - Not Used (Details)"
         self.assertEqual(xbrl.link_role_def(self.linkbases["xsd"]["root"],
                                             role_uri), result)
+
+    def test_link_role_index(self):
+        index = xbrl.LinkRoleIndex(self.linkbases)
+        role = "http://www.example.com/role/BalanceSheetComponents"
+
+        self.assertEqual(
+            list(index.roles),
+            xbrl.get_link_roles(self.linkbases["xsd"]["root"])
+        )
+        self.assertEqual(index.unused(), self.inactive_link_roles)
+        self.assertEqual(
+            index.definition(role),
+            "1020 - Disclosure - Balance Sheet Components"
+        )
+        self.assertEqual(index.role_refs[role], {"pre": 1, "def": 1, "cal": 1})
+        self.assertEqual(index.usage[role]["pre"]["links"], 1)
+        self.assertEqual(index.usage[role]["pre"]["arcs"], 2)
+        self.assertEqual(len(index.usage[role]["pre"]["concepts"]), 3)
+        self.assertNotIn("cal", index.usage[role])
+
+        self.assertEqual(
+            index.delete(self.inactive_link_roles),
+            self.inactive_link_roles
+        )
+        self.assertEqual(index.unused(), [])
+        self.assertEqual(
+            len(xbrl.get_link_roles(self.linkbases["xsd"]["root"])),
+            20
+        )
+
+    def test_link_role_report(self):
+        report = xbrl.LinkRoleIndex(self.linkbases).report()
+        role = "http://www.example.com/role/NotUsedDetails"
+
+        self.assertEqual(
+            list(report["roles"])[:22],
+            xbrl.get_link_roles(self.linkbases["xsd"]["root"])
+        )
+        self.assertIn("http://www.xbrl.org/2003/role/link", report["roles"])
+        self.assertEqual(report["roles"][role]["usage"], {})
+        self.assertEqual(
+            report["roles"][role]["definition"],
+            "4040 - Disclosure - Not Used (Details)"
+        )
+        self.assertEqual(
+            report["arcroles"]["http://xbrl.org/int/dim/arcrole/all"],
+            {"def": 1}
+        )
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+
+import unittest
+from thinX import batch
+from thinX import profiling
+from thinX import xbrl
+
+
+class Profiling(unittest.TestCase):
+
+    def setUp(self):
+        self.instance = "tests/assets/abc-20130331.xml"
+
+    def test_profile(self):
+        with profiling.profile("inconsistencies") as result:
+            linkbases = xbrl.open_linkbases(self.instance, ["ins", "cal"])
+            network = xbrl.CalculationNetwork(linkbases["cal"]["root"])
+            xbrl.calc_values(linkbases["ins"]["root"], network)
+
+        self.assertEqual(result.name, "inconsistencies")
+        self.assertEqual(
+            set(result.phases),
+            set(["parse", "index", "search", "analyze"])
+        )
+        self.assertEqual(result.counts["files parsed"], 3)
+        self.assertGreater(result.counts["elements scanned"], 0)
+        self.assertGreater(result.counts["fact lookups"], 0)
+        self.assertGreater(result.counts["xpath searches"], 0)
+        self.assertLessEqual(sum(result.phases.values()), result.seconds)
+        self.assertGreater(result.peak, 0)
+        self.assertIsNone(profiling.active())
+
+    def test_phase(self):
+        with profiling.profile(memory=False) as result:
+            with profiling.phase("outer"):
+                with profiling.phase("inner"):
+                    profiling.count("lookups", 2)
+            with profiling.phase("outer"):
+                pass
+
+        self.assertEqual(result.calls, {"outer": 2, "inner": 1})
+        self.assertEqual(result.counts, {"lookups": 2})
+        self.assertIsNone(result.peak)
+
+    def test_inactive(self):
+        with profiling.phase("parse"):
+            profiling.count("lookups")
+
+        self.assertIsNone(profiling.active())
+
+    def test_batch_profile(self):
+        names = ["contexts", "inconsistencies"]
+
+        result = batch.process(self.instance, names, {"profile": True})
+
+        self.assertEqual(set(result["profiles"]), set(names))
+        self.assertIn("parse", result["profiles"]["contexts"]["phases"])
+        self.assertNotIn("profiles", batch.process(self.instance, names, {}))
+
+
+if __name__ == "__main__":
+    unittest.main()
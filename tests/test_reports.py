@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from thinX import batch
+from thinX import reports
+from thinX import xbrl
+
+
+class Reports(unittest.TestCase):
+
+    def setUp(self):
+        self.instance = "tests/assets/abc-20130331.xml"
+        self.linkbases = xbrl.open_linkbases(
+            self.instance, ["ins", "xsd", "cal", "lab"]
+        )
+        network = xbrl.CalculationNetwork(self.linkbases["cal"]["root"])
+        self.warnings = xbrl.calc_values(
+            self.linkbases["ins"]["root"], network
+        )
+
+    def copy(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        for filename in os.listdir("tests/assets"):
+            shutil.copy(os.path.join("tests/assets", filename), directory)
+
+        return os.path.join(directory, "abc-20130331.xml")
+
+    def expected(self):
+        """Return the rows of the report built the way it was before reports
+        existed, by looking up each label and definition in turn.
+
+        """
+        rows = xbrl.insert_labels(
+            self.linkbases["lab"]["root"],
+            [list(warning) for warning in self.warnings]
+        )
+        for row in rows:
+            row[0] = xbrl.link_role_def(self.linkbases["xsd"]["root"], row[0])
+            row[2] = row[2].replace("_", ":")
+
+        return rows
+
+    def test_calculation_report(self):
+        output = io.StringIO()
+        report = reports.CalculationReport(
+            self.linkbases["xsd"]["root"],
+            self.linkbases["lab"]["root"],
+            csv_file=output
+        )
+
+        self.assertEqual(report.write_all(iter(self.warnings)), 23)
+
+        rows = list(csv.reader(io.StringIO(output.getvalue())))
+        expected = [[str(value) for value in row] for row in self.expected()]
+        self.assertEqual(rows[0], reports.CalculationReport.header)
+        self.assertEqual(sorted(rows[1:]), sorted(expected))
+        self.assertEqual(
+            sum(int(line.rsplit("*", 1)[1]) for line in report.summary()),
+            23
+        )
+        self.assertEqual(report.summary(), sorted(report.summary()))
+
+    def test_calc_report(self):
+        instance = self.copy()
+
+        filenames, summary = reports.calc_report(
+            self.warnings,
+            self.linkbases["xsd"]["root"],
+            self.linkbases["lab"]["root"],
+            instance,
+            reports.formats
+        )
+
+        self.assertEqual(filenames, [
+            instance.replace(".xml", "-calc.csv"),
+            instance.replace(".xml", "-calc.jsonl")
+        ])
+        with open(filenames[1]) as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual(len(rows), 23)
+        self.assertEqual(list(rows[0]), reports.CalculationReport.header)
+        self.assertEqual(rows[0]["Value"], str(self.warnings[0][3]))
+
+    def test_batch_report(self):
+        instance = self.copy()
+
+        result = batch.process(
+            instance,
+            ["inconsistencies"],
+            {"calc_report": ["jsonl"]}
+        )
+
+        self.assertEqual(
+            result["reports"],
+            [instance.replace(".xml", "-calc.jsonl")]
+        )
+        self.assertTrue(os.path.exists(result["reports"][0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
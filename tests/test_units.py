@@ -69,3 +69,41 @@ class Units(unittest.TestCase):
         )
 
         self.assertEqual(unknown, expected_unknown)
+
+    def test_load_units(self):
+        registry = xbrl.load_units(self.unit_config_file, self.instance_file)
+        base = registry.registries[-1]
+
+        self.assertIs(
+            registry,
+            xbrl.load_units(self.unit_config_file, self.instance_file)
+        )
+        self.assertEqual(base["prefix"], "abc")
+        self.assertEqual(base["lookup"]["item"], ["item"])
+        self.assertTrue(registry.is_known("abc:item"))
+        self.assertTrue(registry.is_known("M1"))
+        self.assertFalse(registry.is_known("abc:M1"))
+        self.assertEqual(
+            xbrl.UnitRegistry({"T": {
+                "Prefix": "t",
+                "Namespace": "http://www.example.org/t",
+                "Measures": ["t", "T", "acre"]
+            }}).registries[0]["ambiguous"],
+            {"t"}
+        )
+
+    def test_unknown_measures_reader(self):
+        reader = xbrl.InstanceReader(self.instance_file)
+
+        self.assertEqual(
+            xbrl.unknown_measures(
+                reader,
+                self.unit_config_file,
+                self.instance_file
+            ),
+            xbrl.unknown_measures(
+                self.root,
+                self.unit_config_file,
+                self.instance_file
+            )
+        )
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+
+import unittest
+from decimal import Decimal
+from thinX import vectorized
+from thinX import xbrl
+
+
+class Element(object):
+    nsmap = {"abc": "http://abc"}
+
+
+@unittest.skipIf(vectorized.numpy is None, "NumPy is not installed")
+class Vectorized(unittest.TestCase):
+
+    def setUp(self):
+        self.instance = "tests/assets/abc-20130331.xml"
+        self.calcs = {
+            "role": {
+                "abc_Total": [("abc_A", "1"), ("abc_B", "-1"), ("abc_C", "1")],
+                "abc_Other": [("abc_A", "1.0"), ("abc_Missing", "1")]
+            }
+        }
+
+    def facts(self, values):
+        return dict(
+            ("{{http://abc}}{0}".format(name), dict(
+                (context, [Decimal(value) for value in reported])
+                for context, reported in contexts.items()
+            ))
+            for name, contexts in values.items()
+        )
+
+    def assertIdentical(self, elem, calcs, facts):
+        expected = xbrl.calc_values(elem, calcs, facts)
+        result = vectorized.calc_values(
+            elem, calcs, vectorized.FactTable(facts=facts)
+        )
+
+        self.assertEqual(
+            [[repr(value) for value in row] for row in result],
+            [[repr(value) for value in row] for row in expected]
+        )
+
+    def test_instance(self):
+        linkbases = xbrl.open_linkbases(self.instance, ["ins", "cal"])
+        elem = linkbases["ins"]["root"]
+        network = xbrl.CalculationNetwork(linkbases["cal"]["root"])
+        table = vectorized.FactTable(elem)
+
+        self.assertEqual(table.facts(), xbrl.get_facts(elem))
+        self.assertEqual(
+            vectorized.calc_values(elem, network, table),
+            xbrl.calc_values(elem, network)
+        )
+        self.assertIdentical(elem, network.get_calcs(), xbrl.get_facts(elem))
+
+    def test_exponents(self):
+        facts = self.facts({
+            "Total": {"c1": ["1", "3.50"], "c2": ["0"], "c3": ["7"]},
+            "A": {"c1": ["2.5", "9"], "c2": ["1E+3"], "c4": ["1"]},
+            "B": {"c1": ["-1.000"], "c2": ["1000"]},
+            "C": {"c3": ["-0"]},
+            "Other": {"c1": ["2.50"], "c2": ["1"], "c4": ["5"]}
+        })
+
+        self.assertIdentical(Element(), self.calcs, facts)
+
+    def test_fallback(self):
+        facts = self.facts({
+            "Total": {"c1": ["1"]},
+            "A": {"c1": ["Infinity"]},
+            "B": {"c1": ["1"]}
+        })
+
+        self.assertIsNone(vectorized.FactTable(facts=facts).scaled)
+        self.assertIdentical(Element(), self.calcs, facts)
+
+        facts = self.facts({
+            "Total": {"c1": ["1"]},
+            "A": {"c1": ["9" * 19]}
+        })
+
+        self.assertIdentical(Element(), self.calcs, facts)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import tempfile
+import unittest
+from thinX import profiling
+from thinX import watch
+
+
+class Watch(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.instance = os.path.join(self.directory, "abc-20130331.xml")
+        for filename in os.listdir("tests/assets"):
+            shutil.copy(os.path.join("tests/assets", filename),
+                        self.directory)
+        self.watcher = watch.Watcher(
+            self.instance,
+            ["labels", "calculations", "inconsistencies", "units"],
+            {"units": os.path.join(self.directory, "units.ini")}
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def touch(self, filename):
+        mtime = os.path.getmtime(filename) + 10
+        os.utime(filename, (mtime, mtime))
+
+    def test_update(self):
+        names = self.watcher.update()
+
+        self.assertEqual(
+            names,
+            ["labels", "calculations", "units", "inconsistencies"]
+        )
+        self.assertEqual(set(self.watcher.results), set(names))
+        self.assertEqual(self.watcher.update(), [])
+
+    def test_changed_file(self):
+        watcher = watch.Watcher(
+            self.instance,
+            ["labels", "calculations", "inconsistencies"]
+        )
+        watcher.update()
+        results = dict(watcher.results)
+        self.touch(watcher.dts.filenames["cal"])
+
+        with profiling.profile(memory=False) as result:
+            names = watcher.update()
+
+        self.assertEqual(names, ["calculations", "inconsistencies"])
+        self.assertEqual(result.counts["files parsed"], 1)
+        self.assertEqual(watcher.results, results)
+
+    def test_changed_config(self):
+        self.watcher.update()
+        self.touch(self.watcher.options["units"])
+
+        self.assertEqual(self.watcher.update(), ["units"])
+
+    def test_discards_changes(self):
+        self.watcher.update()
+        labels = self.watcher.results["labels"]
+        self.touch(self.watcher.dts.filenames["lab"])
+
+        self.watcher.update()
+
+        self.assertEqual(self.watcher.results["labels"], labels)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,24 +3,141 @@
 import sys
 import re
 import os
-from operator import itemgetter
 import csv
+import html
+import json
 from lxml import etree
-from PyQt5 import QtWidgets
+from PyQt5 import QtCore, QtWidgets
 from ui_thinX import Ui_MainWindow
+import batch
+import cache
+import profiling
+import reports
+import utilities
+import watch
 import xbrl
 
 
+class Cancelled(Exception):
+    """Raised within a running task once the user has cancelled it."""
+
+
+class Task(QtCore.QObject):
+    """Runs a utility on a worker thread. The utility reports its progress
+    through the task, which relays it to the interface by signal and raises
+    Cancelled at the next report once the task has been cancelled, until the
+    utility commits to writing its changes. Once committed, the task can no
+    longer be cancelled, so it never stops with its changes half reported.
+
+    """
+    logged = QtCore.pyqtSignal(str)
+    status_changed = QtCore.pyqtSignal(str)
+    phase_changed = QtCore.pyqtSignal(str)
+    profiled = QtCore.pyqtSignal(object)
+    finished = QtCore.pyqtSignal(bool)
+
+    def __init__(self, function, profile=False):
+        QtCore.QObject.__init__(self)
+        self.function = function
+        self.profile = profile
+        self.cancelled = False
+        self.committed = False
+
+    def check(self):
+        """Raises Cancelled if the task has been cancelled and has not yet
+        committed.
+
+        """
+        if self.cancelled and not self.committed:
+            raise Cancelled()
+
+    def log(self, text):
+        """Appends a line to the log."""
+        self.check()
+        self.logged.emit(text)
+
+    def status(self, text):
+        """Sets the text in the status bar."""
+        self.check()
+        self.status_changed.emit(text)
+
+    def phase(self, text):
+        """Reports the phase, such as parsing or writing, now under way."""
+        self.check()
+        self.phase_changed.emit("{0}...".format(text))
+
+    def commit(self):
+        """Enters the writing phase, raising Cancelled if the task has been
+        cancelled, and otherwise ignoring any cancellation from then on.
+
+        """
+        self.phase("Writing")
+        self.committed = True
+
+    def cancel(self):
+        """Cancels the task at its next report."""
+        self.cancelled = True
+
+    def run(self):
+        """Runs the utility, emitting finished with whether it completed, and
+        its Profile first if the task is being profiled.
+
+        """
+        completed = False
+        try:
+            if self.profile:
+                with profiling.profile(self.function.__name__) as profile:
+                    self.function(self)
+                self.profiled.emit(profile)
+            else:
+                self.function(self)
+            completed = True
+        except Cancelled:
+            self.status_changed.emit("Cancelled ")
+        except Exception as e:
+            self.status_changed.emit("Failed: {0} ".format(e))
+        self.finished.emit(completed)
+
+
+def open_fail(instance, file_type=None):
+    """Returns the status of a file that failed to open."""
+    file_types = {
+        "xsd": "Schema",
+        "pre": "Presentation Linkbase",
+        "def": "Definition Linkbase",
+        "cal": "Calculation Linkbase",
+        "lab": "Label Linkbase"
+    }
+    if file_type in file_types:
+        return "Failed to Open {0} of: {1} ".format(
+            file_types[file_type], instance
+        )
+    else:
+        return "Failed to Open: {0} ".format(instance)
+
+
 class ThinX(QtWidgets.QMainWindow):
     """The main app class. Handles the GUI and various XBRL utilities."""
     def __init__(self):
         QtWidgets.QMainWindow.__init__(self)
         self.ui = Ui_MainWindow()
         self.ui.setupUi(self)
+        self.task = None
+        self.worker_thread = None
         self.__init_statusbar()
+        self.__init_profile_panel()
+        self.__init_watch()
+        self.__init_cleanup()
+        self.__init_merge_contexts()
+        self.__init_duplicate_facts()
+        self.__init_duplicate_labels()
+        self.__init_link_role_usage()
         self.__init_connections()
         self.about()
         self.filename = ""
+        self.dts = None
+        self.watcher = None
+        self.cache = cache.Cache()
         self.unit_config_file = "units.ini"
 
     def __init_connections(self):
@@ -28,23 +145,99 @@ class ThinX(QtWidgets.QMainWindow):
         self.ui.actionClose.triggered.connect(self.close)
         self.ui.actionExit.triggered.connect(sys.exit)
         self.ui.actionAbout.triggered.connect(self.about)
-        self.ui.actionLinkRoles.triggered.connect(self.link_role)
-        self.ui.actionLabels.triggered.connect(self.labels)
-        self.ui.actionConsolidateLabels.triggered.connect(self.redundant)
-        self.ui.actionStandardLabels.triggered.connect(self.standard_labels)
-        self.ui.actionConcepts.triggered.connect(self.concepts)
-        self.ui.actionCalculations.triggered.connect(self.calculations)
-        self.ui.actionContexts.triggered.connect(self.contexts)
-        self.ui.actionTwoDayContexts.triggered.connect(self.two_day_contexts)
-        self.ui.actionUnits.triggered.connect(self.units)
-        self.ui.actionInconsistencies.triggered.connect(self.inconsistencies)
-        self.ui.actionMerrillBridgePrep.triggered.connect(self.bridge_prep)
-        self.ui.actionMerrillBridgeSort.triggered.connect(self.bridge_sort)
+        self.tasks = [
+            (self.ui.actionLinkRoles, self.link_role),
+            (self.link_role_usage_action, self.link_role_usage),
+            (self.ui.actionLabels, self.labels),
+            (self.ui.actionConsolidateLabels, self.redundant),
+            (self.ui.actionStandardLabels, self.standard_labels),
+            (self.duplicate_labels_action, self.duplicate_labels),
+            (self.ui.actionConcepts, self.concepts),
+            (self.ui.actionCalculations, self.calculations),
+            (self.ui.actionContexts, self.contexts),
+            (self.ui.actionTwoDayContexts, self.two_day_contexts),
+            (self.merge_contexts_action, self.merge_contexts),
+            (self.ui.actionUnits, self.units),
+            (self.ui.actionInconsistencies, self.inconsistencies),
+            (self.duplicate_facts_action, self.duplicate_facts),
+            (self.ui.actionMerrillBridgePrep, self.bridge_prep),
+            (self.ui.actionMerrillBridgeSort, self.bridge_sort),
+            (self.cleanup_action, self.cleanup)
+        ]
+        for action, function in self.tasks:
+            action.triggered.connect(
+                lambda checked=False, function=function: self.start(function)
+            )
+        self.cancel_button.clicked.connect(self.cancel)
 
     def __init_statusbar(self):
         self.status = QtWidgets.QLabel()
         self.reset_status()
+        self.cancel_button = QtWidgets.QPushButton("Cancel")
+        self.cancel_button.hide()
         self.statusBar().addPermanentWidget(self.status)
+        self.statusBar().addPermanentWidget(self.cancel_button)
+
+    def __init_profile_panel(self):
+        self.profile_tree = QtWidgets.QTreeWidget()
+        self.profile_tree.setHeaderLabels(["Profile", ""])
+        self.profile_dock = QtWidgets.QDockWidget("Profile", self)
+        self.profile_dock.setWidget(self.profile_tree)
+        self.addDockWidget(QtCore.Qt.BottomDockWidgetArea, self.profile_dock)
+        self.profile_dock.hide()
+        action = self.profile_dock.toggleViewAction()
+        action.setText("Profile Utilities")
+        self.ui.menuHelp.addAction(action)
+
+    def __init_watch(self):
+        self.watch_action = QtWidgets.QAction("Watch for Changes", self)
+        self.watch_action.setCheckable(True)
+        self.watch_action.toggled.connect(self.toggle_watch)
+        self.ui.menuUtilities.insertAction(
+            self.ui.menuUtilities.actions()[0], self.watch_action
+        )
+        self.ui.menuUtilities.insertSeparator(
+            self.ui.menuUtilities.actions()[1]
+        )
+        self.watch_timer = QtCore.QTimer(self)
+        self.watch_timer.setInterval(1000)
+        self.watch_timer.timeout.connect(self.poll_watch)
+
+    def __init_cleanup(self):
+        self.cleanup_action = QtWidgets.QAction("Clean Up All", self)
+        self.ui.menuUtilities.insertAction(
+            self.ui.menuUtilities.actions()[1], self.cleanup_action
+        )
+
+    def __init_merge_contexts(self):
+        self.merge_contexts_action = QtWidgets.QAction(
+            "Merge Duplicate Contexts", self
+        )
+        self.ui.menuUtilities.insertAction(
+            self.ui.actionUnits, self.merge_contexts_action
+        )
+
+    def __init_duplicate_facts(self):
+        self.duplicate_facts_action = QtWidgets.QAction(
+            "Report Duplicate Facts", self
+        )
+        self.ui.menuUtilities.addAction(self.duplicate_facts_action)
+
+    def __init_duplicate_labels(self):
+        self.duplicate_labels_action = QtWidgets.QAction(
+            "Report Duplicate Labels", self
+        )
+        self.ui.menuSchema_Utilities.insertAction(
+            self.ui.actionConcepts, self.duplicate_labels_action
+        )
+
+    def __init_link_role_usage(self):
+        self.link_role_usage_action = QtWidgets.QAction(
+            "Link Role Usage Report", self
+        )
+        self.ui.menuSchema_Utilities.insertAction(
+            self.ui.actionLabels, self.link_role_usage_action
+        )
 
     def get_version(self):
         """Retrieves the version number of thinX."""
@@ -65,39 +258,177 @@ class ThinX(QtWidgets.QMainWindow):
         """Resets the text in the status bar."""
         self.status.setText("Open an Instance Document to Begin ")
 
-    def open_fail(self, instance, file_type=None):
-        """Logs a file that failed to open to the status bar."""
-        file_types = {
-            "xsd": "Schema",
-            "pre": "Presentation Linkbase",
-            "def": "Definition Linkbase",
-            "cal": "Calculation Linkbase",
-            "lab": "Label Linkbase"
-        }
-        if file_type in file_types:
-            self.status.setText("Failed to Open {0} of: {1} ".format(
-                file_types[file_type], instance
-            ))
+    def set_busy(self, busy):
+        """Disables every action which would interfere with a running task
+        and shows the cancel button while busy.
+
+        """
+        actions = [action for action, function in self.tasks]
+        actions += [self.ui.actionOpen, self.ui.actionClose,
+                    self.ui.actionAbout, self.watch_action]
+        for action in actions:
+            action.setEnabled(not busy)
+        self.cancel_button.setEnabled(True)
+        self.cancel_button.setVisible(busy)
+
+    def start(self, function):
+        """Runs the provided utility on a worker thread, streaming its log
+        and progress into the interface as it goes.
+
+        """
+        if not self.filename:
+            self.status.setText(
+                "You Must Open an Instance Document Before Processing "
+            )
+            return
+        if self.worker_thread is not None:
+            return
+
+        self.ui.textLog.clear()
+        self.set_busy(True)
+        self.task = Task(function, self.profile_dock.isVisible())
+        self.worker_thread = QtCore.QThread()
+        self.task.moveToThread(self.worker_thread)
+        self.task.logged.connect(self.ui.textLog.append)
+        self.task.status_changed.connect(self.status.setText)
+        self.task.phase_changed.connect(self.statusBar().showMessage)
+        self.task.profiled.connect(self.show_profile)
+        self.task.finished.connect(self.finish)
+        self.worker_thread.started.connect(self.task.run)
+        self.worker_thread.start()
+
+    def cancel(self):
+        """Cancels the running task."""
+        if self.task is not None:
+            self.task.cancel()
+            self.cancel_button.setEnabled(False)
+            self.statusBar().showMessage("Cancelling...")
+
+    def finish(self, completed):
+        """Cleans up after a task. A task which did not complete may have
+        left the open files modified in memory, so they are reloaded.
+
+        """
+        self.worker_thread.quit()
+        self.worker_thread.wait()
+        self.worker_thread = None
+        self.task = None
+        self.statusBar().clearMessage()
+        if not completed and self.filename:
+            self.dts = xbrl.DTS(self.filename, self.cache)
+        self.set_busy(False)
+
+    def show_profile(self, profile):
+        """Adds a collapsible summary of the profile of a utility to the
+        profile panel, collapsing those of earlier runs.
+
+        """
+        summary = "{0:.3f}s".format(profile.seconds)
+        if profile.peak is not None:
+            summary += ", peak {0:.1f} KiB".format(profile.peak / 1024)
+        item = QtWidgets.QTreeWidgetItem([profile.name, summary])
+        for name, seconds in profile.phases.items():
+            QtWidgets.QTreeWidgetItem(item, [
+                name,
+                "{0:.3f}s ({1} calls)".format(seconds, profile.calls[name])
+            ])
+        for name, number in sorted(profile.counts.items()):
+            QtWidgets.QTreeWidgetItem(item, [name, str(number)])
+        for index in range(self.profile_tree.topLevelItemCount()):
+            self.profile_tree.topLevelItem(index).setExpanded(False)
+        self.profile_tree.addTopLevelItem(item)
+        item.setExpanded(True)
+        self.profile_tree.resizeColumnToContents(0)
+
+    def toggle_watch(self, checked):
+        """Starts or stops watching the files of the open filing, re-running
+        every utility which can run unattended against the files which
+        change.
+
+        """
+        if checked and not self.filename:
+            self.status.setText(
+                "You Must Open an Instance Document Before Watching "
+            )
+            self.watch_action.setChecked(False)
+        elif checked:
+            self.watcher = watch.Watcher(
+                self.filename,
+                utilities.utilities,
+                {"units": self.unit_config_file, "cache": self.cache}
+            )
+            self.watch_timer.start()
+            self.poll_watch()
         else:
-            self.status.setText("Failed to Open: {0} ".format(instance))
+            self.watch_timer.stop()
+            self.watcher = None
+
+    def poll_watch(self):
+        """Updates the findings of the watcher if any of the files it is
+        watching have changed and no other task is running.
+
+        """
+        if self.watcher is None or self.worker_thread is not None:
+            return
+        try:
+            changed = self.watcher.changed()
+        except Exception:
+            # The files may be mid-save, so wait for the next poll.
+            return
+        if changed:
+            self.start(self.watch_update)
+
+    def log_findings(self, task, names, results, errors, updated=()):
+        """Logs the findings or error of each of the named utilities, marking
+        those which were updated.
+
+        """
+        for name in names:
+            heading = "<b>{0}</b>".format(name)
+            if name in updated:
+                heading += " (updated)"
+            if name in errors:
+                task.log("{0}: {1}".format(heading, html.escape(errors[name])))
+            elif results.get(name):
+                task.log("{0}:<pre>{1}</pre>".format(heading, html.escape(
+                    json.dumps(results[name], default=batch.to_json, indent=2)
+                )))
+            else:
+                task.log("{0}: Nothing Found".format(heading))
+
+    def watch_update(self, task):
+        """Re-runs the utilities affected by the changed files and logs the
+        current findings of every utility, marking those just updated.
+
+        """
+        task.phase("Analyzing")
+        names = self.watcher.update()
+        self.log_findings(task, self.watcher.names, self.watcher.results,
+                          self.watcher.errors, names)
+        task.status("Watching: {0} ".format(self.filename))
 
     def open(self):
         """Prompts the user to open an XBRL instance document and stores the
         file path in self.filename.
 
         """
+        self.watch_action.setChecked(False)
         self.ui.textLog.clear()
         self.filename = QtWidgets.QFileDialog.getOpenFileName(
             filter="Instance Document (*.XML *.XBRL)"
         )[0]
         if self.filename != "":
+            self.dts = xbrl.DTS(self.filename, self.cache)
             self.status.setText(self.filename)
         else:
+            self.dts = None
             self.reset_status()
 
     def close(self):
         """Closes any open files and resets the interface."""
+        self.watch_action.setChecked(False)
         self.filename = ""
+        self.dts = None
         self.reset_status()
         self.ui.textLog.clear()
         self.about()
@@ -116,441 +447,500 @@ class ThinX(QtWidgets.QMainWindow):
             .format(str(self.get_version()))
         )
 
-    def link_role(self):
+    def link_role(self, task):
         """Find, report, and delete any inactive link roles."""
-        if not self.filename:
-            self.status.setText(
-                "You Must Open an Instance Document Before Processing "
-            )
-            return
-
-        self.ui.textLog.clear()
         files = ["xsd", "pre", "def", "cal"]
+        task.phase("Parsing")
         try:
-            linkbases = xbrl.open_linkbases(self.filename, files)
+            linkbases = xbrl.open_linkbases(self.dts, files)
         except Exception as e:
-            self.open_fail(self.filename, e.value)
+            task.status(open_fail(self.filename, e.value))
             return
 
-        link_roles = xbrl.get_link_roles(linkbases["xsd"]["root"])
-        active_link_roles = xbrl.get_active_link_roles(linkbases)
-        log = xbrl.compare_link_roles(link_roles, active_link_roles)
+        task.phase("Analyzing")
+        index = xbrl.LinkRoleIndex(linkbases)
+        log = index.unused()
 
         if not log:
-            self.status.setText("No Unused Link Roles Found in File ")
+            task.status("No Unused Link Roles Found in File ")
         else:
-            xbrl.delete_link_roles(linkbases["xsd"]["root"], log)
-            linkbases["xsd"]["tree"].write(
-                linkbases["xsd"]["filename"],
-                xml_declaration=True
-            )
-            self.ui.textLog.append("<strong>Unused Link Roles:</strong>")
+            index.delete(log)
+            task.commit()
+            self.dts.mark_dirty("xsd")
+            self.dts.save()
+            task.log("<strong>Unused Link Roles:</strong>")
             for role in log:
-                self.ui.textLog.append(role)
-            self.ui.textLog.append("")
-            self.status.setText(
-                "The Above Unused Link Roles Have Been Removed "
-            )
+                task.log(role)
+            task.log("")
+            task.status("The Above Unused Link Roles Have Been Removed ")
 
-    def labels(self):
-        """Removes and logs labels which are not in use."""
-        if not self.filename:
-            self.status.setText(
-                "You Must Open an Instance Document Before Processing "
-            )
+    def link_role_usage(self, task):
+        """Save a report of the usage of every link role in each linkbase."""
+        files = ["xsd", "pre", "def", "cal", "lab"]
+        task.phase("Parsing")
+        try:
+            linkbases = xbrl.open_linkbases(self.dts, files)
+        except Exception as e:
+            task.status(open_fail(self.filename, e.value))
             return
 
-        self.ui.textLog.clear()
+        task.phase("Analyzing")
+        report = xbrl.LinkRoleIndex(linkbases).report()
+        keys = ["pre", "def", "cal", "lab"]
+        header = ["Role", "Definition"]
+        header += ["{0}RoleRefs".format(key.title()) for key in keys]
+        for key in keys:
+            header += ["{0}{1}".format(key.title(), count) for count in
+                       ("Links", "Arcs", "Concepts")]
+        rows = [header]
+        unused = []
+        for role, usage in report["roles"].items():
+            row = [role, usage["definition"] or ""]
+            row += [usage["role_refs"].get(key, 0) for key in keys]
+            for key in keys:
+                counts = usage["usage"].get(key, {})
+                row += [counts.get(count, 0) for count in
+                        ("links", "arcs", "concepts")]
+            rows.append(row)
+            if usage["definition"] is not None and not usage["usage"]:
+                unused.append(role)
+        out_file = "{0}-roles.csv".format(self.filename.rsplit(".", 1)[0])
+        task.commit()
+        with open(out_file, 'w', newline='') as f:
+            writer = csv.writer(f, dialect='excel', delimiter=',')
+            writer.writerows(rows)
+        if unused:
+            task.log("<strong>Unused Link Roles:</strong>")
+            for role in unused:
+                task.log(role)
+            task.log("")
+        task.status(
+            "Link Role Usage Report Saved to {0} ".format(out_file)
+        )
+
+    def labels(self, task):
+        """Removes and logs labels which are not in use."""
         files = ["xsd", "pre", "lab"]
+        task.phase("Parsing")
         try:
-            linkbases = xbrl.open_linkbases(self.filename, files)
+            linkbases = xbrl.open_linkbases(self.dts, files)
         except Exception as e:
-            self.open_fail(self.filename, e.value)
+            task.status(open_fail(self.filename, e.value))
             return
 
+        task.phase("Analyzing")
         log = xbrl.clean_labels(
             linkbases["lab"]["root"],
-            linkbases["pre"]["root"]
+            linkbases["pre"]["root"],
+            self.dts.get_index("pre", xbrl.get_used_labels)
         )
         if not log:
-            self.status.setText("No Unused Labels Found in File ")
+            task.status("No Unused Labels Found in File ")
         else:
-            linkbases["lab"]["tree"].write(
-                linkbases["lab"]["filename"],
-                xml_declaration=True
-            )
-            self.status.setText(
-                "The Above Unreferenced Labels Have Been Removed "
-            )
+            task.commit()
+            self.dts.mark_dirty("lab")
+            self.dts.save()
+            task.status("The Above Unreferenced Labels Have Been Removed ")
             for element, labels in log.items():
-                self.ui.textLog.append(
+                task.log(
                     "<strong>{0}:</strong>".format(element.rsplit("#")[-1])
                 )
                 for label_type, label in labels.items():
-                    self.ui.textLog.append(
+                    task.log(
                         "{0}: {1}".format(label_type.rsplit("/")[-1], label)
                     )
 
-    def redundant(self):
+    def redundant(self, task):
         """Removes and logs labels which are redundant."""
-        if not self.filename:
-            self.status.setText(
-                "You Must Open an Instance Document Before Processing "
-            )
-            return
-
-        self.ui.textLog.clear()
         files = ["xsd", "pre", "lab"]
+        task.phase("Parsing")
         try:
-            linkbases = xbrl.open_linkbases(self.filename, files)
+            linkbases = xbrl.open_linkbases(self.dts, files)
         except Exception as e:
-            self.open_fail(self.filename, e.value)
+            task.status(open_fail(self.filename, e.value))
             return
 
+        task.phase("Analyzing")
         log = xbrl.redundant_labels(
             linkbases["lab"]["root"],
             linkbases["pre"]["root"]
         )
         if not log:
-            self.status.setText("No Redundant Labels Found in File ")
+            task.status("No Redundant Labels Found in File ")
         else:
-            linkbases["pre"]["tree"].write(
-                linkbases["pre"]["filename"],
-                xml_declaration=True
-            )
-            linkbases["lab"]["tree"].write(
-                linkbases["lab"]["filename"],
-                xml_declaration=True
-            )
-            self.status.setText(
-                "The Above Redundant Labels Have Been Removed "
-            )
+            task.commit()
+            self.dts.mark_dirty("pre")
+            self.dts.mark_dirty("lab")
+            self.dts.save()
+            task.status("The Above Redundant Labels Have Been Removed ")
             for element, labels in log.items():
-                self.ui.textLog.append(
+                task.log(
                     "<strong>{0}:</strong>".format(element.rsplit("#")[-1])
                 )
                 for label_type, label in labels.items():
-                    self.ui.textLog.append(
+                    task.log(
                         "{0} > {1}".format(
                             label_type.rsplit("/")[-1],
                             label.rsplit("/")[-1]
                         )
                     )
 
-    def standard_labels(self):
+    def standard_labels(self, task):
         """Removes and logs standard labels which are from a base taxonomy."""
-        if not self.filename:
-            self.status.setText(
-                "You Must Open an Instance Document Before Processing "
-            )
-            return
-
-        self.ui.textLog.clear()
+        task.phase("Parsing")
         try:
-            linkbases = xbrl.open_linkbases(self.filename, ["lab"])
+            linkbases = xbrl.open_linkbases(self.dts, ["lab"])
         except Exception as e:
-            self.open_fail(self.filename, e.value)
+            task.status(open_fail(self.filename, e.value))
             return
 
+        task.phase("Analyzing")
         log = xbrl.remove_standard_labels(linkbases["lab"]["root"])
         if not log:
-            self.status.setText("No Standard Labels Found in File ")
+            task.status("No Standard Labels Found in File ")
         else:
-            linkbases["lab"]["tree"].write(
-                linkbases["lab"]["filename"],
-                xml_declaration=True
-            )
-            self.status.setText(
-                "The Above Standard Labels Have Been Removed "
-            )
+            task.commit()
+            self.dts.mark_dirty("lab")
+            self.dts.save()
+            task.status("The Above Standard Labels Have Been Removed ")
             for element, labels in log.items():
-                self.ui.textLog.append(
+                task.log(
                     "<strong>{0}:</strong>".format(element.rsplit("#")[-1])
                 )
                 for label_type, label in labels.items():
-                    self.ui.textLog.append(
+                    task.log(
                         "{0} > {1}".format(
                             label_type.rsplit("/")[-1],
                             label.rsplit("/")[-1]
                         )
                     )
 
-    def concepts(self):
-        """Removes and logs extension concepts which are not in use."""
-        if not self.filename:
-            self.status.setText(
-                "You Must Open an Instance Document Before Processing "
-            )
+    def duplicate_labels(self, task):
+        """Reports label text which is shared by more than one concept."""
+        task.phase("Parsing")
+        try:
+            linkbases = xbrl.open_linkbases(self.dts, ["lab"])
+        except Exception as e:
+            task.status(open_fail(self.filename, e.value))
             return
 
-        self.ui.textLog.clear()
+        task.phase("Analyzing")
+        log = xbrl.duplicate_labels(linkbases["lab"]["root"])
+        if not log:
+            task.status("No Duplicate Labels Found in File ")
+        else:
+            task.status("The Above Duplicate Labels Were Found ")
+            for label_type, langs in sorted(log.items()):
+                for lang, texts in sorted(langs.items(),
+                                          key=lambda item: item[0] or ""):
+                    task.log("<strong>{0} ({1}):</strong>".format(
+                        label_type.rsplit("/")[-1], lang
+                    ))
+                    for text, concepts in sorted(texts.items()):
+                        task.log("{0} > {1}".format(text, ", ".join(
+                            concept.rsplit("#")[-1] for concept in concepts
+                        )))
+
+    def concepts(self, task):
+        """Removes and logs extension concepts which are not in use."""
         files = ["xsd", "pre", "def", "cal", "lab"]
+        task.phase("Parsing")
         try:
-            linkbases = xbrl.open_linkbases(self.filename, files)
+            linkbases = xbrl.open_linkbases(self.dts, files)
         except Exception as e:
-            self.open_fail(self.filename, e.value)
+            task.status(open_fail(self.filename, e.value))
             return
 
-        log = xbrl.clean_concepts(linkbases)
+        task.phase("Analyzing")
+        log = xbrl.clean_concepts(linkbases, utilities.concept_usage(self.dts))
         if not log:
-            self.status.setText("No Unused Concepts Found in File ")
+            task.status("No Unused Concepts Found in File ")
         else:
-            linkbases["xsd"]["tree"].write(
-                linkbases["xsd"]["filename"],
-                xml_declaration=True
-            )
-            self.status.setText(
-                "The Above Unreferenced Concepts Have Been Removed "
-            )
-            self.ui.textLog.append("<strong>Unused Concepts:</strong>")
+            task.commit()
+            self.dts.mark_dirty("xsd")
+            self.dts.save()
+            task.status("The Above Unreferenced Concepts Have Been Removed ")
+            task.log("<strong>Unused Concepts:</strong>")
             for concept in log:
-                self.ui.textLog.append(concept)
+                task.log(concept)
 
-    def calculations(self):
+    def calculations(self, task):
         """Displays duplicate calculations found in the corresponding
         calculation linkbase of self.filename.
 
         """
-        if not self.filename:
-            self.status.setText(
-                "You Must Open an Instance Document Before Processing "
-            )
-            return
-
-        self.ui.textLog.clear()
         files = ["cal"]
+        task.phase("Parsing")
         try:
-            linkbases = xbrl.open_linkbases(self.filename, files)
+            linkbases = xbrl.open_linkbases(self.dts, files)
         except Exception as e:
-            self.open_fail(self.filename, e.value)
+            task.status(open_fail(self.filename, e.value))
             return
 
-        log = xbrl.dup_calcs(linkbases["cal"]["root"])
+        task.phase("Analyzing")
+        network = self.dts.get_index("cal", xbrl.CalculationNetwork)
+        log = xbrl.find_dup_calcs(network)
         if not log:
-            self.status.setText("No Duplicate Calculations Found ")
+            task.status("No Duplicate Calculations Found ")
         else:
-            self.status.setText(
+            task.status(
                 "Duplicate Calculations For The Above Total Concepts Have "
                 "Been Found "
             )
-            self.ui.textLog.append("<strong>Duplicate Calculations:</strong>")
-            for calc, multiple in log.items():
-                if multiple > 0:
-                    self.ui.textLog.append(
-                        "{0} *{1}".format(calc, str(multiple + 1)))
-                else:
-                    self.ui.textLog.append(calc)
-
-    def contexts(self):
-        """Removes unused contexts from self.filename."""
-        if not self.filename:
-            self.status.setText(
-                "You Must Open an Instance Document Before Processing "
-            )
+            task.log("<strong>Duplicate Calculations:</strong>")
+            for calc, clashes in log.items():
+                task.log("<strong>{0}:</strong>".format(calc))
+                for role, other_role, relationship in clashes:
+                    task.log("{0} - {1} of {2}".format(
+                        role.rsplit("/")[-1],
+                        relationship,
+                        other_role.rsplit("/")[-1]
+                    ))
+
+    def contexts(self, task):
+        """Removes unused contexts, units, and footnotes from self.filename."""
+        task.phase("Parsing")
+        try:
+            linkbases = xbrl.open_linkbases(self.dts, ["ins"])
+        except Exception as e:
+            task.status(open_fail(self.filename, e.value))
             return
 
-        self.ui.textLog.clear()
+        task.phase("Analyzing")
+        log = xbrl.clean_instance(linkbases["ins"]["root"])
+        if not any(log.values()):
+            task.status("No Unused Contexts Found in File ")
+        else:
+            task.commit()
+            self.dts.mark_dirty("ins")
+            self.dts.save()
+            task.status("The Above Unreferenced Contexts Have Been Removed ")
+            headings = [
+                ("contexts", "Unused Contexts"),
+                ("units", "Unused Units"),
+                ("footnotes", "Orphan Footnotes")
+            ]
+            for key, heading in headings:
+                if log[key]:
+                    task.log("<strong>{0}:</strong>".format(heading))
+                    for item in log[key]:
+                        task.log(item)
+
+    def two_day_contexts(self, task):
+        """Report two day contexts."""
+        task.phase("Parsing")
         try:
-            tree = etree.parse(self.filename)
-        except:
-            self.open_fail(self.filename)
+            linkbases = xbrl.open_linkbases(self.dts, ["ins"])
+        except Exception as e:
+            task.status(open_fail(self.filename, e.value))
             return
 
-        root = tree.getroot()
-        log = xbrl.clean_contexts(root)
-        tree.write(self.filename, xml_declaration=True)
+        task.phase("Analyzing")
+        log = xbrl.two_day_contexts(linkbases["ins"]["root"])
         if not log:
-            self.status.setText("No Unused Contexts Found in File ")
+            task.status("No Two Day Contexts Found in File ")
         else:
-            self.status.setText(
-                "The Above Unreferenced Contexts Have Been Removed "
-            )
-            self.ui.textLog.append("<strong>Unused Contexts:</strong>")
+            task.status("The Above Two Day Contexts Were Found ")
+            task.log("<strong>Two Day Contexts:</strong>")
             for item in log:
-                self.ui.textLog.append(item)
-
-    def two_day_contexts(self):
-        """Report two day contexts."""
-        if not self.filename:
-            self.status.setText(
-                "You Must Open an Instance Document Before Processing "
-            )
-            return
+                task.log(item)
 
-        self.ui.textLog.clear()
+    def merge_contexts(self, task):
+        """Merges contexts which duplicate another into it."""
+        task.phase("Parsing")
         try:
-            tree = etree.parse(self.filename)
-        except:
-            self.open_fail(self.filename)
+            linkbases = xbrl.open_linkbases(self.dts, ["ins"])
+        except Exception as e:
+            task.status(open_fail(self.filename, e.value))
             return
 
-        root = tree.getroot()
-        log = xbrl.two_day_contexts(root)
+        task.phase("Analyzing")
+        log = xbrl.merge_contexts(linkbases["ins"]["root"])
         if not log:
-            self.status.setText("No Two Day Contexts Found in File ")
+            task.status("No Duplicate Contexts Found in File ")
         else:
-            self.status.setText("The Above Two Day Contexts Were Found ")
-            self.ui.textLog.append("<strong>Two Day Contexts:</strong>")
-            for item in log:
-                self.ui.textLog.append(item)
-
-    def units(self):
+            task.commit()
+            self.dts.mark_dirty("ins")
+            self.dts.save()
+            task.status("The Above Duplicate Contexts Have Been Merged ")
+            for identifier, duplicates in log.items():
+                task.log("<strong>{0}:</strong>".format(identifier))
+                for item in duplicates:
+                    task.log(item)
+
+    def units(self, task):
         """Adds the namespaces supplied in unit_config_file to self.filename
         and swaps out all measures in self.filename that are also in the
         unit_config_file. The measure that is swapped in also uses its
         matching namespace and prefix from the unit_config_file.
 
         """
-        if not self.filename:
-            self.status.setText(
-                "You Must Open an Instance Document Before Processing "
-            )
-            return
-
-        self.ui.textLog.clear()
         fixed = False
         logs = []
+        task.phase("Parsing")
         try:
-            tree = etree.parse(self.filename)
-        except:
-            self.open_fail(self.filename)
+            linkbases = xbrl.open_linkbases(self.dts, ["ins", "xsd"])
+        except Exception as e:
+            task.status(open_fail(self.filename, e.value))
             return
 
-        root = tree.getroot()
-        registry = xbrl.get_units(self.unit_config_file, self.filename)
-        new_root, log = xbrl.add_namespace(root, registry)
+        task.phase("Analyzing")
+        instance = linkbases["ins"]
+        registry = xbrl.load_units(self.unit_config_file, self.dts)
+        new_root, log = xbrl.add_namespace(instance["root"], registry)
         if log:
             logs.append(log)
             fixed = True
-        check = xbrl.unknown_measures(
-            new_root,
-            self.unit_config_file,
-            self.filename
-        )
-        tree._setroot(new_root)
-        tree.write(self.filename, xml_declaration=True)
+        check = xbrl.unknown_measures(new_root, registry)
+        instance["tree"]._setroot(new_root)
+        instance["root"] = new_root
         if fixed:
-            self.status.setText("XBRL International Units Registry ")
-            self.ui.textLog.append(
+            task.commit()
+            self.dts.mark_dirty("ins")
+            self.dts.save()
+            task.status("XBRL International Units Registry ")
+            task.log(
                 "<strong>The Following Measures Have Been Modified: </strong>"
             )
             for dictionary in logs:
                 for item in dictionary:
-                    self.ui.textLog.append(
-                        "{0} > {1}".format(item, dictionary[item])
-                    )
-            self.ui.textLog.append("<br>")
+                    task.log("{0} > {1}".format(item, dictionary[item]))
+            task.log("<br>")
         else:
-            self.status.setText("No Units Found to Fix ")
+            task.status("No Units Found to Fix ")
 
         if len(check) > 0:
-            self.ui.textLog.append(
+            task.log(
                 "<strong>The Following Measures Are Not Part Of Any Known "
                 "Units Database:</strong>"
             )
             for measure in check:
-                self.ui.textLog.append(measure)
+                task.log(measure)
 
-    def inconsistencies(self):
-        """Report calculation inconsistencies."""
-        if not self.filename:
-            self.status.setText(
-                "You Must Open an Instance Document Before Processing "
-            )
-            return
+    def duplicate_facts(self, task):
+        """Report duplicate facts, and duplicates whose values or decimals
+        are inconsistent.
 
-        self.ui.textLog.clear()
-        files = ["xsd", "pre", "def", "cal", "lab"]
+        """
+        task.phase("Parsing")
         try:
-            linkbases = xbrl.open_linkbases(self.filename, files)
+            linkbases = xbrl.open_linkbases(self.dts, ["ins"])
         except Exception as e:
-            self.open_fail(self.filename, e.value)
+            task.status(open_fail(self.filename, e.value))
             return
 
+        task.phase("Analyzing")
+        log = xbrl.duplicate_facts(linkbases["ins"]["root"])
+        if not any(log.values()):
+            task.status("No Duplicate Facts Found in File ")
+        else:
+            task.status("The Above Duplicate Facts Were Found ")
+            headings = [
+                ("inconsistent values", "Inconsistent Duplicate Facts"),
+                ("inconsistent decimals", "Inconsistently Rounded Facts"),
+                ("duplicates", "Duplicate Facts")
+            ]
+            for key, heading in headings:
+                if log[key]:
+                    task.log("<strong>{0}:</strong>".format(heading))
+                    for concept, context, unit, lang, values in log[key]:
+                        reported = []
+                        for value, decimals in values:
+                            if decimals is not None:
+                                value = "{0} ({1})".format(value, decimals)
+                            reported.append(str(value))
+                        task.log("{0} - {1}: {2}".format(
+                            concept,
+                            context,
+                            ", ".join(reported)
+                        ))
+
+    def inconsistencies(self, task):
+        """Report calculation inconsistencies."""
+        files = ["ins", "xsd", "cal", "lab"]
+        task.phase("Parsing")
         try:
-            tree = etree.parse(self.filename)
-        except:
-            self.open_fail(self.filename)
+            linkbases = xbrl.open_linkbases(self.dts, files)
+        except Exception as e:
+            task.status(open_fail(self.filename, e.value))
             return
 
-        root = tree.getroot()
-        calcs = xbrl.get_calcs(linkbases["cal"]["root"])
-        log = xbrl.calc_values(root, calcs)
+        task.phase("Analyzing")
+        network = self.dts.get_index("cal", xbrl.CalculationNetwork)
+        log = xbrl.calc_values(linkbases["ins"]["root"], network)
         if not log:
-            self.status.setText("No Calculation Inconsistencies Found ")
+            task.status("No Calculation Inconsistencies Found ")
         else:
-            log = xbrl.insert_labels(linkbases["lab"]["root"], log)
-            for calc in log:
-                calc[0] = xbrl.link_role_def(linkbases["xsd"]["root"], calc[0])
-                calc[2] = calc[2].replace("_", ":")
-
-            log = sorted(log, key=itemgetter(0, 1, 2, 3))
-            self.ui.textLog.append(
-                "<strong>Calculation Inconsistencies:</strong>"
+            task.commit()
+            filenames, summary = reports.calc_report(
+                log,
+                linkbases["xsd"]["root"],
+                self.dts.get_index("lab", xbrl.get_labels),
+                self.filename
             )
-            link_roles = {}
-            output = []
-            for row in log:
-                sort = row[0].split(" ", 1)[0]
-                if sort in link_roles:
-                    if row[2] in link_roles[sort]:
-                        link_roles[sort][row[2]] += 1
-                    else:
-                        link_roles[sort][row[2]] = 1
-                else:
-                    link_roles[sort] = {row[2]: 1}
-            for link_role, totals in link_roles.items():
-                for total, value in totals.items():
-                    line = "{0} - {1} *{2}".format(
-                        link_role,
-                        total,
-                        str(value)
-                    )
-                    output.append(line)
-            output.sort()
-            log.insert(0, ["RoleDefinition",
-                           "ElementLabel",
-                           "Element",
-                           "ContextId",
-                           "Value",
-                           "CalculatedValue"])
-            out_file = "{0}-calc.csv".format(self.filename.rsplit(".", 1)[0])
-            with open(out_file, 'w', newline='') as f:
-                writer = csv.writer(f, dialect='excel', delimiter=',')
-                writer.writerows(log)
-            for row in output:
-                self.ui.textLog.append(row)
-            self.status.setText(
+            task.log("<strong>Calculation Inconsistencies:</strong>")
+            for row in summary:
+                task.log(row)
+            task.status(
                 "Calculation Inconsistency Report Saved to {0} ".format(
-                    out_file
+                    filenames[0]
                 )
             )
 
-    def bridge_prep(self):
+    def cleanup(self, task):
+        """Applies every cleanup utility to the open files in memory, then
+        saves each modified file once.
+
+        """
+        files = ["xsd", "pre", "def", "cal", "lab", "ins"]
+        task.phase("Parsing")
+        try:
+            xbrl.open_linkbases(self.dts, files)
+        except Exception as e:
+            task.status(open_fail(self.filename, e.value))
+            return
+
+        task.phase("Analyzing")
+        results, errors, modified = utilities.run(
+            self.dts, utilities.cleanups, {"units": self.unit_config_file}
+        )
+        task.commit()
+        self.dts.save()
+        self.log_findings(task, utilities.cleanups, results, errors)
+        if errors:
+            task.status("Some Utilities Failed, See Above ")
+        elif modified:
+            task.status("The Above Have Been Removed ")
+        else:
+            task.status("Nothing to Clean Up ")
+
+    def bridge_prep(self, task):
         """Prep taxonomy for import into Merrill Bridge."""
         comment = ('<?xml version="1.0" encoding="utf-8"?>\n<!--XBRL document '
                    'created with Merrill Bridge Powered by Crossfire 5.9.112.0'
                    ' -->\n<!--Based on XBRL 2.1-->\n<!--Created on: 5/14/2014 '
                    '3:24:21 PM-->\n<!--Modified on: 5/14/2014 3:24:21 PM-->\n')
 
-        if not self.filename:
-            self.status.setText(
-                "You Must Open an Instance Document Before Processing "
-            )
-            return
-
-        self.ui.textLog.clear()
-        self.link_role()
         files = ["xsd", "pre", "def", "cal", "lab"]
+        task.phase("Parsing")
         try:
-            linkbases = xbrl.open_linkbases(self.filename, files)
+            linkbases = xbrl.open_linkbases(self.dts, files)
         except Exception as e:
-            self.open_fail(self.filename, e.value)
+            task.status(open_fail(self.filename, e.value))
             return
 
+        task.phase("Analyzing")
+        # Unused link roles are removed in memory, as the schema is about to
+        # be written under its new name anyway.
+        unused, keys = utilities.link_roles(self.dts, {})
+        if unused:
+            task.log("<strong>Unused Link Roles:</strong>")
+            for role in unused:
+                task.log(role)
+            task.log("")
         path = re.compile("^(.+)\d{8}([\.-abcdeflmprsx]{4,8})$")
         name = "current_taxonomy"
-        os.remove(self.filename)
+        texts = {}
         for key, value in linkbases.items():
             if key == "xsd":
                 log = xbrl.link_role_sort(value["root"])
@@ -566,49 +956,50 @@ class ThinX(QtWidgets.QMainWindow):
             content = etree.tostring(value["root"], encoding="unicode")
             match = path.search(value["filename"])
             new_name = match.group(1) + name + match.group(2)
-            f = open(new_name, 'w', encoding="utf8")
-            f.write(comment + content)
-            f.close()
-            os.remove(value["filename"])
+            texts[new_name] = comment + content
+        # Every renamed file is saved before any original is deleted, so a
+        # failure part way through never loses a file.
+        task.commit()
+        xbrl.write_texts(texts)
+        originals = [self.filename]
+        originals += [value["filename"] for value in linkbases.values()]
+        for filename in originals:
+            if filename not in texts:
+                os.remove(filename)
+        self.dts = xbrl.DTS(self.filename, self.cache)
         if log:
-            self.ui.textLog.append("<strong>Sort Codes:</strong>")
+            task.log("<strong>Sort Codes:</strong>")
             for link in log:
-                self.ui.textLog.append("{0} > {1}".format(link[0], link[1]))
-            self.ui.textLog.append("")
-        self.ui.textLog.append("<strong>Files:</strong>")
+                task.log("{0} > {1}".format(link[0], link[1]))
+            task.log("")
+        task.log("<strong>Files:</strong>")
         for ref in refs:
-            self.ui.textLog.append("{0} > {1}".format(ref[0], ref[1]))
-        self.ui.textLog.append("<br><strong>Namespace:</strong>")
-        self.ui.textLog.append("{0} > {1}".format(ns_change[0], ns_change[1]))
-        self.ui.textLog.append("<br><strong>Base Taxonomy:</strong>")
-        self.ui.textLog.append(base)
-        self.status.setText("Ready for Bridge ")
-
-    def bridge_sort(self):
+            task.log("{0} > {1}".format(ref[0], ref[1]))
+        task.log("<br><strong>Namespace:</strong>")
+        task.log("{0} > {1}".format(ns_change[0], ns_change[1]))
+        task.log("<br><strong>Base Taxonomy:</strong>")
+        task.log(base)
+        task.status("Ready for Bridge ")
+
+    def bridge_sort(self, task):
         """Update link role sorting for Merrill Bridge."""
-        if not self.filename:
-            self.status.setText(
-                "You Must Open an Instance Document Before Processing "
-            )
-            return
-
-        self.ui.textLog.clear()
         files = ["xsd"]
+        task.phase("Parsing")
         try:
-            linkbases = xbrl.open_linkbases(self.filename, files)
+            linkbases = xbrl.open_linkbases(self.dts, files)
         except Exception as e:
-            self.open_fail(self.filename, e.value)
+            task.status(open_fail(self.filename, e.value))
             return
 
+        task.phase("Analyzing")
         log = xbrl.link_role_sort(linkbases["xsd"]["root"])
-        linkbases["xsd"]["tree"].write(
-            linkbases["xsd"]["filename"],
-            xml_declaration=True
-        )
-        self.ui.textLog.append("<strong>Sort Codes:</strong>")
+        task.commit()
+        self.dts.mark_dirty("xsd")
+        self.dts.save()
+        task.log("<strong>Sort Codes:</strong>")
         for link in log:
-            self.ui.textLog.append("{0} > {1}".format(link[0], link[1]))
-        self.status.setText("Ready for Compare ")
+            task.log("{0} > {1}".format(link[0], link[1]))
+        task.status("Ready for Compare ")
 
 
 def main():
@@ -0,0 +1,397 @@
+#!/usr/bin/env python
+
+try:
+    from . import profiling
+    from . import vectorized
+    from . import xbrl
+except ImportError:
+    import profiling
+    import vectorized
+    import xbrl
+
+
+def index(dts, key, factory):
+    """Return the result of calling factory with the root of the given file
+    of the DTS, such as a CalculationNetwork, which is read from the cache of
+    the DTS without parsing the file whenever it is unchanged.
+
+    """
+    dts.refresh()
+
+    return dts.get_index(key, factory)
+
+
+def link_roles(dts, options):
+    """Find and delete any inactive link roles."""
+    linkbases = xbrl.open_linkbases(dts, ["xsd", "pre", "def", "cal"])
+    index = xbrl.LinkRoleIndex(linkbases)
+    log = index.unused()
+    if log:
+        index.delete(log)
+        return (log, ["xsd"])
+
+    return (log, [])
+
+
+def link_role_usage(dts, options):
+    """Report the usage of every link role and arc role."""
+    linkbases = xbrl.open_linkbases(
+        dts, ["xsd", "pre", "def", "cal", "lab"]
+    )
+
+    return (xbrl.LinkRoleIndex(linkbases).report(), [])
+
+
+def labels(dts, options):
+    """Remove labels which are not in use."""
+    linkbases = xbrl.open_linkbases(dts, ["xsd", "lab"])
+    log = xbrl.clean_labels(
+        linkbases["lab"]["root"],
+        None,
+        index(dts, "pre", xbrl.get_used_labels)
+    )
+
+    return (log, ["lab"] if log else [])
+
+
+def redundant_labels(dts, options):
+    """Consolidate labels which are redundant."""
+    linkbases = xbrl.open_linkbases(dts, ["xsd", "pre", "lab"])
+    log = xbrl.redundant_labels(
+        linkbases["lab"]["root"],
+        linkbases["pre"]["root"]
+    )
+
+    return (log, ["pre", "lab"] if log else [])
+
+
+def standard_labels(dts, options):
+    """Remove standard labels of concepts from a base taxonomy."""
+    linkbases = xbrl.open_linkbases(dts, ["lab"])
+    log = xbrl.remove_standard_labels(linkbases["lab"]["root"])
+
+    return (log, ["lab"] if log else [])
+
+
+def duplicate_labels(dts, options):
+    """Report label text shared by more than one concept."""
+    linkbases = xbrl.open_linkbases(dts, ["lab"])
+
+    return (xbrl.duplicate_labels(linkbases["lab"]["root"]), [])
+
+
+def concept_usage(dts):
+    """Return the usage of every concept in the linkbases of the DTS, as
+    returned by get_concept_usage, from the concepts located by each
+    linkbase, which are indexed through the DTS.
+
+    """
+    return xbrl.get_concept_usage(None, dict(
+        (key, index(dts, key, xbrl.get_concept_locs))
+        for key in ["pre", "def", "cal", "lab"]
+    ))
+
+
+def concepts(dts, options):
+    """Remove extension concepts which are not in use."""
+    linkbases = xbrl.open_linkbases(dts, ["xsd"])
+    log = xbrl.clean_concepts(linkbases, concept_usage(dts))
+
+    return (log, ["xsd"] if log else [])
+
+
+def calculations(dts, options):
+    """Report duplicate calculations."""
+    network = index(dts, "cal", xbrl.CalculationNetwork)
+
+    return (xbrl.find_dup_calcs(network), [])
+
+
+def duplicate_contexts(dts, options):
+    """Report contexts which duplicate another, merging them into it if the
+    merge_contexts option is set.
+
+    """
+    linkbases = xbrl.open_linkbases(dts, ["ins"])
+    elem = linkbases["ins"]["root"]
+    if options.get("merge_contexts"):
+        log = xbrl.merge_contexts(elem)
+        return (log, ["ins"] if log else [])
+
+    return (xbrl.ContextCatalog(elem).duplicates(), [])
+
+
+def contexts(dts, options):
+    """Remove unused contexts, units, and footnotes."""
+    linkbases = xbrl.open_linkbases(dts, ["ins"])
+    log = xbrl.clean_instance(linkbases["ins"]["root"])
+    log = dict((key, value) for key, value in log.items() if value)
+
+    return (log, ["ins"] if log else [])
+
+
+def instance(dts, options):
+    """Return the root of the instance document, or an InstanceReader if the
+    stream option is set and the instance has not already been parsed.
+
+    """
+    if options.get("stream") and not dts.is_loaded("ins"):
+        return xbrl.InstanceReader(dts.filenames["ins"])
+
+    return xbrl.open_linkbases(dts, ["ins"])["ins"]["root"]
+
+
+def two_day_contexts(dts, options):
+    """Report two day contexts."""
+    return (xbrl.two_day_contexts(instance(dts, options)), [])
+
+
+def units(dts, options):
+    """Comply with the units registries in the unit configuration file."""
+    linkbases = xbrl.open_linkbases(dts, ["ins", "xsd"])
+    instance = linkbases["ins"]
+    registry = xbrl.load_units(options.get("units", "units.ini"), dts)
+    new_root, log = xbrl.add_namespace(instance["root"], registry)
+    check = xbrl.unknown_measures(new_root, registry)
+    instance["tree"]._setroot(new_root)
+    instance["root"] = new_root
+
+    findings = {}
+    if log:
+        findings["modified"] = log
+    if check:
+        findings["unknown"] = check
+
+    return (findings, ["ins"] if log else [])
+
+
+def inconsistencies(dts, options):
+    """Report calculation inconsistencies. Unless the instance is streamed,
+    its facts are indexed through the DTS, so that they may be read from its
+    cache, in which case only the root element of the instance is read. If
+    the engine option is "numpy" and NumPy is installed, the calculations are
+    checked by vectorized.calc_values instead, with identical results.
+
+    """
+    network = index(dts, "cal", xbrl.CalculationNetwork)
+    if options.get("engine") == "numpy" and vectorized.numpy is not None:
+        calc_values, factory = (vectorized.calc_values, vectorized.FactTable)
+    else:
+        calc_values, factory = (xbrl.calc_values, xbrl.get_facts)
+    if options.get("stream") and not dts.is_loaded("ins"):
+        return (calc_values(instance(dts, options), network), [])
+
+    facts = index(dts, "ins", factory)
+    if dts.is_loaded("ins"):
+        elem = dts["ins"]["root"]
+    else:
+        elem = xbrl.InstanceReader(dts.filenames["ins"])
+
+    return (calc_values(elem, network, facts), [])
+
+
+def rollups(dts, options):
+    """Report calculation inconsistencies at every level of each calculation
+    tree, along with the concept at which each first appears.
+
+    """
+    network = index(dts, "cal", xbrl.CalculationNetwork)
+    tree = xbrl.CalculationTree(network)
+    facts = index(dts, "ins", xbrl.get_facts)
+    if dts.is_loaded("ins"):
+        elem = dts["ins"]["root"]
+    else:
+        elem = xbrl.InstanceReader(dts.filenames["ins"])
+
+    return (xbrl.rollup_values(elem, tree, facts), [])
+
+
+def duplicate_facts(dts, options):
+    """Report duplicate facts, and duplicates whose values or decimals are
+    inconsistent.
+
+    """
+    log = xbrl.duplicate_facts(instance(dts, options))
+    log = dict((key, value) for key, value in log.items() if value)
+
+    return (log, [])
+
+
+# Every utility which can run without user interaction, in the order they are
+# applied when more than one is selected. Each function accepts a DTS and a
+# dictionary of options, and returns its findings, which are empty if there is
+# nothing to report, along with the keys of the files it modified. The files
+# each utility reads are listed, along with any options naming configuration
+# files it reads and their defaults, and any other options which change what
+# it does, so its findings can be cached. Utilities which always produce a
+# report, rather than findings to act on, are flagged as reports.
+utilities = {
+    "link-roles": {
+        "function": link_roles,
+        "files": ["xsd", "pre", "def", "cal"]
+    },
+    "link-role-usage": {
+        "function": link_role_usage,
+        "files": ["xsd", "pre", "def", "cal", "lab"],
+        "report": True
+    },
+    "labels": {
+        "function": labels,
+        "files": ["xsd", "pre", "lab"]
+    },
+    "redundant-labels": {
+        "function": redundant_labels,
+        "files": ["xsd", "pre", "lab"]
+    },
+    "standard-labels": {
+        "function": standard_labels,
+        "files": ["lab"]
+    },
+    "duplicate-labels": {
+        "function": duplicate_labels,
+        "files": ["lab"]
+    },
+    "concepts": {
+        "function": concepts,
+        "files": ["xsd", "pre", "def", "cal", "lab"]
+    },
+    "calculations": {
+        "function": calculations,
+        "files": ["cal"]
+    },
+    "duplicate-contexts": {
+        "function": duplicate_contexts,
+        "files": ["ins"],
+        "options": ["merge_contexts"]
+    },
+    "contexts": {
+        "function": contexts,
+        "files": ["ins"]
+    },
+    "two-day-contexts": {
+        "function": two_day_contexts,
+        "files": ["ins"]
+    },
+    "units": {
+        "function": units,
+        "files": ["ins", "xsd"],
+        "config": {"units": "units.ini"}
+    },
+    "inconsistencies": {
+        "function": inconsistencies,
+        "files": ["ins", "cal"]
+    },
+    "rollups": {
+        "function": rollups,
+        "files": ["ins", "cal"]
+    },
+    "duplicate-facts": {
+        "function": duplicate_facts,
+        "files": ["ins"]
+    }
+}
+
+
+# The utilities which clean up a filing rather than only reporting on it, in
+# registry order, which applies each after those whose changes it depends on:
+# removing link roles and labels can leave concepts unused, for example.
+cleanups = [
+    "link-roles",
+    "labels",
+    "redundant-labels",
+    "standard-labels",
+    "concepts",
+    "contexts"
+]
+
+
+def cache_key(dts, name, options):
+    """Return the key the findings of the named utility are cached under,
+    derived from the content of every file it reads and the value of every
+    option which changes what it does.
+
+    """
+    cache = options["cache"]
+    utility = utilities[name]
+    hashes = [cache.file_hash(dts.filenames[key]) for key in utility["files"]]
+    for option, default in sorted(utility.get("config", {}).items()):
+        hashes.append(cache.file_hash(options.get(option, default)))
+    settings = tuple(
+        (option, options.get(option)) for option in utility.get("options", [])
+    )
+
+    return cache.key("findings", name, tuple(hashes), settings)
+
+
+def call(dts, name, options, modified):
+    """Call the named utility, reusing its cached findings if the cache
+    option is set and none of the files it reads have been modified. Only
+    the findings of runs which modified nothing are cached, since the
+    modifications themselves cannot be.
+
+    """
+    utility = utilities[name]
+    cache = options.get("cache")
+    key = None
+    if cache is not None and not modified.intersection(utility["files"]):
+        key = cache_key(dts, name, options)
+        findings = cache.get(key, None)
+        if findings is not None:
+            return (findings, [])
+
+    findings, keys = utility["function"](dts, options)
+    if key is not None and not keys:
+        cache.set(key, findings)
+
+    return (findings, keys)
+
+
+def run(dts, names, options=None, profiles=None):
+    """Run the named utilities against the provided DTS in registry order.
+    Returns a dictionary of the findings of each utility, a dictionary of the
+    errors raised by any utility which could not be run, and a set of the keys
+    of the files which were modified, which are also marked dirty in the DTS
+    so that DTS.save writes them. If a dictionary of profiles is supplied,
+    each utility is profiled and its Profile is added to it by name. If the
+    cache option is set to a Cache, the findings of utilities are reused for
+    as long as the files they read are unchanged.
+
+    """
+    if options is None:
+        options = {}
+    results = {}
+    errors = {}
+    modified = set()
+    for name in utilities:
+        if name not in names:
+            continue
+        try:
+            if profiles is None:
+                findings, keys = call(dts, name, options, modified)
+            else:
+                with profiling.profile(name) as profile:
+                    profiles[name] = profile
+                    findings, keys = call(dts, name, options, modified)
+        except Exception as e:
+            errors[name] = "{0}: {1}".format(type(e).__name__, e)
+            continue
+        results[name] = findings
+        modified.update(keys)
+        for key in keys:
+            dts.mark_dirty(key)
+
+    return (results, errors, modified)
+
+
+def cleanup(dts, names=None, options=None, profiles=None):
+    """Apply the named cleanup utilities, all of them by default, to the DTS
+    in memory, so that each file is parsed at most once however many of them
+    read it, then save each modified file once. Returns the findings, errors,
+    and the paths of the files written.
+
+    """
+    results, errors, modified = run(
+        dts, cleanups if names is None else names, options, profiles
+    )
+
+    return (results, errors, dts.save())
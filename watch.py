@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+
+import argparse
+import json
+import os
+import sys
+import time
+
+try:
+    from . import batch
+    from . import cache
+    from . import utilities
+    from . import xbrl
+except ImportError:
+    import batch
+    import cache
+    import utilities
+    import xbrl
+
+
+def get_mtime(filename):
+    """Return the modification time of the file, or None if it is missing."""
+    try:
+        return os.path.getmtime(filename)
+    except OSError:
+        return None
+
+
+class Watcher(object):
+    """Keeps the findings of the named utilities up to date with the files of
+    a filing. Each update re-parses only the files which have changed since
+    the last, and re-runs only the utilities which read them, according to
+    the files listed in the utility registry. Files are never written, and any
+    changes the utilities make in memory are discarded after each update.
+
+    """
+
+    def __init__(self, instance, names, options=None):
+        self.instance = instance
+        self.names = [name for name in utilities.utilities if name in names]
+        self.options = {} if options is None else options
+        self.dts = None
+        self.mtimes = {}
+        self.results = {}
+        self.errors = {}
+
+    def files(self):
+        """Return a dictionary of the path to every file the utilities read,
+        keyed by its key in the DTS or the option naming it.
+
+        """
+        files = dict(self.dts.filenames)
+        for name in self.names:
+            config = utilities.utilities[name].get("config", {})
+            for option, default in config.items():
+                files[option] = self.options.get(option, default)
+
+        return files
+
+    def changed(self):
+        """Return the set of keys of the files modified since the last
+        update, all of them if there has been none.
+
+        """
+        if self.dts is None:
+            self.dts = xbrl.DTS(self.instance, self.options.get("cache"))
+            return set(self.files())
+
+        return set(
+            key for key, filename in self.files().items()
+            if get_mtime(filename) != self.mtimes.get(key)
+        )
+
+    def affected(self, keys):
+        """Return the names of the utilities which read any of the files with
+        the given keys.
+
+        """
+        affected = []
+        for name in self.names:
+            utility = utilities.utilities[name]
+            reads = utility["files"] + list(utility.get("config", {}))
+            if keys.intersection(reads):
+                affected.append(name)
+
+        return affected
+
+    def update(self):
+        """Re-run the utilities affected by any files changed since the last
+        update, returning their names, which are empty if nothing changed.
+
+        """
+        keys = self.changed()
+        if not keys:
+            return []
+
+        filenames = dict(self.dts.filenames)
+        for key in keys:
+            if key in filenames:
+                self.dts.forget(key)
+        if self.dts.filenames != filenames:
+            # A new schema or linkbase was referenced, so anything may differ.
+            keys = set(self.files())
+        names = self.affected(keys)
+        self.mtimes = dict(
+            (key, get_mtime(filename))
+            for key, filename in self.files().items()
+        )
+        results, errors, modified = utilities.run(
+            self.dts, names, self.options
+        )
+        for key in modified:
+            self.dts.forget(key)
+        for name in names:
+            self.results.pop(name, None)
+            self.errors.pop(name, None)
+        self.results.update(results)
+        self.errors.update(errors)
+
+        return names
+
+    def watch(self, callback, interval=1.0, stop=None):
+        """Update every interval seconds, calling callback with the names of
+        the utilities re-run whenever any are, until stop returns True.
+
+        """
+        while stop is None or not stop():
+            names = self.update()
+            if names:
+                callback(names)
+            time.sleep(interval)
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(
+        description="Re-run thinX utilities whenever the files of a filing "
+                    "change."
+    )
+    parser.add_argument("instance", help="the instance document to watch")
+    parser.add_argument(
+        "-u", "--utility",
+        action="append",
+        choices=list(utilities.utilities),
+        help="a utility to run, may be repeated (default: all)"
+    )
+    parser.add_argument(
+        "-i", "--interval",
+        type=float,
+        default=1.0,
+        help="seconds between checks for changed files (default: 1)"
+    )
+    parser.add_argument(
+        "--units",
+        default="units.ini",
+        help="unit configuration file (default: units.ini)"
+    )
+    parser.add_argument(
+        "--cache",
+        nargs="?",
+        const=cache.default_directory(),
+        help="reuse indexes and findings from an on-disk cache, kept in the "
+             "given directory (default: {0})".format(cache.default_directory())
+    )
+
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    """Watches a filing until interrupted, writing a line of JSON with the
+    findings of the utilities re-run each time any of its files change.
+
+    """
+    args = parse_args(sys.argv[1:] if args is None else args)
+    options = {"units": args.units}
+    if args.cache:
+        options["cache"] = cache.Cache(args.cache)
+    watcher = Watcher(args.instance, args.utility or utilities.utilities,
+                      options)
+
+    def report(names):
+        json.dump({
+            "results": dict(
+                (name, watcher.results[name])
+                for name in names if name in watcher.results
+            ),
+            "errors": dict(
+                (name, watcher.errors[name])
+                for name in names if name in watcher.errors
+            )
+        }, sys.stdout, default=batch.to_json)
+        sys.stdout.write("\n")
+        sys.stdout.flush()
+
+    try:
+        watcher.watch(report, args.interval)
+    except KeyboardInterrupt:
+        pass
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,33 +1,321 @@
 #!/usr/bin/env python
 
+import array
 import configparser
 import collections
+import collections.abc
+import concurrent.futures
+import contextlib
+import hashlib
+import os
 import re
+import shutil
+import tempfile
 from lxml import etree
-from decimal import Decimal
-from datetime import datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_EVEN
+from datetime import datetime, timedelta
+
+try:
+    from . import profiling
+except ImportError:
+    import profiling
+
+
+# The umask can only be read by setting it, which is not safe once files are
+# written from several threads, so it is read once on import.
+_umask = os.umask(0)
+os.umask(_umask)
+
+
+@contextlib.contextmanager
+def atomic_write(filename, mode="wb", **kwargs):
+    """Open a temporary file beside filename, which replaces it once the
+    block completes, so that the file is never left partially written. The
+    original's permissions are kept, and a new file is given the permissions
+    open would give it. If the block raises, the original is left untouched.
+
+    """
+    directory = os.path.dirname(os.path.abspath(filename))
+    handle, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with open(handle, mode, **kwargs) as f:
+            yield f
+        try:
+            shutil.copymode(filename, temporary)
+        except FileNotFoundError:
+            os.chmod(temporary, 0o666 & ~_umask)
+        except OSError:
+            pass
+        os.replace(temporary, filename)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+def write_texts(texts, jobs=None):
+    """Write each text of the dictionary to the filename it is keyed by,
+    atomically and concurrently on up to jobs threads.
+
+    """
+    def write(item):
+        with atomic_write(item[0], "w", encoding="utf8") as f:
+            f.write(item[1])
+
+    with concurrent.futures.ThreadPoolExecutor(jobs) as executor:
+        list(executor.map(write, texts.items()))
+
+
+class DTS(collections.abc.Mapping):
+    """The discoverable taxonomy set of an instance document. The schema and
+    linkbases are resolved from the instance once, and each file is parsed the
+    first time it is requested. Items are dictionaries containing the filename,
+    tree, and root of a file, keyed by "xsd", "pre", "def", "cal", and "lab".
+    The instance document itself is available under "ins", but is not included
+    when iterating over the taxonomy. If a Cache is supplied, the linkbases of
+    an unchanged schema and the indexes of unchanged files are read from it
+    rather than parsing the files again. Files modified in memory are marked
+    dirty, and only dirty files are written by save.
+
+    """
+    linkbase_roles = {
+        "pre": "http://www.xbrl.org/2003/role/presentationLinkbaseRef",
+        "def": "http://www.xbrl.org/2003/role/definitionLinkbaseRef",
+        "cal": "http://www.xbrl.org/2003/role/calculationLinkbaseRef",
+        "lab": "http://www.xbrl.org/2003/role/labelLinkbaseRef"
+    }
+
+    def __init__(self, filename, cache=None):
+        self.filename = filename
+        self.cache = cache
+        self._filenames = None
+        self._files = {}
+        self._indexes = {}
+        self.dirty = set()
+
+    @property
+    def filenames(self):
+        """Return a dictionary of the path to each file in the DTS."""
+        if self._filenames is None:
+            self._filenames = self._resolve()
+
+        return self._filenames
+
+    def _resolve(self):
+        href_xpath = "{http://www.w3.org/1999/xlink}href"
+        role_xpath = "{http://www.w3.org/1999/xlink}role"
+        link = "{http://www.xbrl.org/2003/linkbase}"
+        schema_ref = "{0}schemaRef".format(link)
+        path = "{0}/".format(self.filename.rsplit("/", 1)[0])
+        filenames = {"ins": self.filename}
+        if "ins" in self._files:
+            profiling.count("xpath searches")
+            ref = self._files["ins"]["root"].find(".//" + schema_ref)
+        else:
+            # The schemaRef precedes every context and fact, so there is no
+            # need to parse the rest of a potentially huge instance for it.
+            ref = None
+            for event, ref in etree.iterparse(self.filename, tag=schema_ref):
+                break
+        filenames["xsd"] = path + ref.get(href_xpath)
+        self._filenames = filenames
+        refs = None
+        cache_key = None
+        if self.cache is not None and "xsd" not in self._files:
+            cache_key = self.cache.key(
+                "linkbase refs",
+                self.cache.file_hash(filenames["xsd"])
+            )
+            refs = self.cache.get(cache_key, None)
+        if refs is None:
+            refs = {}
+            linkbase_refs = ".//{0}linkbaseRef".format(link)
+            profiling.count("xpath searches")
+            for linkbase_ref in self["xsd"]["root"].iterfind(linkbase_refs):
+                for key, role in self.linkbase_roles.items():
+                    if linkbase_ref.get(role_xpath) == role:
+                        refs[key] = linkbase_ref.get(href_xpath)
+            if cache_key is not None:
+                self.cache.set(cache_key, refs)
+        for key, href in refs.items():
+            filenames[key] = path + href
+
+        return filenames
+
+    def __getitem__(self, key):
+        if key not in self._files:
+            try:
+                filename = self.filenames[key]
+                # Resolving the filenames may itself have parsed the schema.
+                if key in self._files:
+                    return self._files[key]
+                with profiling.phase("parse"):
+                    tree = etree.parse(filename)
+            except Exception as e:
+                e.value = key
+                raise e
+            profiling.count("files parsed")
+            self._files[key] = {
+                "filename": filename,
+                "tree": tree,
+                "root": tree.getroot(),
+                "mtime": os.path.getmtime(filename)
+            }
+
+        return self._files[key]
+
+    def __contains__(self, key):
+        return key in self.filenames
+
+    def __iter__(self):
+        return (key for key in self.filenames if key != "ins")
+
+    def __len__(self):
+        return len([key for key in self])
+
+    def is_loaded(self, key):
+        """Return whether the given file has already been parsed."""
+        return key in self._files
+
+    def mark_dirty(self, key):
+        """Record that the given file has been modified in memory, and forget
+        its indexes, which describe it as it was before.
+
+        """
+        self.dirty.add(key)
+        for index in [index for index in self._indexes if index[0] == key]:
+            del self._indexes[index]
+
+    def _write(self, key):
+        value = self._files[key]
+        with atomic_write(value["filename"]) as f:
+            value["tree"].write(f, xml_declaration=True)
+        value["mtime"] = os.path.getmtime(value["filename"])
+        self.dirty.discard(key)
+
+        return value["filename"]
+
+    def write(self, key):
+        """Write the tree of the given file back to its filename atomically,
+        whether or not it is dirty.
+
+        """
+        with profiling.phase("serialize"):
+            filename = self._write(key)
+        profiling.count("files written")
+
+        return filename
+
+    def save(self, jobs=None):
+        """Write every dirty file back to its filename, each atomically and
+        concurrently on up to jobs threads, returning their paths. Unchanged
+        files are never rewritten.
+
+        """
+        keys = sorted(self.dirty)
+        if not keys:
+            return []
+
+        with profiling.phase("serialize"):
+            with concurrent.futures.ThreadPoolExecutor(jobs) as executor:
+                written = list(executor.map(self._write, keys))
+        profiling.count("files written", len(written))
+
+        return written
+
+    def get_index(self, key, factory):
+        """Return the result of calling factory, such as CalculationNetwork,
+        with the root of the given file. The result is computed once and
+        reused until the file is modified on disk. If the DTS has a cache and
+        the file has not been parsed, the result is read from the cache when
+        the file is unchanged, without parsing it at all. Results stored in
+        the cache must be picklable.
+
+        """
+        if (key, factory) not in self._indexes:
+            filename = self.filenames[key]
+            mtime = os.path.getmtime(filename)
+            if self.cache is None or self.is_loaded(key):
+                index = factory(self[key]["root"])
+            else:
+                cache_key = self.cache.key(
+                    "index",
+                    factory.__module__,
+                    factory.__qualname__,
+                    self.cache.file_hash(filename)
+                )
+                index = self.cache.get(cache_key, None)
+                if index is None:
+                    index = factory(self[key]["root"])
+                    self.cache.set(cache_key, index)
+            self._indexes[(key, factory)] = {
+                "filename": filename,
+                "mtime": mtime,
+                "index": index
+            }
+
+        return self._indexes[(key, factory)]["index"]
+
+    def forget(self, key):
+        """Forget the parsed file and indexes of the given file, discarding
+        any changes made in memory, so that it will be read again the next
+        time it is requested.
+
+        """
+        self._files.pop(key, None)
+        self.dirty.discard(key)
+        for index in [index for index in self._indexes if index[0] == key]:
+            del self._indexes[index]
+        if key in ("ins", "xsd"):
+            self._filenames = None
+
+    def refresh(self):
+        """Forget any parsed file or index which has been modified on disk
+        since it was loaded, so that it will be read again the next time it is
+        requested.
+
+        """
+        for key, value in list(self._files.items()):
+            try:
+                modified = os.path.getmtime(value["filename"])
+            except OSError:
+                modified = None
+            if modified != value["mtime"]:
+                self.forget(key)
+        for key, value in list(self._indexes.items()):
+            try:
+                modified = os.path.getmtime(value["filename"])
+            except OSError:
+                modified = None
+            if modified != value["mtime"]:
+                del self._indexes[key]
+
+
+def get_dts(entry):
+    """Return the provided DTS, or a new DTS if given an instance filename."""
+    if isinstance(entry, DTS):
+        return entry
+
+    return DTS(entry)
 
 
 def open_linkbases(entry, files):
-    """Opens the list of files using the provided taxonomy entry point."""
+    """Opens the list of files using the provided taxonomy entry point, which
+    may be either an instance filename or a DTS. Files already parsed by a DTS
+    are reused rather than parsed again.
+
+    """
+    dts = get_dts(entry)
+    dts.refresh()
     linkbases = {}
     for key in files:
-        linkbases[key] = {}
-        try:
-            linkbases[key]["filename"] = get_linkbase(entry, key)
-            linkbases[key]["tree"] = etree.parse(linkbases[key]["filename"])
-            linkbases[key]["root"] = linkbases[key]["tree"].getroot()
-        except Exception as e:
-            e.value = key
-            raise e
+        linkbases[key] = dts[key]
 
     return linkbases
 
 
 def get_file_namespace(filename):
-    xsd = get_linkbase(filename, "xsd")
-    tree = etree.parse(xsd)
-    root = tree.getroot()
+    dts = get_dts(filename)
+    root = dts["xsd"]["root"]
     name = root.get("targetNamespace")
     for key, value in root.nsmap.items():
         if value == name:
@@ -40,7 +328,8 @@ def get_file_namespace(filename):
 
 def get_units(ini, filename=False):
     """Parses the supplied configuration file for unit namespaces, prefixes,
-    and measures.
+    and measures. If an instance filename or DTS is supplied, the BASE registry
+    uses the namespace and prefix of its schema.
 
     """
     config = configparser.ConfigParser()
@@ -65,17 +354,96 @@ def get_units(ini, filename=False):
     return registries
 
 
+class UnitRegistry(object):
+    """A compiled form of the unit registries returned by get_units. Each
+    registry keeps its prefix and namespace, a case insensitive lookup table
+    of its measures, and the set of lowercase measures which are ambiguous
+    because they differ only by case. The prefixed and bare measures of every
+    registry are also stored in sets for checking whether a measure is known.
+
+    """
+
+    def __init__(self, registries):
+        self.registries = []
+        self.qualified = set()
+        self.measures = set()
+        for name, registry in registries.items():
+            lookup = {}
+            for measure in registry["Measures"]:
+                lookup.setdefault(measure.lower(), list()).append(measure)
+                self.qualified.add(
+                    "{0}:{1}".format(registry["Prefix"], measure)
+                )
+                self.measures.add(measure)
+            self.registries.append({
+                "name": name,
+                "prefix": registry["Prefix"],
+                "namespace": registry["Namespace"],
+                "lookup": lookup,
+                "ambiguous": set(
+                    key for key, value in lookup.items() if len(value) > 1
+                )
+            })
+
+    def is_known(self, measure):
+        """Return whether the given measure is defined by any registry."""
+        if len(measure.split(":")) > 1:
+            return measure in self.qualified
+
+        return measure in self.measures
+
+
+_unit_registries = {}
+
+
+def load_units(ini, filename=False):
+    """Return a compiled UnitRegistry for the supplied configuration file, and
+    the instance filename or DTS if one is given. The registry is compiled once
+    and reused until the configuration file is modified.
+
+    """
+    try:
+        modified = os.path.getmtime(ini)
+    except OSError:
+        modified = None
+    base = None
+    if filename:
+        filename = get_dts(filename)
+        file_namespace = get_file_namespace(filename)
+        base = (file_namespace["namespace"], file_namespace["prefix"])
+
+    key = (os.path.abspath(ini), base)
+    if key not in _unit_registries or _unit_registries[key][0] != modified:
+        _unit_registries[key] = (
+            modified,
+            UnitRegistry(get_units(ini, filename))
+        )
+
+    return _unit_registries[key][1]
+
+
+def get_unit_registry(registry):
+    """Return the provided UnitRegistry, or compile the given registries."""
+    if isinstance(registry, UnitRegistry):
+        return registry
+
+    return UnitRegistry(registry)
+
+
+@profiling.timed("mutate")
 def add_namespace(elem, registry):
-    """Accepts an element, and a prefix, a namespace, and a list of measures.
-    Declares the namespace and prefix in the provided element, searches through
-    the element's children for declared units of measure. For each measure that
-    is found, it executes a case insensitive search against the supplied list
-    of measures for a match, if a match is found, the measure and its prefix
-    are replaced with the provided prefix and clean measure.
+    """Accepts an element, and the unit registries returned by get_units or a
+    UnitRegistry. Declares the namespace and prefix of each registry in the
+    provided element, and searches through the element's children for declared
+    units of measure in a single pass. For each measure that is found, a case
+    insensitive lookup is made against each registry's measures, and if a match
+    is found, the measure and its prefix are replaced with the registry's
+    prefix and clean measure.
 
     """
     log = {}
     measure_xpath = ".//{http://www.xbrl.org/2003/instance}measure"
+    registries = get_unit_registry(registry).registries
 
     def add_prefix(elem, prefix, ns):
         if prefix not in elem.nsmap:
@@ -89,17 +457,11 @@ def add_namespace(elem, registry):
         else:
             return elem
 
-    for base in registry:
-        clean_measures = registry[base]["Measures"]
-        prefix = registry[base]["Prefix"]
-        ns = registry[base]["Namespace"]
-        low_clean = [x.lower() for x in clean_measures]
-        low_clean = [
-            key
-            for key, value in collections.Counter(low_clean).items()
-            if value > 1
-        ]
-        for element in elem.iterfind(measure_xpath):
+    measures = 0
+    profiling.count("xpath searches")
+    for element in elem.iterfind(measure_xpath):
+        measures += 1
+        for base in registries:
             current = element.text.split(":")
             if len(current) > 1:
                 noprefix = False
@@ -107,116 +469,287 @@ def add_namespace(elem, registry):
             else:
                 noprefix = True
                 current = current[0]
-            for clean in clean_measures:
-                clean_lower = clean.lower()
-                if current.lower() == clean_lower:
-                    old = element.text
-                    if noprefix:
-                        new = clean
+            current_lower = current.lower()
+            for clean in base["lookup"].get(current_lower, ()):
+                old = element.text
+                if noprefix:
+                    new = clean
+                else:
+                    new = "{0}:{1}".format(base["prefix"], clean)
+                if new != old:
+                    if (current != clean and
+                            current_lower in base["ambiguous"]):
+                        pass
                     else:
-                        new = "{0}:{1}".format(prefix, clean)
-                    if new != old:
-                        if (current != clean and clean_lower in low_clean):
-                            pass
-                        else:
-                            element.text = new
-                            log[old] = new
+                        element.text = new
+                        log[old] = new
 
-        elem = add_prefix(elem, prefix, ns)
+    for base in registries:
+        elem = add_prefix(elem, base["prefix"], base["namespace"])
+    profiling.count("measures scanned", measures)
+    profiling.count("unit lookups", measures * len(registries))
 
     return (elem, log)
 
 
-def unknown_measures(elem, ini, filename):
-    """Returns all measures in the supplied element which are not defined in the
-    passed configuration file.
+@profiling.timed("search")
+def unknown_measures(elem, ini, filename=False):
+    """Returns all measures in the supplied element, which may also be an
+    InstanceReader, which are not defined in the passed configuration file or
+    UnitRegistry. The filename may be an instance or its DTS.
 
     """
     log = []
-    units = get_units(ini, filename)
-    measure_xpath = ".//{http://www.xbrl.org/2003/instance}measure"
-    for element in elem.iterfind(measure_xpath):
-        logit = True
-        for unit_set in units:
-            prefix = units[unit_set]["Prefix"]
-            for measure in units[unit_set]["Measures"]:
-                if len(element.text.split(":")) > 1:
-                    if "{0}:{1}".format(prefix, measure) == element.text:
-                        logit = False
-                else:
-                    if measure == element.text:
-                        logit = False
-
-        if logit:
-            log.append(element.text)
+    if isinstance(ini, UnitRegistry):
+        units = ini
+    else:
+        units = load_units(ini, filename)
+    if isinstance(elem, InstanceReader):
+        measures = (
+            measure
+            for record in elem if isinstance(record, Unit)
+            for measure in record.measures
+        )
+    else:
+        measure_xpath = ".//{http://www.xbrl.org/2003/instance}measure"
+        profiling.count("xpath searches")
+        measures = (element.text for element in elem.iterfind(measure_xpath))
+    for measure in measures:
+        if not units.is_known(measure):
+            log.append(measure)
 
     return log
 
 
+class LabelLinkbase(object):
+    """An index of the label link in a label linkbase element. Locs are
+    indexed by href and label, label arcs by their from and to attributes, and
+    labels by their label attribute, all in a single pass. Elements removed
+    through the index are removed from both the element and the index, so
+    lookups remain constant time as the linkbase is modified.
+
+    """
+    xlink = "{http://www.w3.org/1999/xlink}"
+    linkbase = "{http://www.xbrl.org/2003/linkbase}"
+
+    @profiling.timed("index")
+    def __init__(self, lab_elem):
+        self.elem = lab_elem
+        profiling.count("xpath searches")
+        self.link = lab_elem.find(".//{0}labelLink".format(self.linkbase))
+        self.locs = {}
+        self.loc_labels = {}
+        self.arcs_from = {}
+        self.arcs_to = {}
+        self.labels = {}
+        self.href = "{0}href".format(self.xlink)
+        self.label = "{0}label".format(self.xlink)
+        self.role = "{0}role".format(self.xlink)
+        self.arc_from = "{0}from".format(self.xlink)
+        self.arc_to = "{0}to".format(self.xlink)
+        self.loc_tag = "{0}loc".format(self.linkbase)
+        self.arc_tag = "{0}labelArc".format(self.linkbase)
+        self.label_tag = "{0}label".format(self.linkbase)
+        if self.link is None:
+            return
+        for elem in self.link.iterchildren(tag=etree.Element):
+            for mapping, key in self._keys(elem):
+                mapping.setdefault(key, list()).append(elem)
+        profiling.count("elements scanned", len(self.link))
+
+    def _keys(self, elem):
+        if elem.tag == self.loc_tag:
+            return ((self.locs, elem.get(self.href)),
+                    (self.loc_labels, elem.get(self.label)))
+        elif elem.tag == self.arc_tag:
+            return ((self.arcs_from, elem.get(self.arc_from)),
+                    (self.arcs_to, elem.get(self.arc_to)))
+        elif elem.tag == self.label_tag:
+            return ((self.labels, elem.get(self.label)),)
+
+        return ()
+
+    def remove(self, elem):
+        """Remove the given loc, label arc, or label from the linkbase."""
+        for mapping, key in self._keys(elem):
+            mapping[key].remove(elem)
+            if not mapping[key]:
+                del mapping[key]
+        self.link.remove(elem)
+
+    def concept(self, label):
+        """Return the href of the concept the given label element belongs to.
+        """
+        arcs = self.arcs_to.get(label.get(self.label))
+        if not arcs:
+            return None
+        locs = self.loc_labels.get(arcs[-1].get(self.arc_from))
+        if not locs:
+            return None
+
+        return locs[-1].get(self.href)
+
+    def get_labels(self):
+        """Return a dictionary of all labels, as returned by get_labels."""
+        found_labels = {}
+        for labels in self.labels.values():
+            for label in labels:
+                href = self.concept(label)
+                if href is not None:
+                    found_labels.setdefault(
+                        href,
+                        dict()
+                    )[label.get(self.role)] = label.text
+
+        return found_labels
+
+    @profiling.timed("mutate")
+    def delete(self, concepts):
+        """Remove the label types of the concepts in the provided dictionary,
+        as described by delete_labels, and return the removed labels.
+
+        """
+        removed_labels = {}
+        for concept, label_types in concepts.items():
+            for loc in list(self.locs.get(concept, ())):
+                from_label = loc.get(self.label)
+                for arc in list(self.arcs_from.get(from_label, ())):
+                    to_label = arc.get(self.arc_to)
+                    for label in list(self.labels.get(to_label, ())):
+                        lab_role = label.get(self.role)
+                        if label_types == "All" or lab_role in label_types:
+                            removed_labels.setdefault(
+                                concept, dict()
+                            )[lab_role] = label.text
+                            self.remove(label)
+                            profiling.count("labels removed")
+                    if to_label not in self.labels:
+                        self.remove(arc)
+                if from_label not in self.arcs_from:
+                    self.remove(loc)
+
+        return removed_labels
+
+
+def get_label_linkbase(lab_elem):
+    """Return the provided LabelLinkbase, or index the given label element."""
+    if isinstance(lab_elem, LabelLinkbase):
+        return lab_elem
+
+    return LabelLinkbase(lab_elem)
+
+
 def get_labels(lab_elem):
     """Return a dictionary of all labels in the element."""
-    found_labels = {}
+    return get_label_linkbase(lab_elem).get_labels()
+
+
+class PresentationLinkbase(object):
+    """An index of the presentation links in a presentation linkbase element,
+    built in a single pass. Each link records its role, its locs by label, and
+    its presentation arcs by their to attribute. The preferred labels used by
+    each concept are counted as well, and kept current as they are changed.
+
+    """
     xlink = "{http://www.w3.org/1999/xlink}"
     linkbase = "{http://www.xbrl.org/2003/linkbase}"
-    role_attr_xpath = "{0}role".format(xlink)
-    to_attr_xpath = "{0}to".format(xlink)
-    from_attr_xpath = "{0}from".format(xlink)
-    href_attr_xpath = "{0}href".format(xlink)
-    label_attr_xpath = "{0}label".format(xlink)
-    lab_link = lab_elem.find(".//{0}labelLink".format(linkbase))
-
-    loc = "{0}loc".format(linkbase)
-    label_arc = "{0}labelArc".format(linkbase)
-    label = "{0}label".format(linkbase)
-    locs = {}
-    label_arcs = {}
-    labels = {}
-
-    for elem in lab_link.iter():
-        if elem.tag == loc:
-            locs[elem.get(label_attr_xpath)] = elem.get(href_attr_xpath)
-        elif elem.tag == label_arc:
-            label_arcs[elem.get(to_attr_xpath)] = elem.get(from_attr_xpath)
-        elif elem.tag == label:
-            labels[(elem.get(label_attr_xpath), elem.get(role_attr_xpath))] = {
-                "type": elem.get(role_attr_xpath),
-                "label": elem.text
+
+    @profiling.timed("index")
+    def __init__(self, pre_elem):
+        self.elem = pre_elem
+        self.links = []
+        self.roles = {}
+        self.locs = {}
+        self.usage = {}
+        href = "{0}href".format(self.xlink)
+        label = "{0}label".format(self.xlink)
+        arc_to = "{0}to".format(self.xlink)
+        loc_tag = "{0}loc".format(self.linkbase)
+        arc_tag = "{0}presentationArc".format(self.linkbase)
+        for link in pre_elem.iter("{0}presentationLink".format(self.linkbase)):
+            value = {
+                "role": link.get("{0}role".format(self.xlink)),
+                "element": link,
+                "locs": {},
+                "arcs": {}
             }
+            for elem in link.iterchildren(loc_tag, arc_tag):
+                if elem.tag == loc_tag:
+                    value["locs"].setdefault(
+                        elem.get(label),
+                        list()
+                    ).append(elem)
+                else:
+                    value["arcs"].setdefault(
+                        elem.get(arc_to),
+                        list()
+                    ).append(elem)
+            for loc_label, locs in value["locs"].items():
+                for loc in locs:
+                    concept = loc.get(href)
+                    self.locs.setdefault(concept, list()).append((value, loc))
+                    usage = self.usage.setdefault(concept, dict())
+                    for arc in value["arcs"].get(loc_label, ()):
+                        preferred = arc.get("preferredLabel")
+                        usage[preferred] = usage.get(preferred, 0) + 1
+            self.links.append(value)
+            self.roles.setdefault(value["role"], list()).append(value)
+            profiling.count("elements scanned", len(link))
+
+    def get_used_labels(self):
+        """Return a dictionary of the label types used by each concept, as
+        returned by get_used_labels.
+
+        """
+        found_labels = {}
+        for concept, usage in self.usage.items():
+            found_labels[concept] = dict.fromkeys(usage, True)
+
+        return found_labels
+
+    def change(self, concept, old_label_type, new_label_type):
+        """Change the preferred label of every arc to the given concept from
+        the old label type to the new one, returning the number changed.
+
+        """
+        label = "{0}label".format(self.xlink)
+        changed = 0
+        for link, loc in self.locs.get(concept, ()):
+            for arc in link["arcs"].get(loc.get(label), ()):
+                if arc.get("preferredLabel") == old_label_type:
+                    arc.set("preferredLabel", new_label_type)
+                    changed += 1
+        if changed:
+            usage = self.usage[concept]
+            usage[old_label_type] -= changed
+            if not usage[old_label_type]:
+                del usage[old_label_type]
+            usage[new_label_type] = usage.get(new_label_type, 0) + changed
+
+        return changed
+
+
+def get_presentation_linkbase(pre_elem):
+    """Return the provided PresentationLinkbase, or index the given
+    presentation element.
 
-    for lab, label_type in labels.items():
-        href = locs[label_arcs[lab[0]]]
-        found_labels.setdefault(
-            href,
-            dict()
-        )[label_type["type"]] = label_type["label"]
-    return found_labels
+    """
+    if isinstance(pre_elem, PresentationLinkbase):
+        return pre_elem
+
+    return PresentationLinkbase(pre_elem)
 
 
 def get_used_labels(pre_elem):
     """Return a dictionary listing all active labels in the element."""
-    found_labels = {}
-    xlink = "{http://www.w3.org/1999/xlink}"
-    linkbase = ".//{http://www.xbrl.org/2003/linkbase}"
-    arc_xpath = "{0}presentationArc[@{1}to='%s']".format(linkbase, xlink)
-    href_attr_xpath = "{0}href".format(xlink)
-    lab_attr_xpath = "{0}label".format(xlink)
-    loc_xpath = "{0}loc".format(linkbase)
+    return get_presentation_linkbase(pre_elem).get_used_labels()
 
-    for link in pre_elem.iterfind("{0}presentationLink".format(linkbase)):
-        for loc in link.iterfind(loc_xpath):
-            concept = loc.get(href_attr_xpath)
-            if concept not in found_labels:
-                found_labels[concept] = {}
-            for pre_arc in link.iterfind(arc_xpath % loc.get(lab_attr_xpath)):
-                element = pre_arc.get("preferredLabel")
-                found_labels[concept][element] = True
 
-    return found_labels
-
-
-def clean_labels(lab_elem, pre_elem):
+def clean_labels(lab_elem, pre_elem, used_labels=None):
     """Search through the provided label element's children for labels and
-    delete any that are not being used by the presentation element.
+    delete any that are not being used by the presentation element. The
+    result of get_used_labels may be supplied instead of the presentation
+    element to avoid building it again.
 
     """
     # Label types which are never presented, and therefor shouldn't be deleted
@@ -231,8 +764,10 @@ def clean_labels(lab_elem, pre_elem):
         "http://www.xbrl.org/2003/role/commentaryGuidance",
         "http://www.xbrl.org/2003/role/exampleGuidance"
     ]
-    used_labels = get_used_labels(pre_elem)
-    labels = get_labels(lab_elem)
+    if used_labels is None:
+        used_labels = get_used_labels(pre_elem)
+    label_linkbase = get_label_linkbase(lab_elem)
+    labels = label_linkbase.get_labels()
     to_delete = {}
     for concept, lab_types in labels.items():
         if concept not in used_labels:
@@ -243,11 +778,105 @@ def clean_labels(lab_elem, pre_elem):
                 not_standard = lab_type not in standard_labels
                 if (not_used and not_standard):
                     to_delete.setdefault(concept, list()).append(lab_type)
-    removed_labels, lab_elem = delete_labels(to_delete, lab_elem)
+    removed_labels, label_linkbase = delete_labels(to_delete, label_linkbase)
 
     return removed_labels
 
 
+# The kind of each label type which may be consolidated with another, and
+# its rank among the label types it may be consolidated with. Terse and
+# verbose labels may replace any positive, negative, or zero label, and
+# otherwise only label types of the same kind may replace one another. The
+# label type of the lowest rank replaces the others.
+_label_kinds = {
+    "http://www.xbrl.org/2003/role/terseLabel": ("regular", 0),
+    "http://www.xbrl.org/2003/role/verboseLabel": ("regular", 1),
+    "http://www.xbrl.org/2003/role/positiveLabel": ("positive", 2),
+    "http://www.xbrl.org/2003/role/positiveTerseLabel": ("positive", 3),
+    "http://www.xbrl.org/2003/role/positiveVerboseLabel": ("positive", 4),
+    "http://www.xbrl.org/2003/role/negativeLabel": ("negative", 2),
+    "http://www.xbrl.org/2003/role/negativeTerseLabel": ("negative", 3),
+    "http://www.xbrl.org/2003/role/negativeVerboseLabel": ("negative", 4),
+    "http://www.xbrl.org/2003/role/zeroLabel": ("zero", 2),
+    "http://www.xbrl.org/2003/role/zeroTerseLabel": ("zero", 3),
+    "http://www.xbrl.org/2003/role/zeroVerboseLabel": ("zero", 4),
+    "http://www.xbrl.org/2009/role/negatedLabel": ("negated", 0),
+    "http://www.xbrl.org/2009/role/negatedTerseLabel": ("negated", 1)
+}
+
+
+class DisjointSet(object):
+    """A union-find forest of hashable items, each of which is in a set of
+    its own until it is joined with another. Finding the root of an item
+    compresses the path to it.
+
+    """
+
+    def __init__(self):
+        self.parents = {}
+
+    def find(self, item):
+        """Return the item at the root of the given item's set."""
+        root = item
+        while self.parents.setdefault(root, root) != root:
+            root = self.parents[root]
+        while item != root:
+            self.parents[item], item = root, self.parents[item]
+
+        return root
+
+    def union(self, item, other):
+        """Join the sets of the two items."""
+        self.parents[self.find(item)] = self.find(other)
+
+    def sets(self):
+        """Return a list of the items in each set of more than one item."""
+        members = collections.OrderedDict()
+        for item in list(self.parents):
+            members.setdefault(self.find(item), list()).append(item)
+
+        return [items for items in members.values() if len(items) > 1]
+
+
+def label_equivalences(labels):
+    """Return the redundant labels in a dictionary of labels, as returned by
+    get_labels, as a dictionary of each concept with redundant labels and the
+    label type to use in place of each redundant label type. The label types
+    of each concept are grouped by their text in a single pass, and those
+    which may replace one another are joined into sets, so that each label
+    type is replaced directly by the label type of the lowest rank in its set.
+
+    """
+    result = {}
+    for concept, label_types in labels.items():
+        texts = {}
+        for label_type, label in label_types.items():
+            if label_type in _label_kinds:
+                kind = _label_kinds[label_type][0]
+                texts.setdefault(
+                    label,
+                    collections.OrderedDict()
+                ).setdefault(kind, list()).append(label_type)
+        equivalent = DisjointSet()
+        for kinds in texts.values():
+            regular = kinds.get("regular")
+            for kind, same_kind in kinds.items():
+                for label_type in same_kind[1:]:
+                    equivalent.union(label_type, same_kind[0])
+                if regular and kind not in ("regular", "negated"):
+                    equivalent.union(same_kind[0], regular[0])
+        for label_types in equivalent.sets():
+            replacement = min(
+                label_types,
+                key=lambda label_type: _label_kinds[label_type][1]
+            )
+            for label_type in label_types:
+                if label_type != replacement:
+                    result.setdefault(concept, {})[label_type] = replacement
+
+    return result
+
+
 def redundant_labels(lab_elem, pre_elem):
     """Search through the provided label element's children for concepts with
     redundant labels and consolidate them. Also update the presentation element
@@ -255,111 +884,50 @@ def redundant_labels(lab_elem, pre_elem):
     of label for a concept.
 
     """
+    label_linkbase = get_label_linkbase(lab_elem)
+    result = label_equivalences(label_linkbase.get_labels())
+    removed_labels, label_linkbase = delete_labels(result, label_linkbase)
+    pre_elem = change_preferred_labels(result, pre_elem)
 
-    def add_to_result(concept, base_label_types, label_type, store_label_type):
-        if concept not in result:
-            result[concept] = {}
-        if base_label_types[label_type] > base_label_types[store_label_type]:
-            result[concept][label_type] = store_label_type
-        else:
-            result[concept][store_label_type] = label_type
+    return result
 
-    regular_label_types = {
-        "http://www.xbrl.org/2003/role/terseLabel": 0,
-        "http://www.xbrl.org/2003/role/verboseLabel": 1
-    }
-    positive_label_types = {
-        "http://www.xbrl.org/2003/role/positiveLabel": 2,
-        "http://www.xbrl.org/2003/role/positiveTerseLabel": 3,
-        "http://www.xbrl.org/2003/role/positiveVerboseLabel": 4
-    }
-    negative_label_types = {
-        "http://www.xbrl.org/2003/role/negativeLabel": 2,
-        "http://www.xbrl.org/2003/role/negativeTerseLabel": 3,
-        "http://www.xbrl.org/2003/role/negativeVerboseLabel": 4
-    }
-    zero_label_types = {
-        "http://www.xbrl.org/2003/role/zeroLabel": 2,
-        "http://www.xbrl.org/2003/role/zeroTerseLabel": 3,
-        "http://www.xbrl.org/2003/role/zeroVerboseLabel": 4
-    }
-    pos_label_types = dict(
-        list(regular_label_types.items())
-        + list(positive_label_types.items())
-        + list(negative_label_types.items())
-        + list(zero_label_types.items())
-    )
-    neg_label_types = {
-        "http://www.xbrl.org/2009/role/negatedLabel": 0,
-        "http://www.xbrl.org/2009/role/negatedTerseLabel": 1
-    }
-    result = {}
 
-    for concept, label_types in get_labels(lab_elem).items():
-        store = {}
-        for label_type, label in label_types.items():
-            for store_label_type, store_label in store.items():
-                if label == store_label:
-                    is_pos = label_type in pos_label_types
-                    store_is_pos = store_label_type in pos_label_types
-                    is_neg = label_type in neg_label_types
-                    store_is_neg = store_label_type in neg_label_types
-                    if (is_pos and store_is_pos):
-                        if (label_type in regular_label_types or
-                                store_label_type in regular_label_types):
-                            add_to_result(
-                                concept,
-                                pos_label_types,
-                                label_type,
-                                store_label_type
-                            )
-                        elif (label_type in positive_label_types and
-                              store_label_type in positive_label_types):
-                            add_to_result(
-                                concept,
-                                positive_label_types,
-                                label_type,
-                                store_label_type
-                            )
-                        elif (label_type in negative_label_types and
-                              store_label_type in negative_label_types):
-                            add_to_result(
-                                concept,
-                                negative_label_types,
-                                label_type,
-                                store_label_type
-                            )
-                        elif (label_type in zero_label_types and
-                              store_label_type in zero_label_types):
-                            add_to_result(
-                                concept,
-                                zero_label_types,
-                                label_type,
-                                store_label_type
-                            )
-                    elif (is_neg and store_is_neg):
-                        add_to_result(
-                            concept,
-                            neg_label_types,
-                            label_type,
-                            store_label_type
-                        )
-            store[label_type] = label
-
-    clean = False
-    while not clean:
-        clean = True
-        for concept in result:
-            keys = result[concept].keys()
-            for key, value in result[concept].items():
-                if value in keys:
-                    result[concept][key] = result[concept][value]
-                    clean = False
-
-    removed_labels, lab_elem = delete_labels(result, lab_elem)
-    pre_elem = change_preferred_labels(result, pre_elem)
+@profiling.timed("analyze")
+def duplicate_labels(lab_elem):
+    """Return the labels of the provided label element, or LabelLinkbase,
+    whose text is shared by more than one concept for the same label type
+    and language, in a single pass over its labels which indexes the
+    concepts using each text. White space is collapsed before texts are
+    compared. The result is a dictionary of each label type with duplicates,
+    a dictionary of each of its languages with duplicates, and a dictionary
+    of each duplicated text with a sorted list of the concepts which share it.
 
-    return result
+    """
+    label_linkbase = get_label_linkbase(lab_elem)
+    index = {}
+    for labels in label_linkbase.labels.values():
+        for label in labels:
+            if label.text is None:
+                continue
+            concept = label_linkbase.concept(label)
+            if concept is None:
+                continue
+            index.setdefault(
+                (label.get(label_linkbase.role),
+                 label.get(_xml_lang)),
+                dict()
+            ).setdefault(" ".join(label.text.split()), set()).add(concept)
+
+    duplicates = {}
+    for (label_type, lang), texts in index.items():
+        for text, concepts in texts.items():
+            if len(concepts) > 1:
+                duplicates.setdefault(
+                    label_type,
+                    dict()
+                ).setdefault(lang, dict())[text] = sorted(concepts)
+
+    return duplicates
 
 
 def remove_standard_labels(label_elem):
@@ -367,314 +935,1181 @@ def remove_standard_labels(label_elem):
     belong to elements from a remote taxonomy.
 
     """
-    linkbase = ".//{http://www.xbrl.org/2003/linkbase}"
-    xlink = "{http://www.w3.org/1999/xlink}"
     standard_label = "http://www.xbrl.org/2003/role/label"
-    role_attr_xpath = "{0}label[@{1}role='{2}']".format(linkbase,
-                                                        xlink,
-                                                        standard_label)
-    label_arc_xpath = "{0}labelArc[@{1}to='%s']".format(linkbase, xlink)
-    loc_xpath = "{0}loc[@{1}label='%s']".format(linkbase, xlink)
-    label_attr_xpath = "{0}label".format(xlink)
-    from_attr_xpath = "{0}from".format(xlink)
-    href_attr_xpath = "{0}href".format(xlink)
+    role_attr_xpath = "{http://www.w3.org/1999/xlink}role"
     url_reg = re.compile("^https?://")
+    label_linkbase = get_label_linkbase(label_elem)
     to_delete = {}
-    for label in label_elem.iterfind(role_attr_xpath):
-        label_attr = label.get(label_attr_xpath)
-        label_arc = label_elem.find(label_arc_xpath % label_attr)
-        from_attr = label_arc.get(from_attr_xpath)
-        loc = label_elem.find(loc_xpath % from_attr)
-        href_attr = loc.get(href_attr_xpath)
-        if url_reg.match(href_attr):
-            to_delete[href_attr] = standard_label
-    removed_labels, lab_elem = delete_labels(to_delete, label_elem)
+    for labels in label_linkbase.labels.values():
+        for label in labels:
+            if label.get(role_attr_xpath) != standard_label:
+                continue
+            href_attr = label_linkbase.concept(label)
+            if href_attr is not None and url_reg.match(href_attr):
+                to_delete[href_attr] = [standard_label]
+    removed_labels, label_linkbase = delete_labels(to_delete, label_linkbase)
 
     return removed_labels
 
 
+@profiling.timed("mutate")
 def change_preferred_labels(concepts, pre_elem):
-    """Accepts a dictionary of concepts, and a presentation link element. The
-    dictionary container  a label type to remove
-    and the label type to use in it's place.
+    """Accepts a dictionary of concepts, and a presentation link element or
+    its PresentationLinkbase. The dictionary contains a label type to remove
+    and the label type to use in it's place for each concept.
 
     """
-    linkbase = ".//{http://www.xbrl.org/2003/linkbase}"
-    xlink = "{http://www.w3.org/1999/xlink}"
-    loc_href_xpath = "{0}loc[@{1}href='%s']".format(linkbase, xlink)
-    lab_attr_xpath = "{0}label".format(xlink)
-    to_attr_xpath = "{0}presentationArc[@{1}to='%s']".format(linkbase, xlink)
-
+    presentation_linkbase = get_presentation_linkbase(pre_elem)
     for concept, label_types in concepts.items():
-        for loc in pre_elem.iterfind(loc_href_xpath % concept):
-            for old_label_type, new_label_type in label_types.items():
-                for arc in pre_elem.iterfind(
-                    to_attr_xpath % loc.get(lab_attr_xpath)
-                ):
-                    if arc.get("preferredLabel") == old_label_type:
-                        arc.set("preferredLabel", new_label_type)
+        for old_label_type, new_label_type in label_types.items():
+            presentation_linkbase.change(
+                concept,
+                old_label_type,
+                new_label_type
+            )
 
     return pre_elem
 
 
 def delete_labels(concepts, lab_elem):
-    """Accepts a dictionary of concepts, and a label linkbase element. The
-    dictionary of concepts contains concepts as keys, and a list of label types
-    to remove as their values. The label types of the concepts are removed from
-    the label linkbase element.
+    """Accepts a dictionary of concepts, and a label linkbase element or its
+    LabelLinkbase. The dictionary of concepts contains concepts as keys, and a
+    list of label types to remove as their values. The label types of the
+    concepts are removed from the label linkbase element.
 
     """
-    xlink = "{http://www.w3.org/1999/xlink}"
-    linkbase = "{http://www.xbrl.org/2003/linkbase}"
-    role_attr_xpath = "{0}role".format(xlink)
-    to_attr_xpath = "{0}to".format(xlink)
-    label_attr_xpath = "{0}label".format(xlink)
-    lab_link = lab_elem.find(".//{0}labelLink".format(linkbase))
-    label_xpath = ".//{0}label[@{1}label='%s']".format(linkbase, xlink)
-    loc_href_xpath = ".//{0}loc[@{1}href='%s']".format(linkbase, xlink)
-    label_arc_xpath = ".//{0}labelArc[@{1}from='%s']".format(linkbase, xlink)
-    removed_labels = {}
-    for concept, label_types in concepts.items():
-        for loc_to_delete in lab_link.iterfind(loc_href_xpath % concept):
-            label_ref = label_arc_xpath % loc_to_delete.get(label_attr_xpath)
-            for label_arc_to_delete in lab_link.iterfind(label_ref):
-                to_label = label_arc_to_delete.get(to_attr_xpath)
-                for lab_to_delete in lab_link.iterfind(label_xpath % to_label):
-                    lab_role = lab_to_delete.get(role_attr_xpath)
-                    if label_types == "All" or lab_role in label_types:
-                        removed_labels.setdefault(
-                            concept, dict()
-                        )[lab_role] = lab_to_delete.text
-                        lab_link.remove(lab_to_delete)
-                if not etree.iselement(lab_link.find(label_xpath % to_label)):
-                    lab_link.remove(label_arc_to_delete)
-            if not etree.iselement(lab_link.find(label_ref)):
-                lab_link.remove(loc_to_delete)
+    removed_labels = get_label_linkbase(lab_elem).delete(concepts)
 
     return (removed_labels, lab_elem)
 
 
+# The namespaces of the instance, its dimensions, and its attributes, in the
+# form used to build Clark notation.
+_xbrli = "{http://www.xbrl.org/2003/instance}"
+_xbrldi = "{http://xbrl.org/2006/xbrldi}"
+_xml_lang = "{http://www.w3.org/XML/1998/namespace}lang"
+_nil = "{http://www.w3.org/2001/XMLSchema-instance}nil"
+
+Context = collections.namedtuple(
+    "Context",
+    ["id", "entity", "start", "end", "instant", "dimensions"]
+)
+Unit = collections.namedtuple("Unit", ["id", "measures"])
+Fact = collections.namedtuple(
+    "Fact",
+    ["concept", "context", "unit", "id", "decimals", "lang", "value"]
+)
+
+
+class InstanceReader(object):
+    """Streams the contexts, units, and facts of an instance document with
+    iterparse, yielding a Context, Unit, or Fact record for each of them in
+    document order. Each child of the root element is cleared once its records
+    have been yielded, so memory use does not grow with the size of the file.
+    The namespaces declared on the root element are available as nsmap, so a
+    reader can be used in place of the root element by the read-only checks.
+
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._nsmap = None
+
+    @property
+    def nsmap(self):
+        """Return the namespaces declared on the root element."""
+        if self._nsmap is None:
+            for event, elem in etree.iterparse(
+                self.filename,
+                events=("start",)
+            ):
+                self._nsmap = dict(elem.nsmap)
+                break
+
+        return self._nsmap
+
+    def __iter__(self):
+        depth = 0
+        for event, elem in etree.iterparse(
+            self.filename,
+            events=("start", "end")
+        ):
+            if event == "start":
+                if depth == 0:
+                    self._nsmap = dict(elem.nsmap)
+                depth += 1
+                continue
+            depth -= 1
+            if depth != 1:
+                continue
+            if elem.tag == "{0}context".format(_xbrli):
+                yield read_context(elem)
+            elif elem.tag == "{0}unit".format(_xbrli):
+                yield Unit(elem.get("id"), tuple(
+                    measure.text for measure in elem.iter(
+                        "{0}measure".format(_xbrli)
+                    )
+                ))
+            else:
+                for fact in elem.iter(tag=etree.Element):
+                    if fact.get("contextRef") is not None:
+                        yield read_fact(fact)
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+
+
+_date_pattern = re.compile(
+    r"^(\d{4}-\d{2}-\d{2})(?:T(\d{2}):(\d{2}):(\d{2})(\.\d+)?)?"
+    r"(Z|[+-]\d{2}:\d{2})?$"
+)
+
+
+def normalize_date(text, end=False):
+    """Return an xbrli date or dateTime as an ISO 8601 date and time. A date
+    without a time is the midnight at its start, or, as the end of a period
+    or an instant, the midnight at its end. A date or time with a timezone
+    is converted to UTC and suffixed with Z, and fractions of a second are
+    dropped.
+
+    """
+    match = _date_pattern.match(text.strip())
+    if match is None:
+        raise ValueError("invalid date: {0!r}".format(text))
+    date, hour, minute, second, fraction, zone = match.groups()
+    day = datetime.strptime(date, "%Y-%m-%d")
+    if hour is not None:
+        day += timedelta(hours=int(hour), minutes=int(minute),
+                         seconds=int(second))
+    elif end:
+        day += timedelta(days=1)
+    if zone is None:
+        return day.isoformat()
+    if zone != "Z":
+        offset = timedelta(hours=int(zone[1:3]), minutes=int(zone[4:6]))
+        day += -offset if zone[0] == "+" else offset
+
+    return "{0}Z".format(day.isoformat())
+
+
+def _read_context(elem, canonical=True):
+    """Return a Context record of the given context element, along with its
+    canonical key unless canonical is False, in a single pass over its
+    descendants. Dimensions and members are resolved to Clark notation for
+    the key, and kept apart by whether they qualify the segment or the
+    scenario, along with any other content of either. Each qualifier is a
+    tuple of its container and its kind, "explicit", "typed", or "xml", so
+    that qualifiers of every kind can be sorted together.
+
+    """
+    identifier_tag = "{0}identifier".format(_xbrli)
+    date_tags = dict(
+        ("{0}{1}".format(_xbrli, name), name)
+        for name in ("startDate", "endDate", "instant", "forever")
+    )
+    member_tags = (
+        "{0}explicitMember".format(_xbrldi),
+        "{0}typedMember".format(_xbrldi)
+    )
+    containers = dict(
+        ("{0}{1}".format(_xbrli, name), name)
+        for name in ("segment", "scenario")
+    )
+
+    def resolve(element, qname):
+        prefix, name = qname.strip().rpartition(":")[::2]
+        return "{{{0}}}{1}".format(element.nsmap.get(prefix or None), name)
+
+    entity = None
+    dates = {}
+    dimensions = []
+    qualifiers = []
+    for child in elem.iter(tag=etree.Element):
+        if child.tag == identifier_tag:
+            entity = (child.get("scheme"), (child.text or "").strip())
+        elif child.tag in date_tags:
+            dates[date_tags[child.tag]] = child.text or ""
+        elif child.tag in member_tags:
+            text = "".join(child.itertext()).strip()
+            dimensions.append((child.get("dimension"), text))
+            if not canonical:
+                continue
+            container = containers.get(child.getparent().tag) or ""
+            dimension = resolve(child, child.get("dimension"))
+            if child.tag == member_tags[0]:
+                qualifiers.append((container, "explicit", dimension,
+                                   resolve(child, text)))
+            else:
+                typed = [(member.tag, "".join(member.itertext()).strip())
+                         for member in child.iterchildren(tag=etree.Element)]
+                qualifiers.append((container, "typed", dimension,
+                                   tuple(typed)))
+        elif canonical and child.getparent().tag in containers:
+            qualifiers.append((
+                containers[child.getparent().tag],
+                "xml",
+                etree.tostring(child, method="c14n")
+            ))
+
+    record = Context(
+        elem.get("id"),
+        entity,
+        dates.get("startDate"),
+        dates.get("endDate"),
+        dates.get("instant"),
+        tuple(sorted(dimensions))
+    )
+    if not canonical:
+        return (record, None)
+
+    if "instant" in dates:
+        period = ("instant", normalize_date(dates["instant"], True))
+    elif "startDate" in dates:
+        period = ("duration", normalize_date(dates["startDate"]),
+                  normalize_date(dates["endDate"], True))
+    else:
+        period = ("forever",)
+
+    return (record, (entity, period, tuple(sorted(qualifiers))))
+
+
+def read_context(elem):
+    """Return a Context record of the given context element."""
+    return _read_context(elem, False)[0]
+
+
+def read_fact(elem):
+    """Return a Fact record of the given fact element. The value of a nil
+    fact is None, and that of a fraction is its numerator and denominator
+    separated by a slash.
+
+    """
+    if elem.get(_nil) == "true":
+        value = None
+    elif len(elem):
+        value = "/".join((child.text or "").strip() for child in elem)
+    else:
+        value = elem.text
+
+    return Fact(
+        elem.tag,
+        elem.get("contextRef"),
+        elem.get("unitRef"),
+        elem.get("id"),
+        elem.get("decimals"),
+        elem.get(_xml_lang),
+        value
+    )
+
+
+def parse_decimal(text):
+    """Return the Decimal value of the given text, or None if it is not a
+    decimal number, as with fractions.
+
+    """
+    try:
+        return Decimal(text)
+    except InvalidOperation:
+        return None
+
+
+class ContextCatalog(object):
+    """Every context of an instance element, read in a single pass, with the
+    hash of a canonical key of each: its entity, its period with dates
+    normalized to dates and times, and the sorted set of its dimensions and
+    members. Contexts with the same hash are semantically identical, however
+    they are named. Contexts and hashes are keyed by id in document order.
+
+    """
+
+    @profiling.timed("index")
+    def __init__(self, elem):
+        self.contexts = collections.OrderedDict()
+        self.hashes = collections.OrderedDict()
+        context_tag = "{0}context".format(_xbrli)
+        for context in elem.iterchildren(context_tag):
+            record, key = _read_context(context)
+            self.contexts[record.id] = record
+            self.hashes[record.id] = hashlib.sha1(
+                repr(key).encode("utf-8")
+            ).hexdigest()
+        profiling.count("elements scanned", len(self.contexts))
+
+    def __len__(self):
+        return len(self.contexts)
+
+    def groups(self):
+        """Return a dictionary of the ids of the contexts with each hash."""
+        groups = collections.OrderedDict()
+        for identifier, digest in self.hashes.items():
+            groups.setdefault(digest, list()).append(identifier)
+
+        return groups
+
+    def duplicates(self):
+        """Return a dictionary of the ids of the contexts which duplicate an
+        earlier context, keyed by the id of the first.
+
+        """
+        return collections.OrderedDict(
+            (identifiers[0], identifiers[1:])
+            for identifiers in self.groups().values()
+            if len(identifiers) > 1
+        )
+
+
+@profiling.timed("mutate")
+def merge_contexts(elem, catalog=None):
+    """Merge every context of the provided instance element into the first
+    context it duplicates, rewriting every contextRef and removing the
+    duplicates in a single sweep. Returns the duplicates merged, as
+    ContextCatalog.duplicates does.
+
+    """
+    if catalog is None:
+        catalog = ContextCatalog(elem)
+    duplicates = catalog.duplicates()
+    replacements = dict(
+        (duplicate, identifier)
+        for identifier, merged in duplicates.items()
+        for duplicate in merged
+    )
+    if not replacements:
+        return duplicates
+
+    context_tag = "{0}context".format(_xbrli)
+    removed = []
+    scanned = 0
+    for element in elem.iter(tag=etree.Element):
+        scanned += 1
+        context = element.get("contextRef")
+        if context in replacements:
+            element.set("contextRef", replacements[context])
+        elif element.tag == context_tag and \
+                element.get("id") in replacements:
+            removed.append(element)
+    for element in removed:
+        element.getparent().remove(element)
+    profiling.count("elements scanned", scanned)
+
+    return duplicates
+
+
+@profiling.timed("search")
 def two_day_contexts(elem):
-    """Return durational two day contexts defined in the provided element."""
+    """Return durational two day contexts defined in the provided element,
+    which may also be an InstanceReader.
+
+    """
 
     def days_between(d1, d2):
-        d1 = datetime.strptime(d1, "%Y-%m-%d")
-        d2 = datetime.strptime(d2, "%Y-%m-%d")
+        d1 = datetime.strptime(d1.strip()[:10], "%Y-%m-%d")
+        d2 = datetime.strptime(d2.strip()[:10], "%Y-%m-%d")
         return abs((d2 - d1).days)
 
+    if isinstance(elem, InstanceReader):
+        records = (record for record in elem if isinstance(record, Context))
+    else:
+        records = (read_context(context) for context in elem.iterchildren(
+            "{0}context".format(_xbrli)
+        ))
     contexts = []
-    instance_xpath = ".//{http://www.xbrl.org/2003/instance}"
-    start_xpath = "{0}startDate".format(instance_xpath)
-    end_xpath = "{0}endDate".format(instance_xpath)
-
-    for context in elem.iterfind("{0}context".format(instance_xpath)):
-        start = context.find(start_xpath)
-        if start is not None:
-            if days_between(start.text, context.find(end_xpath).text) == 1:
-                contexts.append(context.get("id"))
+    for record in records:
+        if record.start is not None and record.end is not None:
+            if days_between(record.start, record.end) == 1:
+                contexts.append(record.id)
 
     return contexts
 
 
+@profiling.timed("search")
+def count_references(elem):
+    """Walk the provided instance element once, counting every contextRef,
+    unitRef, and footnote arc. Returns a dictionary containing a Counter of
+    references for each context id, unit id, and footnote element, along with
+    the declared contexts, units, and footnote links that were found.
+
+    """
+    instance = "{http://www.xbrl.org/2003/instance}"
+    link = "{http://www.xbrl.org/2003/linkbase}"
+    xlink = "{http://www.w3.org/1999/xlink}"
+    references = {
+        "contexts": collections.Counter(),
+        "units": collections.Counter(),
+        "footnotes": collections.Counter(),
+        "declared_contexts": [],
+        "declared_units": [],
+        "footnote_links": []
+    }
+    # Every id is collected, since footnotes may be attached to tuples,
+    # which have no contextRef, as well as to items.
+    ids = set()
+    scanned = 0
+    for element in elem.iter(tag=etree.Element):
+        scanned += 1
+        identifier = element.get("id")
+        if identifier is not None:
+            ids.add(identifier)
+        context = element.get("contextRef")
+        if context is not None:
+            references["contexts"][context] += 1
+            unit = element.get("unitRef")
+            if unit is not None:
+                references["units"][unit] += 1
+        elif element.tag == "{0}context".format(instance):
+            references["declared_contexts"].append(element)
+        elif element.tag == "{0}unit".format(instance):
+            references["declared_units"].append(element)
+        elif element.tag == "{0}footnoteLink".format(link):
+            references["footnote_links"].append(element)
+
+    # Footnote labels are only unique within their extended link, and a
+    # footnote is only referenced by arcs from locs pointing at real facts.
+    for footnote_link in references["footnote_links"]:
+        live_locs = set()
+        footnotes = {}
+        for child in footnote_link.iterchildren(tag=etree.Element):
+            if child.tag == "{0}loc".format(link):
+                if child.get("{0}href".format(xlink)).split("#")[-1] in \
+                        ids:
+                    live_locs.add(child.get("{0}label".format(xlink)))
+            elif child.tag == "{0}footnote".format(link):
+                footnotes[child.get("{0}label".format(xlink))] = child
+                references["footnotes"][child] = 0
+        for arc in footnote_link.iterchildren(
+            tag="{0}footnoteArc".format(link)
+        ):
+            to_label = arc.get("{0}to".format(xlink))
+            if arc.get("{0}from".format(xlink)) in live_locs and \
+                    to_label in footnotes:
+                references["footnotes"][footnotes[to_label]] += 1
+    profiling.count("elements scanned", scanned)
+
+    return references
+
+
+def unused_references(elem):
+    """Return a dictionary of lists of the ids of the contexts and units which
+    are not referenced by any fact in the provided element, which may also be
+    an InstanceReader. Nothing is removed.
+
+    """
+    unused = {"contexts": [], "units": []}
+    if isinstance(elem, InstanceReader):
+        declared = {"contexts": [], "units": []}
+        used = {"contexts": set(), "units": set()}
+        for record in elem:
+            if isinstance(record, Fact):
+                used["contexts"].add(record.context)
+                used["units"].add(record.unit)
+            elif isinstance(record, Context):
+                declared["contexts"].append(record.id)
+            else:
+                declared["units"].append(record.id)
+        for key in unused:
+            for identifier in declared[key]:
+                if identifier not in used[key]:
+                    unused[key].append(identifier)
+
+        return unused
+
+    references = count_references(elem)
+    for key in unused:
+        for element in references["declared_{0}".format(key)]:
+            if not references[key][element.get("id")]:
+                unused[key].append(element.get("id"))
+
+    return unused
+
+
+@profiling.timed("mutate")
+def clean_instance(elem, references=None):
+    """Remove every context, unit, and footnote which is not referenced from
+    the provided instance element in a single sweep. Returns a dictionary of
+    lists containing the ids of the removed contexts and units, and the
+    labels of the removed footnotes.
+
+    """
+    if references is None:
+        references = count_references(elem)
+    xlink = "{http://www.w3.org/1999/xlink}"
+    link = "{http://www.xbrl.org/2003/linkbase}"
+    removed = {"contexts": [], "units": [], "footnotes": []}
+    for key in ("contexts", "units"):
+        for element in references["declared_{0}".format(key)]:
+            identifier = element.get("id")
+            if not references[key][identifier]:
+                removed[key].append(identifier)
+                element.getparent().remove(element)
+
+    for footnote_link in references["footnote_links"]:
+        kept = set()
+        for footnote in list(footnote_link.iterchildren(
+            tag="{0}footnote".format(link)
+        )):
+            label = footnote.get("{0}label".format(xlink))
+            if references["footnotes"][footnote]:
+                kept.add(label)
+            else:
+                removed["footnotes"].append(label)
+                footnote_link.remove(footnote)
+        used_locs = set()
+        for arc in list(footnote_link.iterchildren(
+            tag="{0}footnoteArc".format(link)
+        )):
+            if arc.get("{0}to".format(xlink)) in kept:
+                used_locs.add(arc.get("{0}from".format(xlink)))
+            else:
+                footnote_link.remove(arc)
+        for loc in list(footnote_link.iterchildren(
+            tag="{0}loc".format(link)
+        )):
+            if loc.get("{0}label".format(xlink)) not in used_locs:
+                footnote_link.remove(loc)
+        if not len(footnote_link):
+            footnote_link.getparent().remove(footnote_link)
+
+    return removed
+
+
+@profiling.timed("mutate")
 def clean_contexts(elem):
     """Search through the provided element's children for contexts. Find the
     ones which are not in use and remove them.
 
     """
-    contexts = {}
+    references = count_references(elem)
     contexts_removed = []
-    context_ref_xpath = ".//*[@contextRef='{0}']"
-    context_xpath = ".//{http://www.xbrl.org/2003/instance}context"
-    for element in elem.iterfind(context_xpath):
-        contexts[element] = element.get("id")
-    for context, identifier in contexts.items():
-        fact_value = elem.find(context_ref_xpath.format(str(identifier)))
-        if fact_value is None:
+    for context in references["declared_contexts"]:
+        identifier = context.get("id")
+        if not references["contexts"][identifier]:
             contexts_removed.append(identifier)
-            elem.remove(context)
+            context.getparent().remove(context)
 
     return contexts_removed
 
 
-def clean_concepts(linkbases):
+@profiling.timed("search")
+def get_concept_locs(elem):
+    """Return a dictionary of every concept located by the provided linkbase
+    element, keyed by its href, with a set of the link roles it appears in.
+
+    """
+    locs = {}
+    loc_xpath = "{http://www.xbrl.org/2003/linkbase}loc"
+    href_attr_xpath = "{http://www.w3.org/1999/xlink}href"
+    role_attr_xpath = "{http://www.w3.org/1999/xlink}role"
+    for loc in elem.iter(loc_xpath):
+        profiling.count("locs scanned")
+        locs.setdefault(
+            loc.get(href_attr_xpath),
+            set()
+        ).add(loc.getparent().get(role_attr_xpath))
+
+    return locs
+
+
+def get_concept_usage(linkbases, locs=None):
+    """Return a dictionary of every concept located by the provided linkbases,
+    built in a single pass over each linkbase. Concepts are keyed by their
+    href, and map the key of each linkbase which uses them to a set of the
+    link roles they appear in. A dictionary of the result of get_concept_locs
+    for each linkbase may be supplied instead to avoid building them again.
+
+    """
+    if locs is None:
+        locs = dict(
+            (key, get_concept_locs(value["root"]))
+            for key, value in linkbases.items() if key not in ("xsd", "ins")
+        )
+    usage = {}
+    for key, hrefs in locs.items():
+        for href, roles in hrefs.items():
+            usage.setdefault(href, dict()).setdefault(key, set()).update(roles)
+
+    return usage
+
+
+def where_used(usage, concept):
+    """Return a sorted list of (linkbase, link role) tuples in which the given
+    concept is used, according to the result of get_concept_usage. The
+    concept may be supplied as either an href or a schema id.
+
+    """
+    log = set()
+    for href, linkbases in usage.items():
+        if concept == href or concept == href.split("#")[-1]:
+            for key, roles in linkbases.items():
+                for role in roles:
+                    log.add((key, role))
+
+    return sorted(log)
+
+
+@profiling.timed("mutate")
+def clean_concepts(linkbases, usage=None):
     """Searches through the provided dictionary of linkbases using the xsd to
     build a list of extension concepts. Then finds any that aren't referenced
     by the presentation, definition, calculation, or label linkbases and
     removes them.
 
     """
+    if usage is None:
+        usage = get_concept_usage(linkbases)
     concepts_removed = []
-    xlink = "{http://www.w3.org/1999/xlink}"
     schema = linkbases["xsd"]["filename"].split("/")[-1]
-    href_xpath = ".//*[@{0}href='{1}#%s']".format(xlink, schema)
+    used = set()
+    for href in usage:
+        parts = href.rsplit("#", 1)
+        if len(parts) == 2 and parts[0] == schema:
+            used.add(parts[1])
     concepts_xpath = ".//{http://www.w3.org/2001/XMLSchema}element"
-    for concept in linkbases["xsd"]["root"].iterfind(concepts_xpath):
+    profiling.count("xpath searches")
+    for concept in list(linkbases["xsd"]["root"].iterfind(concepts_xpath)):
         identifier = concept.get("id")
-        used = False
-        for key, val in linkbases.items():
-            exists = val["root"].find(href_xpath % identifier)
-            if key != "xsd" and etree.iselement(exists):
-                used = True
-                break
-        if not used:
-            linkbases["xsd"]["root"].remove(concept)
+        if identifier not in used:
+            concept.getparent().remove(concept)
             concepts_removed.append(identifier)
 
     return concepts_removed
 
 
 def get_linkbase(filename, linkbase):
-    """Find the requested linkbase in the provided element's DTS."""
-    href_xpath = "{http://www.w3.org/1999/xlink}href"
-    link_xpath = ".//{http://www.xbrl.org/2003/linkbase}"
-    schema_xpath = "{0}schemaRef".format(link_xpath)
-    path = "{0}/".format(filename.rsplit("/", 1)[0])
-    tree = etree.parse(filename)
-    root = tree.getroot()
-    filename = path + root.find(schema_xpath).get(href_xpath)
-    if linkbase == "xsd":
-        return filename
-    tree = etree.parse(filename)
-    root = tree.getroot()
-    linkbases = {
-        "pre": "http://www.xbrl.org/2003/role/presentationLinkbaseRef",
-        "def": "http://www.xbrl.org/2003/role/definitionLinkbaseRef",
-        "cal": "http://www.xbrl.org/2003/role/calculationLinkbaseRef",
-        "lab": "http://www.xbrl.org/2003/role/labelLinkbaseRef"
-    }
-    role_xpath = "{http://www.w3.org/1999/xlink}role"
-    for linkbase_ref in root.iterfind("{0}linkbaseRef".format(link_xpath)):
-        if linkbase_ref.get(role_xpath) == linkbases[linkbase]:
-            return path + linkbase_ref.get(href_xpath)
+    """Find the requested linkbase in the provided instance's DTS."""
+    return get_dts(filename).filenames.get(linkbase)
 
 
-def get_calcs(elem):
-    """Return all calculation relationships discovered in the given element."""
-    store = {}
-    linkbase_xpath = ".//{http://www.xbrl.org/2003/linkbase}"
-    xlink = "{http://www.w3.org/1999/xlink}"
-    calc_link_xpath = "{0}calculationLink".format(linkbase_xpath)
-    calc_arc_xpath = "{0}calculationArc".format(linkbase_xpath)
-    calc_loc_xpath = "{0}loc".format(linkbase_xpath)
-    from_xpath = "{0}from".format(xlink)
-    to_xpath = "{0}to".format(xlink)
-    role_xpath = "{0}role".format(xlink)
-    href_xpath = "{0}href".format(xlink)
-    lab_attr_xpath = "[@{0}label='%s']".format(xlink)
-    for linkrole in elem.iterfind(calc_link_xpath):
-        link_role_href = linkrole.get(role_xpath)
-        store[link_role_href] = {}
-        for arc in linkrole.iterfind(calc_arc_xpath):
-            label_from = linkrole.find(
-                calc_loc_xpath + lab_attr_xpath % arc.get(from_xpath)
-            )
-            label_to = linkrole.find(
-                calc_loc_xpath + lab_attr_xpath % arc.get(to_xpath)
+class CalculationNetwork(object):
+    """The calculation relationships of a calculation linkbase element, read
+    in a single pass. Locs are resolved through a dictionary of each link's
+    labels. Link roles, concepts, and weights are each stored once in a
+    table, and every relationship is stored as indexes into those tables in
+    parallel arrays of link roles, parents, children, and weights. The
+    dictionary returned by get_calcs is built once, when it is first asked
+    for, and shared by every caller after that.
+
+    """
+
+    @profiling.timed("index")
+    def __init__(self, cal_elem):
+        xlink = "{http://www.w3.org/1999/xlink}"
+        linkbase = "{http://www.xbrl.org/2003/linkbase}"
+        loc_tag = "{0}loc".format(linkbase)
+        arc_tag = "{0}calculationArc".format(linkbase)
+        label_attr = "{0}label".format(xlink)
+        self.roles = []
+        self.concepts = []
+        self.weights = []
+        self._role_ids = {}
+        self._concept_ids = {}
+        self._weight_ids = {}
+        self.role = array.array("i")
+        self.parent = array.array("i")
+        self.child = array.array("i")
+        self.weight = array.array("i")
+        self._calcs = None
+        for link in cal_elem.iter("{0}calculationLink".format(linkbase)):
+            role = self._intern(
+                self.roles,
+                self._role_ids,
+                link.get("{0}role".format(xlink))
             )
-            parent = label_from.get(href_xpath).split("#")[-1]
-            child = label_to.get(href_xpath).split("#")[-1]
+            locs = {}
+            arcs = []
+            for elem in link.iterchildren(loc_tag, arc_tag):
+                if elem.tag == loc_tag:
+                    locs[elem.get(label_attr)] = self._intern(
+                        self.concepts,
+                        self._concept_ids,
+                        elem.get("{0}href".format(xlink)).split("#")[-1]
+                    )
+                else:
+                    arcs.append(elem)
+            profiling.count("elements scanned", len(locs) + len(arcs))
+            for arc in arcs:
+                parent = locs.get(arc.get("{0}from".format(xlink)))
+                child = locs.get(arc.get("{0}to".format(xlink)))
+                if parent is None or child is None:
+                    continue
+                self.role.append(role)
+                self.parent.append(parent)
+                self.child.append(child)
+                self.weight.append(self._intern(
+                    self.weights,
+                    self._weight_ids,
+                    arc.get("weight")
+                ))
+
+    def _intern(self, table, lookup, value):
+        if value not in lookup:
+            lookup[value] = len(table)
+            table.append(value)
+
+        return lookup[value]
+
+    def __getstate__(self):
+        # The dictionary of get_calcs is rebuilt rather than cached on disk.
+        state = dict(self.__dict__)
+        state.pop("_calcs", None)
+
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._calcs = None
+
+    def __len__(self):
+        return len(self.parent)
+
+    def get_calcs(self):
+        """Return a dictionary of the calculation relationships of each link
+        role, as returned by get_calcs. It is built on the first call, and
+        the same dictionary is returned by every later call, so it must not
+        be modified.
+
+        """
+        if self._calcs is not None:
+            return self._calcs
+
+        store = dict((role, {}) for role in self.roles)
+        for i in range(len(self)):
+            store[self.roles[self.role[i]]].setdefault(
+                self.concepts[self.parent[i]],
+                list()
+            ).append((
+                self.concepts[self.child[i]],
+                self.weights[self.weight[i]]
+            ))
+
+        for linkrole, totals in store.items():
+            for total, sum_elements in totals.items():
+                sum_elements.sort(key=lambda tup: tup[0])
+        self._calcs = store
+
+        return store
+
+
+def get_calculation_network(elem):
+    """Return the provided CalculationNetwork, or read one from the given
+    calculation linkbase element.
 
-            if parent not in store[link_role_href]:
-                store[link_role_href][parent] = []
-            store[link_role_href][parent].append((child, arc.get("weight")))
+    """
+    if isinstance(elem, CalculationNetwork):
+        return elem
 
-    for linkrole, totals in store.items():
-        for total, sum_elements in totals.items():
-            sum_elements.sort(key=lambda tup: tup[0])
+    return CalculationNetwork(elem)
 
-    return store
 
+def get_calcs(elem):
+    """Return all calculation relationships discovered in the given element,
+    which may also be a CalculationNetwork.
 
-def dup_calcs(elem):
-    """Return all duplicate calculation relationships in the given element."""
-    def add_warning(total, warnings):
-        if total in warnings:
-            warnings[total] += 1
-        else:
-            warnings[total] = 0
+    """
+    return get_calculation_network(elem).get_calcs()
 
-        return warnings
 
-    store = get_calcs(elem)
-    warnings = {}
-    base_calcs = {}
-    for linkrole in store:
-        for total in store[linkrole]:
-            if total in base_calcs:
-                new_children = set(store[linkrole][total])
-                totals = base_calcs[total]
-                if new_children in totals:
-                    warnings = add_warning(total, warnings)
-                else:
-                    set_new_children = set(new_children)
-                    found = False
-                    for foot in totals:
-                        set_old_children = set(foot)
-                        if set_new_children.issubset(set_old_children):
-                            warnings = add_warning(total, warnings)
-                            found = True
-                            break
-                        elif set_new_children.issuperset(set_old_children):
-                            warnings = add_warning(total, warnings)
-                            foot = store[linkrole][total]
-                            found = True
-                            break
-                    if not found:
-                        totals.append(store[linkrole][total])
+@profiling.timed("analyze")
+def find_dup_calcs(elem):
+    """Return the duplicate calculation relationships in the given element,
+    which may also be a CalculationNetwork. The footing of each total in each
+    link role is reduced to a frozenset of its children and weights, and
+    looked up in a table of the footings already seen for that total. The
+    result maps each total with a duplicate to a list of tuples containing
+    the link role, the earlier link role it clashes with, and whether its
+    footing is a "duplicate", "subset", or "superset" of the earlier one.
+
+    """
+    footings = {}
+    clashes = {}
+    for linkrole, totals in get_calcs(elem).items():
+        for total, children in totals.items():
+            signature = frozenset(children)
+            seen = footings.setdefault(total, {})
+            if signature in seen:
+                clashes.setdefault(total, list()).append(
+                    (linkrole, seen[signature][0], "duplicate")
+                )
             else:
-                base_calcs[total] = [store[linkrole][total]]
+                for footing, linkroles in seen.items():
+                    if signature < footing:
+                        relationship = "subset"
+                    elif signature > footing:
+                        relationship = "superset"
+                    else:
+                        continue
+                    clashes.setdefault(total, list()).append(
+                        (linkrole, linkroles[0], relationship)
+                    )
+            seen.setdefault(signature, list()).append(linkrole)
+
+    return clashes
+
+
+def dup_calcs(elem):
+    """Return all duplicate calculation relationships in the given element,
+    which may also be a CalculationNetwork, as a dictionary of each total and
+    the number of additional link roles which duplicate its calculation.
+
+    """
+    warnings = {}
+    for total, clashes in find_dup_calcs(elem).items():
+        warnings[total] = len(set(clash[0] for clash in clashes)) - 1
 
     return warnings
 
 
-def calc_values(elem, calcs):
+@profiling.timed("search")
+def get_facts(elem):
+    """Return every numeric fact in the provided instance element, or
+    InstanceReader, in a single pass. The result is keyed by the concept's
+    qualified name, in Clark notation, and then by contextRef, with a list of
+    the parsed Decimal values of each reported fact in document order. Nil
+    facts and fractions, which have no decimal value, are not included.
+
+    """
+    facts = {}
+    if isinstance(elem, InstanceReader):
+        for record in elem:
+            if isinstance(record, Fact) and record.value is not None and \
+                    record.unit is not None:
+                value = parse_decimal(record.value)
+                if value is None:
+                    continue
+                facts.setdefault(
+                    record.concept,
+                    dict()
+                ).setdefault(record.context, list()).append(value)
+
+        return facts
+
+    scanned = 0
+    for element in elem.iter(tag=etree.Element):
+        scanned += 1
+        if element.text is None or element.get("unitRef") is None or \
+                len(element) or element.get(_nil) == "true":
+            continue
+        context = element.get("contextRef")
+        if context is None:
+            continue
+        value = parse_decimal(element.text)
+        if value is None:
+            continue
+        facts.setdefault(
+            element.tag,
+            dict()
+        ).setdefault(context, list()).append(value)
+    profiling.count("elements scanned", scanned)
+
+    return facts
+
+
+def concept_qname(elem, concept):
+    """Return the qualified name, in Clark notation, of a concept identified
+    by its prefixed schema id (ie: us-gaap_Assets) using the namespaces
+    declared on the provided instance element.
+
+    """
+    prefix, name = concept.split("_", 1)
+    return "{{{0}}}{1}".format(elem.nsmap[prefix], name)
+
+
+@profiling.timed("analyze")
+def calc_values(elem, calcs, facts=None):
     """Return all calculation inconsistencies for the given concepts in the
-    provided element.
+    provided element, which may also be an InstanceReader to check the
+    instance without parsing it into a tree. The calculations may be either
+    the result of get_calcs or a CalculationNetwork. An existing index from
+    get_facts may be supplied to avoid building it again.
 
     """
-    nsmap = elem.nsmap
+    if isinstance(calcs, CalculationNetwork):
+        calcs = calcs.get_calcs()
+    if facts is None:
+        facts = get_facts(elem)
     warnings = []
-    context_ref = ".//{{{0}}}{1}[@contextRef='{2}']"
+    lookups = 0
     for link_role, total_elems in calcs.items():
         for total_elem, line_items in total_elems.items():
-            total_split = total_elem.split("_", 1)
-            namespace = ".//{{{0}}}".format(nsmap[total_split[0]])
-            for total in elem.iterfind(namespace + total_split[-1]):
-                if total.text is None:
-                    continue
-                value = Decimal(total.text)
-                cont = total.get("contextRef")
+            lookups += len(line_items) + 1
+            totals = facts.get(concept_qname(elem, total_elem), {})
+            items = []
+            for line_item in line_items:
+                items.append((
+                    facts.get(concept_qname(elem, line_item[0]), {}),
+                    float(line_item[1]) == 1
+                ))
+            for cont, values in totals.items():
+                lookups += len(items)
                 calculated_total = 0
                 changed = False
-                for line_item in line_items:
-                    line_item_split = line_item[0].split("_", 1)
-                    ns = (nsmap[line_item_split[0]], line_item_split[-1], cont)
-                    new = elem.find(context_ref.format(*ns))
-                    if new is not None and new.text is not None:
+                for item_facts, positive in items:
+                    if cont in item_facts:
                         changed = True
-                        weight = line_item[1]
-                        if float(weight) == 1:
-                            calculated_total += Decimal(new.text)
+                        if positive:
+                            calculated_total += item_facts[cont][0]
                         else:
-                            calculated_total -= Decimal(new.text)
-                if calculated_total != value and changed:
-                    warnings.append([link_role,
-                                    total_elem.split("}")[-1],
-                                    cont,
-                                    value,
-                                    calculated_total])
+                            calculated_total -= item_facts[cont][0]
+                if not changed:
+                    continue
+                for value in values:
+                    if calculated_total != value:
+                        warnings.append([link_role,
+                                        total_elem.split("}")[-1],
+                                        cont,
+                                        value,
+                                        calculated_total])
+    profiling.count("fact lookups", lookups)
 
     return warnings
 
 
+class CalculationTree(object):
+    """The calculations of every link role as a single graph of summations,
+    in which a total whose line items are themselves totals in the same link
+    role is summed from their subtotals. Identical summations, those of the
+    same concept from the same line items with the same weights all the way
+    down, are stored once however many link roles they appear in. Nodes are
+    numbered in topological order, every line item before its total, and
+    each is a tuple of the concept and a tuple of its line items, which are
+    each a tuple of the concept, Decimal weight, and the node it is the total
+    of, or None. Line items which would form a cycle are not followed.
+
+    """
+
+    @profiling.timed("index")
+    def __init__(self, calcs):
+        if isinstance(calcs, CalculationNetwork):
+            calcs = calcs.get_calcs()
+        self.nodes = []
+        self.roles = {}
+        self._node_ids = {}
+        for link_role, totals in calcs.items():
+            built = {}
+            for total in totals:
+                self._build(totals, total, built, [])
+            self.roles[link_role] = collections.OrderedDict(
+                (total, built[total]) for total in totals
+            )
+
+    def _build(self, totals, concept, built, stack):
+        if concept not in built:
+            stack.append(concept)
+            line_items = []
+            for line_item, weight in totals[concept]:
+                node = None
+                if line_item in totals and line_item not in stack:
+                    node = self._build(totals, line_item, built, stack)
+                line_items.append((line_item, Decimal(weight), node))
+            stack.pop()
+            key = (concept, tuple(line_items))
+            if key not in self._node_ids:
+                self._node_ids[key] = len(self.nodes)
+                self.nodes.append(key)
+            built[concept] = self._node_ids[key]
+
+        return built[concept]
+
+    def __len__(self):
+        return len(self.nodes)
+
+    @profiling.timed("analyze")
+    def evaluate(self, elem, facts):
+        """Return, for every node, a dictionary of its calculated total in
+        each context, and a dictionary of the concept at which the first
+        inconsistency beneath or at the node appears in each context. Each
+        line item contributes its first reported value in a context, or its
+        calculated total if it has none. Every node is computed once in each
+        context, in topological order, so every subtotal is ready before the
+        totals which include it.
+
+        """
+        names = {}
+
+        def reported(concept):
+            if concept not in names:
+                names[concept] = facts.get(concept_qname(elem, concept), {})
+            return names[concept]
+
+        calculated = []
+        origins = []
+        computed = 0
+        for concept, line_items in self.nodes:
+            totals = {}
+            origin = {}
+            for line_item, weight, node in line_items:
+                item_facts = reported(line_item)
+                for cont, values in item_facts.items():
+                    totals[cont] = totals.get(cont, 0) + weight * values[0]
+                if node is None:
+                    continue
+                for cont, value in calculated[node].items():
+                    if cont not in item_facts:
+                        totals[cont] = totals.get(cont, 0) + weight * value
+                for cont, item_origin in origins[node].items():
+                    origin.setdefault(cont, item_origin)
+            for cont, values in reported(concept).items():
+                if cont not in origin and cont in totals and any(
+                    value != totals[cont] for value in values
+                ):
+                    origin[cont] = concept
+            computed += len(totals)
+            calculated.append(totals)
+            origins.append(origin)
+        profiling.count("subtotals computed", computed)
+
+        return (calculated, origins)
+
+
+def rollup_values(elem, calcs, facts=None):
+    """Return all calculation inconsistencies in the given instance element,
+    or InstanceReader, checking every level of each calculation tree. A total
+    is compared with the sum of its line items, using the calculated total of
+    any line item which is itself a total but was not reported. Each
+    inconsistency is reported as a list of the link role, total, context,
+    reported value, calculated value, and the concept at which the first
+    inconsistency in the tree beneath the total appears, which is the total
+    itself unless a subtotal beneath it is also inconsistent. The calculations
+    may be the result of get_calcs, a CalculationNetwork, or a
+    CalculationTree, and an existing index from get_facts may be supplied.
+
+    """
+    tree = calcs
+    if not isinstance(tree, CalculationTree):
+        tree = CalculationTree(calcs)
+    if facts is None:
+        facts = get_facts(elem)
+    calculated, origins = tree.evaluate(elem, facts)
+    warnings = []
+    for link_role, totals in tree.roles.items():
+        for total_elem, node in totals.items():
+            calculated_totals = calculated[node]
+            total_facts = facts.get(concept_qname(elem, total_elem), {})
+            for cont, values in total_facts.items():
+                if cont not in calculated_totals:
+                    continue
+                for value in values:
+                    if value != calculated_totals[cont]:
+                        warnings.append([link_role,
+                                         total_elem,
+                                         cont,
+                                         value,
+                                         calculated_totals[cont],
+                                         origins[node][cont]])
+
+    return warnings
+
+
+def round_fact(value, decimals):
+    """Return the Decimal value of a numeric fact rounded, half to even, to
+    the given decimals, which may be None or INF to leave it unrounded.
+
+    """
+    if decimals is None or decimals.strip() == "INF":
+        return value
+
+    return value.quantize(
+        Decimal(1).scaleb(-int(decimals)),
+        rounding=ROUND_HALF_EVEN
+    )
+
+
+def compare_facts(records):
+    """Return the kind of duplicate a list of Fact records with the same
+    concept, context, unit, and language are: "duplicates" if their values
+    and decimals are identical, "inconsistent decimals" if their values agree
+    when rounded to the decimals of the least precise but are reported to
+    different decimals, or "inconsistent values" otherwise. Numeric facts are
+    compared by value, and the others by their text with surrounding white
+    space removed, as are fractions. A nil fact only duplicates another nil
+    fact.
+
+    """
+    texts = [None if record.value is None else record.value.strip()
+             for record in records]
+    values = [None if text is None else parse_decimal(text)
+              for text in texts]
+    if None in values or records[0].unit is None:
+        if len(set(texts)) == 1:
+            return "duplicates"
+        return "inconsistent values"
+
+    decimals = [record.decimals for record in records]
+    if len(set(zip(values, decimals))) == 1:
+        return "duplicates"
+    finite = [int(places) for places in decimals
+              if places is not None and places.strip() != "INF"]
+    least = str(min(finite)) if finite else None
+    if len(set(round_fact(value, least) for value in values)) == 1:
+        return "inconsistent decimals"
+
+    return "inconsistent values"
+
+
+@profiling.timed("analyze")
+def duplicate_facts(elem):
+    """Return every group of facts in the provided instance element, or
+    InstanceReader, which share a concept, context, unit, and language. The
+    facts are grouped in a single pass by hashing that key, so the check is
+    linear in the number of facts. Groups are returned in a dictionary of
+    lists keyed by the kinds compare_facts reports, and each group is a list
+    of the concept, context, unit, and language, along with a list of the
+    value and decimals of each fact in document order.
+
+    """
+    groups = collections.OrderedDict()
+    scanned = 0
+    if isinstance(elem, InstanceReader):
+        for record in elem:
+            if isinstance(record, Fact):
+                scanned += 1
+                groups.setdefault(
+                    (record.concept, record.context, record.unit, record.lang),
+                    list()
+                ).append(record)
+    else:
+        # Facts are only read into records once they are known to be
+        # duplicated, which is rare.
+        for element in elem.iter(tag=etree.Element):
+            scanned += 1
+            context = element.get("contextRef")
+            if context is not None:
+                groups.setdefault(
+                    (element.tag, context, element.get("unitRef"),
+                     element.get(_xml_lang)),
+                    list()
+                ).append(element)
+    profiling.count("elements scanned", scanned)
+
+    duplicates = collections.OrderedDict(
+        (kind, []) for kind in
+        ("duplicates", "inconsistent values", "inconsistent decimals")
+    )
+    for key, records in groups.items():
+        if len(records) < 2:
+            continue
+        concept, context, unit, lang = key
+        if not isinstance(records[0], Fact):
+            records = [read_fact(element) for element in records]
+        duplicates[compare_facts(records)].append([
+            concept.split("}")[-1],
+            context,
+            unit,
+            lang,
+            [(record.value, record.decimals) for record in records]
+        ])
+
+    return duplicates
+
+
 def link_role_def(elem, link_role):
-    """Take a link role URI and return the definition."""
-    xpath = ".//*[@roleURI='%s']/{http://www.xbrl.org/2003/linkbase}definition"
-    definition = elem.find(xpath % link_role).text
+    """Take a link role URI and return the definition. The schema element may
+    also be a LinkRoleIndex, which should be given when looking up many.
 
-    return definition
+    """
+    return get_link_role_index(elem).definition(link_role)
 
 
+@profiling.timed("search")
 def insert_labels(elem, calcs):
     """Take a list of calcs and insert standard labels before each concept."""
     role_label = "http://www.xbrl.org/2003/role/label"
@@ -691,8 +2126,12 @@ def insert_labels(elem, calcs):
     return calcs
 
 
+@profiling.timed("mutate")
 def link_role_sort(elem):
-    """Update link role sort codes to improve compatibility with Crossfire."""
+    """Update link role sort codes to improve compatibility with Crossfire.
+    The schema element may also be a LinkRoleIndex.
+
+    """
     log = []
 
     dei = "0000"
@@ -702,9 +2141,8 @@ def link_role_sort(elem):
     level_four = re.compile("^4\d{3}$")
     eights = re.compile("^8\d{3}$")
     sort_reg = re.compile("^(\d+)(.+)$")
-    linkbase_refs_xpath = ".//{http://www.xbrl.org/2003/linkbase}definition"
 
-    for linkbase_ref in elem.iterfind(linkbase_refs_xpath):
+    for linkbase_ref in get_link_role_index(elem).definitions.values():
         match = sort_reg.search(linkbase_ref.text)
         sort = match.group(1)
         link_def = match.group(2)
@@ -764,6 +2202,7 @@ def rename_refs(elem, linkbase):
     path = re.compile("^(?!http://)(.+-)(\d{8})(\.xsd)(#.+)$")
     if linkbase == "xsd":
         link_refs_xpath = ".//{http://www.xbrl.org/2003/linkbase}linkbaseRef"
+        profiling.count("xpath searches")
         for link_ref in elem.iterfind(link_refs_xpath):
             old_path = link_ref.get(href_attr_xpath)
             match = filename.search(old_path)
@@ -783,6 +2222,7 @@ def rename_refs(elem, linkbase):
             links.append("roleRef")
         for link in links:
             xpath = ".//{http://www.xbrl.org/2003/linkbase}%s" % link
+            profiling.count("xpath searches")
             for link_ref in elem.iterfind(xpath):
                 match = path.search(link_ref.get(href_attr_xpath))
                 if match:
@@ -800,6 +2240,7 @@ def retrieve_base(elem):
     version = ""
     ugt = re.compile("(us-gaap-\d{4}-\d{2}-\d{2})\.xsd$")
 
+    profiling.count("xpath searches")
     for schema in elem.iterfind("{http://www.w3.org/2001/XMLSchema}import"):
         location = ugt.search(schema.get("schemaLocation"))
         if location:
@@ -809,33 +2250,176 @@ def retrieve_base(elem):
     return version
 
 
-def get_link_roles(elem):
-    """Return all extension link role URIs found in the given element."""
-    log = []
-    role_type_xpath = ".//{http://www.xbrl.org/2003/linkbase}roleType"
+class LinkRoleIndex(object):
+    """An index of the link roles of a schema and its linkbases, built in a
+    single pass over each. The roleType of every link role the schema
+    declares is kept in document order, along with its definition, and the
+    roleRefs and arcroleRefs of each linkbase are counted by URI. The usage
+    of every link role is counted for each linkbase, as the number of
+    extended links and arcs in the role and the set of concepts they locate.
+    Linkbases are given as a dictionary of each key and its "root" element,
+    as returned by open_linkbases.
 
-    for link_role in elem.iterfind(role_type_xpath):
-        log.append(link_role.get("roleURI"))
+    """
+    xlink = "{http://www.w3.org/1999/xlink}"
+    linkbase = "{http://www.xbrl.org/2003/linkbase}"
 
-    return log
+    @profiling.timed("index")
+    def __init__(self, linkbases):
+        self.roles = collections.OrderedDict()
+        self.definitions = {}
+        self.role_refs = {}
+        self.arcrole_refs = {}
+        self.usage = {}
+        role_type_tag = "{0}roleType".format(self.linkbase)
+        definition_tag = "{0}definition".format(self.linkbase)
+        role_ref_tag = "{0}roleRef".format(self.linkbase)
+        arcrole_ref_tag = "{0}arcroleRef".format(self.linkbase)
+        xlink_type = "{0}type".format(self.xlink)
+        role = "{0}role".format(self.xlink)
+        href = "{0}href".format(self.xlink)
+        scanned = 0
+        for key, value in linkbases.items():
+            for elem in value["root"].iter(tag=etree.Element):
+                scanned += 1
+                kind = elem.get(xlink_type)
+                if kind == "extended":
+                    self._count(elem.get(role), key)["links"] += 1
+                elif kind == "arc" or kind == "locator":
+                    usage = self._count(elem.getparent().get(role), key)
+                    if kind == "arc":
+                        usage["arcs"] += 1
+                    else:
+                        usage["concepts"].add(elem.get(href))
+                elif elem.tag == role_type_tag:
+                    role_uri = elem.get("roleURI")
+                    self.roles[role_uri] = elem
+                    profiling.count("xpath searches")
+                    definition = elem.find(definition_tag)
+                    if definition is not None:
+                        self.definitions[role_uri] = definition
+                elif elem.tag == role_ref_tag:
+                    self.role_refs.setdefault(
+                        elem.get("roleURI"),
+                        collections.Counter()
+                    )[key] += 1
+                elif elem.tag == arcrole_ref_tag:
+                    self.arcrole_refs.setdefault(
+                        elem.get("arcroleURI"),
+                        collections.Counter()
+                    )[key] += 1
+        profiling.count("elements scanned", scanned)
+
+    def _count(self, role, key):
+        return self.usage.setdefault(role, dict()).setdefault(key, {
+            "links": 0,
+            "arcs": 0,
+            "concepts": set()
+        })
+
+    def active(self):
+        """Return a set of the link roles of every extended link."""
+        return set(
+            role for role, usage in self.usage.items()
+            if any(counts["links"] for counts in usage.values())
+        )
+
+    def unused(self):
+        """Return the link roles declared by the schema which no extended
+        link uses, in document order.
+
+        """
+        active = self.active()
+        return [role for role in self.roles if role not in active]
+
+    def definition(self, role):
+        """Return the definition of the given link role."""
+        return self.definitions[role].text
+
+    @profiling.timed("mutate")
+    def delete(self, roles):
+        """Remove the roleType of each of the given link roles from the
+        schema, and return the link roles removed.
+
+        """
+        log = []
+        for role in roles:
+            role_type = self.roles.pop(role)
+            self.definitions.pop(role, None)
+            role_type.getparent().remove(role_type)
+            log.append(role)
 
+        return log
+
+    def report(self):
+        """Return a dictionary of the usage of every link role under roles,
+        and of every arc role under arcroles. Link roles declared by the
+        schema come first, in document order, followed by any others in
+        sorted order, each with its definition, the number of roleRefs to it
+        in each linkbase, and the number of extended links, arcs, and
+        concepts which use it in each linkbase. Arc roles have the number of
+        arcroleRefs to them in each linkbase.
+
+        """
+        roles = list(self.roles)
+        roles += sorted(
+            role for role in set(self.usage).union(self.role_refs)
+            if role not in self.roles and role is not None
+        )
+        report = {
+            "roles": collections.OrderedDict(),
+            "arcroles": collections.OrderedDict(
+                (arcrole, dict(self.arcrole_refs[arcrole]))
+                for arcrole in sorted(self.arcrole_refs)
+            )
+        }
+        for role in roles:
+            definition = self.definitions.get(role)
+            report["roles"][role] = {
+                "definition": None if definition is None else definition.text,
+                "role_refs": dict(self.role_refs.get(role, {})),
+                "usage": dict(
+                    (key, {
+                        "links": counts["links"],
+                        "arcs": counts["arcs"],
+                        "concepts": len(counts["concepts"])
+                    }) for key, counts in self.usage.get(role, {}).items()
+                )
+            }
 
-def get_active_link_roles(linkbases):
-    """Return a set of all extension link roles in use by the given linkbases.
+        return report
 
+
+def get_link_role_index(elem):
+    """Return the provided LinkRoleIndex, or index the given schema element.
     """
-    log = []
-    xpaths = {"pre": ".//{http://www.xbrl.org/2003/linkbase}presentationLink",
-              "def": ".//{http://www.xbrl.org/2003/linkbase}definitionLink",
-              "cal": ".//{http://www.xbrl.org/2003/linkbase}calculationLink"}
-    role_attr_xpath = "{http://www.w3.org/1999/xlink}role"
+    if isinstance(elem, LinkRoleIndex):
+        return elem
+
+    return LinkRoleIndex({"xsd": {"root": elem}})
+
+
+def get_link_roles(elem):
+    """Return all extension link role URIs found in the given element, which
+    may also be a LinkRoleIndex.
 
-    for key, value in linkbases.items():
-        if key in xpaths:
-            for link_role in value["root"].iterfind(xpaths[key]):
-                log.append(link_role.get(role_attr_xpath))
+    """
+    return list(get_link_role_index(elem).roles)
+
+
+@profiling.timed("search")
+def get_active_link_roles(linkbases):
+    """Return a set of all extension link roles in use by the given linkbases,
+    or a LinkRoleIndex of them.
+
+    """
+    if isinstance(linkbases, LinkRoleIndex):
+        return linkbases.active()
 
-    return set(log)
+    return LinkRoleIndex(dict(
+        (key, value) for key, value in linkbases.items()
+        if key in ("pre", "def", "cal")
+    )).active()
 
 
 def compare_link_roles(roles, active_roles):
@@ -849,14 +2433,8 @@ def compare_link_roles(roles, active_roles):
 
 
 def delete_link_roles(elem, link_roles):
-    """Delete the provided link roles from the given element."""
-    role_type_attr_xpath = ".//*[@roleURI='%s']"
-    app_info = elem.find(".//{http://www.w3.org/2001/XMLSchema}appinfo")
-    log = []
-
-    for link_role in link_roles:
-        role = elem.find(role_type_attr_xpath % link_role)
-        app_info.remove(role)
-        log.append(link_role)
+    """Delete the provided link roles from the given element, which may also
+    be a LinkRoleIndex.
 
-    return log
+    """
+    return get_link_role_index(elem).delete(link_roles)